@@ -13,6 +13,8 @@ from django.db import transaction
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'stock_screener.settings')
 django.setup()
 
+from screener.factors import refresh_factor_scores  # noqa: E402
+from screener.generation import bump_generation_on_commit  # noqa: E402
 from screener.models import AccessibleStock, AccessibleSector, AccessibleIndustry  # noqa: E402
 
 
@@ -38,6 +40,9 @@ def fix_unknowns():
                 updates.append('industry')
             if updates:
                 stock.save(update_fields=updates)
+        # Sector changes move stocks between the groups factor ranks are taken in.
+        refresh_factor_scores('accessible')
+        bump_generation_on_commit('accessible')
 
 
 if __name__ == '__main__':
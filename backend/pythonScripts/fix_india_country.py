@@ -1,7 +1,9 @@
+from screener.generation import bump_generation
 from screener.models import Exchange
 updated = 0
 for exch in Exchange.objects.filter(country__iexact="india_mid_cap"):
     exch.country = "India"
     exch.save()
     updated += 1
+bump_generation("classifier")
 print(f"Updated {updated} exchanges")
@@ -1,7 +1,9 @@
+from screener.generation import bump_generation
 from screener.models import Stock
 from django.db import transaction
 with transaction.atomic():
     qs = Stock.objects.filter(ticker__regex=r'^\d+\.0+$')
     deleted = qs.count()
     qs.delete()
+bump_generation("classifier")
 print(f"Removed {deleted} decimal-formatted tickers")
@@ -17,6 +17,8 @@ from django.db import transaction
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "stock_screener.settings")
 django.setup()
 
+from screener.factors import refresh_factor_scores  # noqa: E402  # pylint: disable=wrong-import-position
+from screener.generation import bump_generation  # noqa: E402  # pylint: disable=wrong-import-position
 from screener.models import (  # noqa: E402  # pylint: disable=wrong-import-position
     AccessibleExchange,
     AccessibleSector,
@@ -182,6 +184,8 @@ def import_accessible_stocks():
                 else:
                     updated += 1
 
+    refresh_factor_scores("accessible")
+    bump_generation("accessible")
     total = AccessibleStock.objects.count()
     return created, updated, total
 
@@ -1,3 +1,5 @@
+from screener.generation import bump_generation
 from screener.models import Stock
 count = Stock.objects.filter(country__iexact="india_mid_cap").update(country="India")
+bump_generation("classifier")
 print(f"Normalized country for {count} stocks")
@@ -1,3 +1,5 @@
+from screener.generation import bump_generation
 from screener.models import Stock
 removed, _ = Stock.objects.filter(country__iexact="India").delete()
+bump_generation("classifier")
 print(f"Removed {removed} India stocks")
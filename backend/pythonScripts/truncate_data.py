@@ -1,6 +1,8 @@
+from screener.generation import bump_generation
 from screener.models import Stock, Industry, Sector, Exchange
 Stock.objects.all().delete()
 Industry.objects.all().delete()
 Sector.objects.all().delete()
 Exchange.objects.all().delete()
+bump_generation('classifier')
 print('Cleared stocks/industries/sectors/exchanges')
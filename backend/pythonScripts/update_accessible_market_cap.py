@@ -15,6 +15,8 @@ import django
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "stock_screener.settings")
 django.setup()
 
+from screener.factors import refresh_factor_scores  # noqa: E402  # pylint: disable=wrong-import-position
+from screener.generation import bump_generation  # noqa: E402  # pylint: disable=wrong-import-position
 from screener.models import AccessibleStock  # noqa: E402  # pylint: disable=wrong-import-position
 
 
@@ -93,6 +95,9 @@ def update_market_caps():
         else:
             skipped += 1
 
+    if updated:
+        refresh_factor_scores("accessible")
+        bump_generation("accessible")
     total = AccessibleStock.objects.count()
     return updated, total
 
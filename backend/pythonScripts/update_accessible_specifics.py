@@ -13,6 +13,8 @@ from django.db import transaction
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'stock_screener.settings')
 django.setup()
 
+from screener.factors import refresh_factor_scores  # noqa: E402
+from screener.generation import bump_generation_on_commit  # noqa: E402
 from screener.models import AccessibleStock, AccessibleSector, AccessibleIndustry  # noqa: E402
 
 UPDATES = [
@@ -60,6 +62,9 @@ def apply_updates():
                 results.append((ticker, 'updated', updates_needed))
             else:
                 results.append((ticker, 'unchanged'))
+        # Sector changes move stocks between the groups factor ranks are taken in.
+        refresh_factor_scores('accessible')
+        bump_generation_on_commit('accessible')
     return results
 
 
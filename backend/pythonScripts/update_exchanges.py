@@ -25,6 +25,7 @@ mapping = {
     "USA": ("OTC Markets", "United States"),
 }
 
+from screener.generation import bump_generation
 from screener.models import Exchange
 
 updated = 0
@@ -43,4 +44,5 @@ for code, (name, country) in mapping.items():
     if changed:
         exch.save()
         updated += 1
+bump_generation("classifier")
 print(f"Updated {updated} exchanges")
@@ -1,3 +1,4 @@
+from screener.generation import bump_generation
 from screener.models import Stock, Exchange
 from django.db.models import Q
 indian_exchanges = Exchange.objects.filter(country__iexact="India_mid_cap")
@@ -8,4 +9,5 @@ for exch in indian_exchanges:
     updated_exchanges += 1
 stock_qs = Stock.objects.filter(Q(exchange__country__iexact="India") | Q(exchange__code__in=["NSE","BSE"]))
 count = stock_qs.update(market_cap=None)
+bump_generation("classifier")
 print(f"Updated market cap for {count} stocks; exchanges updated: {updated_exchanges}")
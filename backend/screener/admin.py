@@ -1,24 +1,40 @@
 from django.contrib import admin
+from .generation import bump_generation_on_commit
 from .models import Exchange, Sector, Industry, Stock
 
+class BumpGenerationMixin:
+    """Retire cached classifier data after edits made through the admin."""
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        bump_generation_on_commit('classifier')
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        bump_generation_on_commit('classifier')
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        bump_generation_on_commit('classifier')
+
 @admin.register(Exchange)
-class ExchangeAdmin(admin.ModelAdmin):
+class ExchangeAdmin(BumpGenerationMixin, admin.ModelAdmin):
     list_display = ['code', 'name', 'country']
     search_fields = ['code', 'name', 'country']
 
 @admin.register(Sector)
-class SectorAdmin(admin.ModelAdmin):
+class SectorAdmin(BumpGenerationMixin, admin.ModelAdmin):
     list_display = ['name']
     search_fields = ['name']
 
 @admin.register(Industry)
-class IndustryAdmin(admin.ModelAdmin):
+class IndustryAdmin(BumpGenerationMixin, admin.ModelAdmin):
     list_display = ['name', 'sector']
     search_fields = ['name']
     list_filter = ['sector']
 
 @admin.register(Stock)
-class StockAdmin(admin.ModelAdmin):
+class StockAdmin(BumpGenerationMixin, admin.ModelAdmin):
     list_display = ['ticker', 'company_name', 'exchange', 'sector', 'price', 'market_cap']
     list_filter = ['exchange', 'sector', 'industry', 'country']
     search_fields = ['ticker', 'company_name']
@@ -0,0 +1,184 @@
+"""Historical backtests of fixed-weight funds over stored price history.
+
+A strategy is a set of target weights. Holdings grow with their daily
+returns between rebalances and are reset to the targets at calendar period
+ends (monthly through annually) and, when ``drift_tolerance`` is set,
+whenever any holding drifts further than that from its target. The walk
+moves from one rebalance to the next rather than day by day: for each
+segment the growth of every holding is ``exp`` of the difference of
+cumulative log returns, so all days of a segment, and the first day on
+which drift breaches the tolerance, come out of one array expression.
+
+``backtest_strategies`` loads the aligned returns of the union of all
+strategies' holdings once and runs every strategy over them side by side,
+each from the first date on which all of its own holdings have prices.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from .returns import TRADING_DAYS, returns_matrix
+
+# Months per calendar rebalancing period; None never rebalances on the calendar.
+REBALANCING_CALENDARS = {
+    'monthly': 1,
+    'quarterly': 3,
+    'semi_annually': 6,
+    'annually': 12,
+    'never': None,
+}
+
+
+@dataclass
+class BacktestResult:
+    dates: np.ndarray
+    equity: np.ndarray  # fund value at the close of each date
+    drawdown: np.ndarray  # fraction below the running peak, <= 0
+    rebalance_dates: np.ndarray
+    turnover: float  # one-way traded fraction of the fund, summed over rebalances
+    initial_investment: float
+    total_return: float
+    annualized_return: float | None
+    volatility: float | None
+    sharpe_ratio: float | None
+    max_drawdown: float
+
+    def to_payload(self):
+        return {
+            'dates': np.datetime_as_string(self.dates, unit='D').tolist(),
+            'equity': self.equity.tolist(),
+            'drawdown': self.drawdown.tolist(),
+            'rebalance_dates': np.datetime_as_string(self.rebalance_dates, unit='D').tolist(),
+            'turnover': self.turnover,
+            'total_return': self.total_return,
+            'annualized_return': self.annualized_return,
+            'volatility': self.volatility,
+            'sharpe_ratio': self.sharpe_ratio,
+            'max_drawdown': self.max_drawdown,
+        }
+
+
+def calendar_rebalance_steps(dates, rebalancing):
+    """Steps (days elapsed) at whose close a calendar period ends, excluding the last date."""
+    months = REBALANCING_CALENDARS[rebalancing]
+    if months is None or len(dates) < 2:
+        return np.empty(0, dtype=np.int64)
+    periods = np.asarray(dates, dtype='datetime64[M]').astype(np.int64) // months
+    return np.flatnonzero(periods[1:] != periods[:-1]) + 1
+
+
+def run_backtest(
+    dates,
+    log_returns,
+    weights,
+    rebalancing='quarterly',
+    drift_tolerance=None,
+    initial_investment=100_000,
+    transaction_cost=0.0,
+    risk_free_rate=0.0,
+):
+    """Backtest target ``weights`` (N,) over (T x N) daily ``log_returns`` ending on ``dates``.
+
+    ``transaction_cost`` is charged on the traded value at every rebalance.
+    """
+    if rebalancing not in REBALANCING_CALENDARS:
+        raise ValueError(f'Unknown rebalancing frequency {rebalancing!r}; expected one of {", ".join(REBALANCING_CALENDARS)}.')
+    weights = np.asarray(weights, dtype=np.float64)
+    if (weights < 0).any() or weights.sum() <= 0:
+        raise ValueError('Weights must be non-negative and not all zero.')
+    weights = weights / weights.sum()
+    steps = len(dates)
+
+    # cumulative[k] is the log growth of each holding after k days.
+    cumulative = np.vstack([np.zeros((1, len(weights))), np.cumsum(log_returns, axis=0)])
+    calendar = calendar_rebalance_steps(dates, rebalancing)
+    equity = np.empty(steps)
+    rebalances = []
+    turnover = 0.0
+
+    holdings = weights * initial_investment
+    position = 0
+    while position < steps:
+        following = calendar[calendar > position]
+        end = int(following[0]) if len(following) else steps
+        growth = np.exp(cumulative[position + 1:end + 1] - cumulative[position])
+        values = growth * holdings
+        totals = values.sum(axis=1)
+        if drift_tolerance is not None:
+            breached = np.flatnonzero((np.abs(values / totals[:, None] - weights) > drift_tolerance).any(axis=1))
+            if len(breached):
+                end = position + int(breached[0]) + 1
+        equity[position:end] = totals[:end - position]
+        if end >= steps:
+            break
+
+        drifted = values[end - position - 1] / totals[end - position - 1]
+        traded = np.abs(weights - drifted).sum()
+        turnover += traded / 2
+        holdings = weights * equity[end - 1] * (1 - transaction_cost * traded)
+        equity[end - 1] = holdings.sum()
+        rebalances.append(end - 1)
+        position = end
+
+    return _result(dates, equity, np.asarray(dates)[rebalances], turnover, initial_investment, risk_free_rate)
+
+
+def _result(dates, equity, rebalance_dates, turnover, initial_investment, risk_free_rate):
+    curve = np.r_[initial_investment, equity]
+    peaks = np.maximum.accumulate(curve)[1:]
+    drawdown = equity / peaks - 1
+    daily = curve[1:] / curve[:-1] - 1
+    total_return = float(equity[-1] / initial_investment - 1) if len(equity) else 0.0
+
+    years = len(equity) / TRADING_DAYS
+    annualized_return = float((1 + total_return) ** (1 / years) - 1) if len(equity) and total_return > -1 else None
+    volatility = sharpe_ratio = None
+    if len(daily) > 1:
+        volatility = float(daily.std(ddof=1) * np.sqrt(TRADING_DAYS))
+        if volatility > 0:
+            sharpe_ratio = float((daily.mean() * TRADING_DAYS - risk_free_rate) / volatility)
+    return BacktestResult(
+        dates=np.asarray(dates, dtype='datetime64[D]'),
+        equity=equity,
+        drawdown=drawdown,
+        rebalance_dates=np.asarray(rebalance_dates, dtype='datetime64[D]'),
+        turnover=float(turnover),
+        initial_investment=float(initial_investment),
+        total_return=total_return,
+        annualized_return=annualized_return,
+        volatility=volatility,
+        sharpe_ratio=sharpe_ratio,
+        max_drawdown=float(drawdown.min()) if len(drawdown) else 0.0,
+    )
+
+
+def backtest_strategies(dataset_key, strategies, start=None, end=None, **options):
+    """Backtest ``{name: {stock_id: weight}}`` strategies over one aligned returns matrix.
+
+    Returns ``(results, missing)``: a result per strategy and the stock ids
+    without prices in the window, whose weight is spread over the others.
+    """
+    stock_ids = sorted({stock_id for weights in strategies.values() for stock_id in weights})
+    matrix = returns_matrix(dataset_key, stock_ids, start, end, missing='ffill')
+    if len(matrix) < 1:
+        raise ValueError('Not enough price history to backtest these holdings.')
+    columns = {stock_id: index for index, stock_id in enumerate(matrix.stock_ids)}
+
+    results = {}
+    for name, targets in strategies.items():
+        weights = np.zeros(len(columns))
+        for stock_id, weight in targets.items():
+            if stock_id in columns:
+                weights[columns[stock_id]] = weight
+        # Only the strategy's own holdings take part in its walk.
+        held = np.flatnonzero(weights)
+        if not len(held):
+            raise ValueError(f'None of the holdings of {name!r} have prices in the window.')
+        # A late listing held by another strategy must not shorten this one's window.
+        returns = matrix.returns[:, held]
+        complete = ~np.isnan(returns).any(axis=1)
+        if not complete.any():
+            raise ValueError(f'Not enough shared price history to backtest {name!r}.')
+        first = int(np.argmax(complete))
+        results[name] = run_backtest(matrix.dates[first:], returns[first:], weights[held], **options)
+    return results, matrix.missing
@@ -0,0 +1,214 @@
+"""K-Means clustering of companies for the Cluster-Based fund strategy.
+
+``feature_matrix`` builds a standardized (N x F) matrix from stock
+fundamentals: market cap on a log scale, the other ratios clipped to their
+1st-99th percentile range, every column scaled to zero mean and unit
+variance, and missing values imputed at the column mean (zero). With
+``include_returns`` each stock also gets its loadings on the leading
+principal components of the return correlation matrix, so stocks that
+trade together land together.
+
+``kmeans`` is Lloyd's algorithm with k-means++ seeding, all distances
+computed as one matrix expression per iteration. Universes larger than
+``MINI_BATCH_THRESHOLD`` use mini-batch updates (Sculley, 2010) followed by
+a full assignment pass. ``cluster_universe`` caches assignments per dataset
+generation, universe, ``k``, features and seed.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from .response_cache import cached_payload
+from .returns import returns_matrix
+
+FEATURES = (
+    'market_cap',
+    'pe_ratio',
+    'price_to_book',
+    'price_to_sales',
+    'dividend_yield',
+    'total_debt_to_total_capital',
+)
+LOG_FEATURES = ('market_cap',)
+RETURN_COMPONENTS = 3
+
+MIN_CLUSTERS = 3
+MAX_CLUSTERS = 15
+N_INIT = 4
+MAX_ITERATIONS = 100
+MINI_BATCH_THRESHOLD = 10_000
+MINI_BATCH_SIZE = 1024
+
+
+@dataclass
+class ClusteringResult:
+    stock_ids: list
+    labels: np.ndarray
+    centers: np.ndarray  # in standardized feature space
+    features: tuple
+    inertia: float
+    excluded: list  # stock ids without any usable feature
+
+
+def _standardize(column):
+    present = ~np.isnan(column)
+    result = np.zeros_like(column)
+    if present.sum() < 2:
+        return result
+    low, high = np.percentile(column[present], [1, 99])
+    clipped = np.clip(column[present], low, high)
+    spread = clipped.std()
+    if spread > 0:
+        result[present] = (clipped - clipped.mean()) / spread
+    return result
+
+
+def feature_matrix(rows, features=FEATURES):
+    """Standardize ``rows`` of ``(stock_id, *features)``; return (ids, matrix, excluded ids)."""
+    stock_ids = [row[0] for row in rows]
+    raw = np.array(
+        [[np.nan if value is None else float(value) for value in row[1:]] for row in rows],
+        dtype=np.float64,
+    ).reshape(len(rows), len(features))
+    for index, name in enumerate(features):
+        if name in LOG_FEATURES:
+            column = raw[:, index]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                raw[:, index] = np.where(column > 0, np.log10(column), np.nan)
+    usable = ~np.isnan(raw).all(axis=1)
+    matrix = np.column_stack([_standardize(raw[usable, index]) for index in range(len(features))]) if len(features) else np.empty((int(usable.sum()), 0))
+    kept = [stock_id for stock_id, keep in zip(stock_ids, usable) if keep]
+    excluded = [stock_id for stock_id, keep in zip(stock_ids, usable) if not keep]
+    return kept, matrix, excluded
+
+
+def return_components(dataset_key, stock_ids, start=None, end=None, components=RETURN_COMPONENTS):
+    """Loadings of each stock on the leading principal components of return correlations.
+
+    Stocks without enough history get zero loadings.
+    """
+    loadings = np.zeros((len(stock_ids), components))
+    matrix = returns_matrix(dataset_key, stock_ids, start, end, missing='pairwise')
+    if len(matrix.stock_ids) < 2:
+        return loadings
+    correlation = np.nan_to_num(matrix.correlation)
+    np.fill_diagonal(correlation, 1.0)
+    eigenvalues, eigenvectors = np.linalg.eigh(correlation)
+    top = np.argsort(eigenvalues)[::-1][:components]
+    values = eigenvectors[:, top] * np.sqrt(np.clip(eigenvalues[top], 0, None))
+    rows = {stock_id: index for index, stock_id in enumerate(stock_ids)}
+    for column, stock_id in enumerate(matrix.stock_ids):
+        loadings[rows[stock_id], :values.shape[1]] = values[column]
+    return np.column_stack([_standardize(loadings[:, index]) for index in range(components)])
+
+
+def _squared_distances(points, centers):
+    distances = (points ** 2).sum(axis=1)[:, None] - 2 * points @ centers.T + (centers ** 2).sum(axis=1)
+    return np.maximum(distances, 0)
+
+
+def _cluster_sums(points, labels, k):
+    """Per-cluster sums of ``points`` and member counts."""
+    counts = np.bincount(labels, minlength=k)
+    sums = np.column_stack([np.bincount(labels, weights=points[:, index], minlength=k) for index in range(points.shape[1])])
+    return sums.reshape(k, points.shape[1]), counts
+
+
+def _kmeans_plus_plus(points, k, rng):
+    centers = np.empty((k, points.shape[1]))
+    centers[0] = points[rng.integers(len(points))]
+    closest = _squared_distances(points, centers[:1])[:, 0]
+    for index in range(1, k):
+        total = closest.sum()
+        choice = rng.choice(len(points), p=closest / total) if total > 0 else rng.integers(len(points))
+        centers[index] = points[choice]
+        closest = np.minimum(closest, _squared_distances(points, centers[index:index + 1])[:, 0])
+    return centers
+
+
+def _lloyd(points, centers):
+    for _ in range(MAX_ITERATIONS):
+        labels = _squared_distances(points, centers).argmin(axis=1)
+        sums, counts = _cluster_sums(points, labels, len(centers))
+        # Empty clusters keep their previous center.
+        updated = np.where(counts[:, None] > 0, sums / np.maximum(counts, 1)[:, None], centers)
+        if np.allclose(updated, centers):
+            centers = updated
+            break
+        centers = updated
+    return centers
+
+
+def _mini_batch(points, centers, rng, iterations=MAX_ITERATIONS):
+    counts = np.zeros(len(centers))
+    for _ in range(iterations):
+        batch = points[rng.integers(len(points), size=MINI_BATCH_SIZE)]
+        labels = _squared_distances(batch, centers).argmin(axis=1)
+        sums, batch_counts = _cluster_sums(batch, labels, len(centers))
+        counts += batch_counts
+        # Per-center learning rate 1 / count, applied to the whole batch at once.
+        seen = batch_counts > 0
+        centers[seen] += (sums[seen] - batch_counts[seen, None] * centers[seen]) / counts[seen, None]
+    return centers
+
+
+def kmeans(points, k, seed=0, n_init=N_INIT):
+    """Cluster ``points`` into ``k`` groups; return (labels, centers, inertia)."""
+    if not 1 <= k <= len(points):
+        raise ValueError(f'Cannot form {k} clusters from {len(points)} stocks.')
+    rng = np.random.default_rng(seed)
+    best = None
+    for _ in range(n_init):
+        centers = _kmeans_plus_plus(points, k, rng)
+        if len(points) > MINI_BATCH_THRESHOLD:
+            centers = _mini_batch(points, centers, rng)
+        else:
+            centers = _lloyd(points, centers)
+        distances = _squared_distances(points, centers)
+        labels = distances.argmin(axis=1)
+        inertia = float(distances[np.arange(len(points)), labels].sum())
+        if best is None or inertia < best[2]:
+            best = (labels, centers, inertia)
+    return best
+
+
+def cluster_stocks(rows, k, features=FEATURES, return_loadings=None, seed=0):
+    """Cluster ``(stock_id, *features)`` rows, optionally with return loadings aligned to the rows."""
+    stock_ids, matrix, excluded = feature_matrix(rows, features)
+    names = tuple(features)
+    if return_loadings is not None:
+        usable = set(stock_ids)
+        matrix = np.column_stack([matrix, return_loadings[[row[0] in usable for row in rows]]])
+        names += tuple(f'return_component_{index + 1}' for index in range(return_loadings.shape[1]))
+    labels, centers, inertia = kmeans(matrix, k, seed)
+    # Number clusters by size so labels are stable across equivalent runs.
+    order = np.argsort(-np.bincount(labels, minlength=k), kind='stable')
+    relabel = np.empty(k, dtype=np.int64)
+    relabel[order] = np.arange(k)
+    return ClusteringResult(
+        stock_ids=stock_ids,
+        labels=relabel[labels],
+        centers=centers[order],
+        features=names,
+        inertia=inertia,
+        excluded=excluded,
+    )
+
+
+def cluster_universe(dataset_key, rows, k, features=FEATURES, include_returns=False, start=None, end=None, seed=0):
+    """Cached ``cluster_stocks`` over ``(stock_id, *features)`` rows."""
+    params = {
+        'stocks': ','.join(str(row[0]) for row in rows),
+        'k': k,
+        'features': ','.join(features),
+        'returns': include_returns,
+        'start': start.isoformat() if start and include_returns else None,
+        'end': end.isoformat() if end and include_returns else None,
+        'seed': seed,
+    }
+
+    def build():
+        loadings = return_components(dataset_key, [row[0] for row in rows], start, end) if include_returns else None
+        return cluster_stocks(rows, k, features, loadings, seed)
+
+    return cached_payload('clusters', dataset_key, params, build)
@@ -0,0 +1,97 @@
+"""Server-side reduction of daily price series for charting.
+
+``resample_ohlc`` folds daily bars into weekly (ISO, Monday-based) or monthly
+bars: first open, highest high, lowest low, last close and adjusted close,
+summed volume, dated by the bucket's first trading day. ``lttb`` keeps a
+fixed number of bars chosen by Largest-Triangle-Three-Buckets on the close
+line, which preserves the visual shape of a chart far better than taking
+every n-th bar. Both work on ``PriceSeries`` arrays without per-bar objects.
+"""
+import numpy as np
+
+from .price_store import PRICE_COLUMNS, PriceSeries
+
+RESOLUTIONS = ('daily', 'weekly', 'monthly')
+MIN_POINTS = 3
+
+_CLOSE = PRICE_COLUMNS.index('close_price')
+_OPEN = PRICE_COLUMNS.index('open_price')
+_HIGH = PRICE_COLUMNS.index('high_price')
+_LOW = PRICE_COLUMNS.index('low_price')
+_ADJUSTED = PRICE_COLUMNS.index('adjusted_close')
+_VOLUME = PRICE_COLUMNS.index('volume')
+
+
+def _bucket_keys(dates, resolution):
+    days = np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+    if resolution == 'weekly':
+        # Day 0 (1970-01-01) is a Thursday; shift so weeks start on Monday.
+        return (days + 3) // 7
+    return np.asarray(dates, dtype='datetime64[D]').astype('datetime64[M]').astype(np.int64)
+
+
+def resample_ohlc(series, resolution):
+    """Aggregate daily bars into ``weekly`` or ``monthly`` bars (``daily`` is a no-op)."""
+    if resolution == 'daily' or len(series) < 2:
+        return series
+    keys = _bucket_keys(series.dates, resolution)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)] - 1
+
+    values = np.asarray(series.values)
+    result = np.empty((len(PRICE_COLUMNS), len(starts)), dtype=np.float64)
+    result[_OPEN] = values[_OPEN, starts]
+    result[_CLOSE] = values[_CLOSE, ends]
+    result[_ADJUSTED] = values[_ADJUSTED, ends]
+    # fmax/fmin skip NaN and only yield NaN when a whole bucket is missing.
+    result[_HIGH] = np.fmax.reduceat(values[_HIGH], starts)
+    result[_LOW] = np.fmin.reduceat(values[_LOW], starts)
+    volume = values[_VOLUME]
+    present = np.add.reduceat(~np.isnan(volume), starts)
+    result[_VOLUME] = np.where(present > 0, np.add.reduceat(np.nan_to_num(volume), starts), np.nan)
+    return PriceSeries(np.asarray(series.dates[starts], dtype='datetime64[D]'), result)
+
+
+def lttb_indices(x, y, threshold):
+    """Return the indices LTTB keeps when reducing ``(x, y)`` to ``threshold`` points."""
+    count = len(x)
+    if threshold >= count or threshold < MIN_POINTS:
+        return np.arange(count)
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, count - 1
+    # Interior points are split into threshold - 2 buckets of roughly equal size.
+    edges = np.floor(np.linspace(1, count - 1, threshold - 1)).astype(np.int64)
+    previous = 0
+    for bucket in range(threshold - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < threshold - 1:
+            next_lo, next_hi = edges[bucket + 1], edges[bucket + 2]
+            avg_x, avg_y = x[next_lo:next_hi].mean(), y[next_lo:next_hi].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+        # Twice the triangle area; the constant factor does not change the argmax.
+        areas = np.abs((x[previous] - avg_x) * (y[lo:hi] - y[previous]) - (x[previous] - x[lo:hi]) * (avg_y - y[previous]))
+        previous = lo + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def lttb(series, points):
+    """Keep ``points`` bars chosen by LTTB on the close; bars without a close are dropped."""
+    if points >= len(series):
+        return series
+    close = np.asarray(series.values[_CLOSE])
+    valid = np.flatnonzero(~np.isnan(close))
+    x = np.asarray(series.dates, dtype='datetime64[D]').astype(np.float64)[valid]
+    keep = valid[lttb_indices(x, close[valid], points)]
+    return PriceSeries(np.asarray(series.dates[keep], dtype='datetime64[D]'), np.asarray(series.values[:, keep]))
+
+
+def downsample(series, resolution='daily', points=None):
+    """Resample to ``resolution`` first, then thin to at most ``points`` bars."""
+    series = resample_ohlc(series, resolution)
+    if points:
+        series = lttb(series, points)
+    # Plain arrays, so results can be pickled into the cache even when the input was memory-mapped.
+    return PriceSeries(np.asarray(series.dates, dtype='datetime64[D]'), np.asarray(series.values, dtype=np.float64))
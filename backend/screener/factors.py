@@ -0,0 +1,201 @@
+"""Cross-sectional factor scores for the Factor-Based fund strategy.
+
+Every stock is scored against the other stocks of its sector (stocks without
+a sector form one more group) on four factors:
+
+``value``
+    earnings, book and sales yields (the inverses of P/E, P/B and P/S).
+``quality``
+    low debt to total capital and the health label, on an ordinal scale.
+``momentum``
+    trailing 3-month, 6-month and 12-month-skipping-the-last-month returns,
+    read from the closes kept in each stock's indicator state, so no price
+    history is loaded.
+``size``
+    log market cap; larger companies score higher.
+
+Each input is turned into a z-score within its sector, clipped to
+``Z_LIMIT``, and a factor's score is the mean of the z-scores its stock has.
+Ranks are percentiles (0-100, ties sharing the average) of the score within
+the sector. All sectors are scored at once: group means, deviations and rank
+positions come from ``bincount`` and one ``lexsort`` over the whole universe.
+``refresh_factor_scores`` writes the results to the ``FactorScore`` tables,
+whose indexed rank columns turn factor screens into plain lookups.
+"""
+import numpy as np
+from django.db import transaction
+
+from .indicators import WINDOW_COLUMNS
+from .models import (
+    AccessibleFactorScore,
+    AccessibleStock,
+    AccessibleStockIndicators,
+    FactorScore,
+    Stock,
+    StockIndicators,
+)
+
+DATASET_FACTOR_MODELS = {
+    'classifier': (Stock, StockIndicators, FactorScore),
+    'accessible': (AccessibleStock, AccessibleStockIndicators, AccessibleFactorScore),
+}
+
+FACTORS = ('value', 'quality', 'momentum', 'size')
+FUNDAMENTALS = ('pe_ratio', 'price_to_book', 'price_to_sales', 'total_debt_to_total_capital', 'health_label', 'market_cap')
+HEALTH_LABELS = {'weak': 0, 'fair': 1, 'good': 2, 'great': 3, 'excellent': 4}
+
+# Trailing returns in trading days: (days skipped at the end, days spanned)
+MOMENTUM_WINDOWS = {
+    'momentum_3m': (0, 63),
+    'momentum_6m': (0, 126),
+    'momentum_12_1': (21, 251),
+}
+_OFFSETS = sorted({offset for window in MOMENTUM_WINDOWS.values() for offset in window})
+
+Z_LIMIT = 3.0
+WRITE_BATCH_SIZE = 1000
+
+
+def _float(value):
+    return np.nan if value is None else float(value)
+
+
+def sector_codes(sector_ids):
+    """Dense group codes for ``sector_ids``; None is a group of its own."""
+    keys = np.array([-1 if sector_id is None else sector_id for sector_id in sector_ids], dtype=np.int64)
+    return np.unique(keys, return_inverse=True)[1].reshape(-1)
+
+
+def sector_zscores(values, groups, limit=Z_LIMIT):
+    """Z-score of each value within its group, clipped to +-``limit``; NaN stays NaN."""
+    present = ~np.isnan(values)
+    size = int(groups.max()) + 1 if len(groups) else 0
+    counts = np.bincount(groups[present], minlength=size)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.bincount(groups[present], weights=values[present], minlength=size) / counts
+        deviations = values - means[groups]
+        spreads = np.sqrt(np.bincount(groups[present], weights=deviations[present] ** 2, minlength=size) / counts)
+        scores = np.where(spreads[groups] > 0, deviations / spreads[groups], 0.0)
+    scores[~present] = np.nan
+    return np.clip(scores, -limit, limit)
+
+
+def sector_percentiles(values, groups):
+    """Percentile rank (0-100) of each value within its group; NaN stays NaN."""
+    ranks = np.full(len(values), np.nan)
+    present = np.flatnonzero(~np.isnan(values))
+    if not len(present):
+        return ranks
+    order = present[np.lexsort((values[present], groups[present]))]
+    ordered_groups, ordered_values = groups[order], values[order]
+    positions = np.arange(len(order))
+
+    group_starts = np.r_[True, ordered_groups[1:] != ordered_groups[:-1]]
+    first_in_group = np.maximum.accumulate(np.where(group_starts, positions, 0))
+    # Runs of equal values inside a group share the mean of their positions.
+    run_starts = group_starts | np.r_[True, ordered_values[1:] != ordered_values[:-1]]
+    first_in_run = positions[run_starts]
+    last_in_run = np.r_[first_in_run[1:], len(order)] - 1
+    run = np.cumsum(run_starts) - 1
+    position = (first_in_run[run] + last_in_run[run]) / 2 - first_in_group
+
+    counts = np.bincount(ordered_groups)[ordered_groups]
+    ranks[order] = np.where(counts > 1, position / np.maximum(counts - 1, 1) * 100, 50.0)
+    return ranks
+
+
+def _mean_score(components):
+    """Mean of the non-NaN rows of ``components`` (inputs x stocks); NaN where none."""
+    stacked = np.vstack(components)
+    present = ~np.isnan(stacked)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(present, stacked, 0).sum(axis=0) / present.sum(axis=0)
+
+
+def window_closes(rolling_window):
+    """Closes ``_OFFSETS`` trading days before the last bar of a stored indicator window."""
+    closes = np.frombuffer(bytes(rolling_window), dtype='<f8').reshape(len(WINDOW_COLUMNS), -1)[0]
+    picked = np.full(len(_OFFSETS), np.nan)
+    available = [index for index, offset in enumerate(_OFFSETS) if offset < len(closes)]
+    picked[available] = closes[[-1 - _OFFSETS[index] for index in available]]
+    return picked
+
+
+def momentum_returns(closes):
+    """Trailing returns from an (N x len(_OFFSETS)) matrix of ``window_closes`` rows."""
+    returns = {}
+    for name, (skip, span) in MOMENTUM_WINDOWS.items():
+        latest = closes[:, _OFFSETS.index(skip)]
+        earliest = closes[:, _OFFSETS.index(span)]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            returns[name] = np.where((latest > 0) & (earliest > 0), latest / earliest - 1, np.nan)
+    return returns
+
+
+def compute_factor_scores(rows, closes=None):
+    """Score ``(stock_id, sector_id, *FUNDAMENTALS)`` rows.
+
+    ``closes`` maps stock ids to their ``window_closes``. Returns the stock
+    ids and a dict of per-stock arrays named like the ``FactorScore`` fields.
+    """
+    closes = closes or {}
+    stock_ids = [row[0] for row in rows]
+    groups = sector_codes([row[1] for row in rows])
+    columns = {
+        name: np.array([_float(row[index]) for row in rows], dtype=np.float64)
+        for index, name in enumerate(FUNDAMENTALS, start=2)
+        if name != 'health_label'
+    }
+    # Unrecognized labels (e.g. "UNAVAILABLE") count as missing.
+    health = np.array([HEALTH_LABELS.get(str(row[6] or '').strip().lower(), np.nan) for row in rows], dtype=np.float64)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        earnings_yield = np.where(columns['pe_ratio'] != 0, 1 / columns['pe_ratio'], np.nan)
+        book_yield = np.where(columns['price_to_book'] > 0, 1 / columns['price_to_book'], np.nan)
+        sales_yield = np.where(columns['price_to_sales'] > 0, 1 / columns['price_to_sales'], np.nan)
+        log_cap = np.where(columns['market_cap'] > 0, np.log10(columns['market_cap']), np.nan)
+
+    empty = np.full(len(_OFFSETS), np.nan)
+    momentum = momentum_returns(np.array([closes.get(stock_id, empty) for stock_id in stock_ids]).reshape(len(rows), len(_OFFSETS)))
+
+    components = {
+        'value': [earnings_yield, book_yield, sales_yield],
+        'quality': [-columns['total_debt_to_total_capital'], health],
+        'momentum': list(momentum.values()),
+        'size': [log_cap],
+    }
+    scores = dict(momentum)
+    for factor in FACTORS:
+        score = _mean_score([sector_zscores(values, groups) for values in components[factor]])
+        scores[f'{factor}_score'] = score
+        scores[f'{factor}_rank'] = sector_percentiles(score, groups)
+    return stock_ids, scores
+
+
+def refresh_factor_scores(dataset_key):
+    """Recompute and store factor scores for every stock of the dataset; return the count."""
+    stock_model, indicator_model, score_model = DATASET_FACTOR_MODELS[dataset_key]
+    rows = list(stock_model.objects.order_by('pk').values_list('pk', 'sector_id', *FUNDAMENTALS))
+    closes = {
+        stock_id: window_closes(window)
+        for stock_id, window in indicator_model.objects.values_list('stock_id', 'rolling_window').iterator(chunk_size=WRITE_BATCH_SIZE)
+    }
+    stock_ids, scores = compute_factor_scores(rows, closes)
+
+    names = list(scores)
+    records = [
+        score_model(stock_id=stock_id, **{
+            name: None if np.isnan(scores[name][index]) else float(scores[name][index])
+            for name in names
+        })
+        for index, stock_id in enumerate(stock_ids)
+    ]
+    with transaction.atomic():
+        score_model.objects.bulk_create(
+            records,
+            batch_size=WRITE_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['stock'],
+            update_fields=[*names, 'computed_at'],
+        )
+    return len(records)
@@ -0,0 +1,401 @@
+"""Fund construction for every strategy selected on the fund parameters page.
+
+``parse_fund_request`` validates the page's payload (``selected_strategies``,
+``general_params``, ``diversification_constraints``, ``strategy_specific``)
+into a normalized spec. ``build_funds`` loads the candidate universe (the
+largest ``CANDIDATE_LIMIT`` stocks by market cap matching the filters) and
+one pairwise returns matrix over it, then builds each selected fund in a
+worker process: selecting holdings, weighting them within the per-stock
+bounds and simulating the fund with ``simulate_portfolio``. Workers get only
+arrays, never the database. Each strategy simulates from a seed derived from
+the request's seed and the strategy, so a fund does not depend on the number
+of workers or on which other strategies were selected.
+
+Responses are cached per dataset generation under a hash of the normalized
+spec, so an unchanged rerun is answered from the cache.
+"""
+import json
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+import numpy as np
+from django.db.models import F
+
+from .clustering import FEATURES as CLUSTER_FEATURES, MAX_CLUSTERS, MIN_CLUSTERS, cluster_stocks
+from .factors import FACTORS
+from .monte_carlo import DEFAULT_PATHS, METHODS, REBALANCING_PERIODS, simulate_portfolio
+from .optimizer import OBJECTIVES, check_bounds, optimize_weights, project
+from .response_cache import cached_payload
+from .returns import ReturnsMatrix, returns_matrix
+
+STRATEGIES = ('market_cap', 'equal_weight', 'factor_based', 'risk_optimized', 'cluster_based')
+SELECTION_METHODS = ('random', 'diversified')
+
+CANDIDATE_LIMIT = 300
+MIN_OBSERVATIONS = 60  # daily returns a stock needs to be simulated
+DEFAULT_HISTORY_DAYS = 3 * 365
+MAX_HOLDINGS = 100
+MAX_PATHS = 50_000
+
+_UNIVERSE_FILTERS = ('exchange', 'sector', 'industry', 'country')
+
+
+@dataclass
+class Universe:
+    """Candidate stocks, in descending market cap order, and their aligned returns."""
+    stock_ids: list
+    tickers: list
+    names: list
+    sectors: list
+    industries: list
+    market_caps: np.ndarray  # NaN where unknown
+    features: list  # (stock_id, *CLUSTER_FEATURES) rows for clustering
+    factor_ranks: dict  # factor -> percentile ranks, NaN where unscored
+    returns: ReturnsMatrix  # one column per stock, covariance cleaned to be positive semi-definite
+
+    def __len__(self):
+        return len(self.stock_ids)
+
+
+def _section(payload, name):
+    value = payload.get(name) or {}
+    if not isinstance(value, dict):
+        raise ValueError(f'"{name}" must be an object.')
+    return value
+
+
+def _number(section, name, default, low, high, cast=float):
+    raw = section.get(name, default)
+    try:
+        value = cast(raw)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be a number.')
+    if not low <= value <= high:
+        raise ValueError(f'{name} must be between {low} and {high}.')
+    return value
+
+
+def _choice(section, name, default, choices):
+    value = str(section.get(name) or default).lower()
+    if value not in choices:
+        raise ValueError(f'Unknown {name} {value!r}; expected one of {", ".join(choices)}.')
+    return value
+
+
+def _iso_date(value, name):
+    if value in (None, ''):
+        return None
+    try:
+        return date.fromisoformat(str(value)).isoformat()
+    except ValueError:
+        raise ValueError(f'{name} must be a date in YYYY-MM-DD format.')
+
+
+def parse_fund_request(payload):
+    """Validate a build request into a normalized, JSON-serializable spec."""
+    if not isinstance(payload, dict):
+        raise ValueError('The request body must be a JSON object.')
+    strategies = payload.get('selected_strategies')
+    if not isinstance(strategies, list) or not strategies:
+        raise ValueError('selected_strategies must list at least one strategy.')
+    unknown = [name for name in strategies if name not in STRATEGIES]
+    if unknown:
+        raise ValueError(f'Unknown strategies: {", ".join(map(str, unknown))}. Expected any of: {", ".join(STRATEGIES)}.')
+
+    general = _section(payload, 'general_params')
+    constraints = _section(payload, 'diversification_constraints')
+    specific = _section(payload, 'strategy_specific')
+    simulation = _section(payload, 'simulation')
+    universe = _section(payload, 'universe')
+
+    spec = {
+        'strategies': [name for name in STRATEGIES if name in strategies],
+        'num_holdings': _number(general, 'num_holdings', 25, 1, MAX_HOLDINGS, int),
+        'years': _number(general, 'investment_horizon_years', 4, 1, 10),
+        'initial_investment': _number(general, 'initial_investment', 100_000, 1, 1e12),
+        'rebalancing': _choice(general, 'rebalancing_frequency', 'quarterly', tuple(REBALANCING_PERIODS)),
+        'min_weight': _number(constraints, 'min_weight_per_stock', 3, 0, 100) / 100,
+        'max_weight': _number(constraints, 'max_weight_per_stock', 5, 0, 100) / 100,
+        'universe': {
+            name: str(universe[name]) for name in _UNIVERSE_FILTERS if universe.get(name)
+        },
+        'start': _iso_date(payload.get('start'), 'start'),
+        'end': _iso_date(payload.get('end'), 'end'),
+        'paths': _number(simulation, 'paths', DEFAULT_PATHS, 100, MAX_PATHS, int),
+        'method': _choice(simulation, 'method', 'normal', METHODS),
+        'seed': _number(simulation, 'seed', 0, 0, 2 ** 32 - 1, int),
+        'config': {},
+    }
+    if payload.get('sector_filter'):
+        spec['universe'].setdefault('sector', str(payload['sector_filter']))
+    check_bounds(spec['num_holdings'], spec['min_weight'], spec['max_weight'])
+
+    for name in spec['strategies']:
+        section = _section(specific, name)
+        if name == 'equal_weight':
+            config = {
+                'selection_method': _choice(section, 'selection_method', 'random', SELECTION_METHODS),
+                'seed': _number(section, 'seed', spec['seed'], 0, 2 ** 32 - 1, int),
+            }
+        elif name == 'factor_based':
+            primary = str(section.get('primary_factor') or 'value').lower()
+            secondary = str(section.get('secondary_factor') or '').lower() or None
+            for factor in filter(None, (primary, secondary)):
+                if factor not in FACTORS:
+                    raise ValueError(f'Factor {factor!r} is not scored; expected one of {", ".join(FACTORS)}.')
+            if primary == secondary:
+                raise ValueError('primary_factor and secondary_factor must be different.')
+            split = section.get('factor_split') or [70, 30]
+            try:
+                primary_share, secondary_share = (float(value) for value in split)
+            except (TypeError, ValueError):
+                raise ValueError('factor_split must be a [primary, secondary] pair of percentages.')
+            if min(primary_share, secondary_share) < 0 or primary_share + secondary_share <= 0:
+                raise ValueError('factor_split must be non-negative and not all zero.')
+            config = {
+                'primary_factor': primary,
+                'secondary_factor': secondary,
+                'primary_weight': primary_share / (primary_share + secondary_share) if secondary else 1.0,
+            }
+        elif name == 'risk_optimized':
+            objective = _choice(section, 'objective', 'max_sharpe', OBJECTIVES)
+            config = {
+                'objective': objective,
+                'risk_free_rate': _number(section, 'risk_free_rate', 4.5, 0, 10) / 100,
+            }
+            if objective == 'target_return':
+                config['target_return'] = _number(section, 'target_return', 12, -100, 1000) / 100
+            elif objective == 'multi_objective':
+                return_weight = _number(section, 'return_weight', 60, 0, 100)
+                risk_weight = _number(section, 'risk_weight', 40, 0, 100)
+                if return_weight + risk_weight <= 0:
+                    raise ValueError('return_weight and risk_weight cannot both be zero.')
+                config['return_weight'] = return_weight / (return_weight + risk_weight)
+                config['risk_weight'] = risk_weight / (return_weight + risk_weight)
+        elif name == 'cluster_based':
+            config = {'num_clusters': _number(section, 'num_clusters', min(8, spec['num_holdings']), MIN_CLUSTERS, MAX_CLUSTERS, int)}
+            if config['num_clusters'] > spec['num_holdings']:
+                raise ValueError('num_clusters cannot exceed num_holdings.')
+        else:
+            config = {}
+        spec['config'][name] = config
+    return spec
+
+
+def _positive_semidefinite(covariance):
+    """Zero pairs without shared dates and clip negative eigenvalues of a pairwise covariance."""
+    covariance = np.nan_to_num(covariance)
+    eigenvalues, eigenvectors = np.linalg.eigh((covariance + covariance.T) / 2)
+    return (eigenvectors * np.clip(eigenvalues, 0, None)) @ eigenvectors.T
+
+
+def _subset(matrix, columns):
+    return ReturnsMatrix(
+        dates=matrix.dates,
+        stock_ids=[matrix.stock_ids[column] for column in columns],
+        missing=[],
+        returns=matrix.returns[:, columns],
+        mean=matrix.mean[columns],
+        volatility=matrix.volatility[columns],
+        covariance=matrix.covariance[np.ix_(columns, columns)],
+    )
+
+
+def load_universe(dataset_key, queryset, start, end):
+    """Candidates from ``queryset`` with at least ``MIN_OBSERVATIONS`` returns; also the excluded count."""
+    rank_fields = [f'factor_scores__{factor}_rank' for factor in FACTORS]
+    rows = list(
+        queryset.order_by(F('market_cap').desc(nulls_last=True), 'pk')
+        .values_list('pk', 'ticker', 'company_name', 'sector__name', 'industry_id', *CLUSTER_FEATURES, *rank_fields)[:CANDIDATE_LIMIT]
+    )
+    matrix = returns_matrix(dataset_key, [row[0] for row in rows], start, end, missing='pairwise')
+    observations = np.count_nonzero(~np.isnan(matrix.returns), axis=0)
+    usable = {stock_id for stock_id, count in zip(matrix.stock_ids, observations) if count >= MIN_OBSERVATIONS}
+    kept = [row for row in rows if row[0] in usable]
+
+    column_of = {stock_id: column for column, stock_id in enumerate(matrix.stock_ids)}
+    returns = _subset(matrix, [column_of[row[0]] for row in kept])
+    returns.covariance = _positive_semidefinite(returns.covariance)
+    returns.volatility = np.sqrt(np.diag(returns.covariance))
+
+    feature_end = 5 + len(CLUSTER_FEATURES)
+    cap_index = 5 + CLUSTER_FEATURES.index('market_cap')
+    universe = Universe(
+        stock_ids=[row[0] for row in kept],
+        tickers=[row[1] for row in kept],
+        names=[row[2] for row in kept],
+        sectors=[row[3] for row in kept],
+        industries=[row[4] for row in kept],
+        market_caps=np.array([np.nan if row[cap_index] is None else float(row[cap_index]) for row in kept]),
+        features=[(row[0], *row[5:feature_end]) for row in kept],
+        factor_ranks={
+            factor: np.array([np.nan if row[feature_end + index] is None else row[feature_end + index] for row in kept], dtype=np.float64)
+            for index, factor in enumerate(FACTORS)
+        },
+        returns=returns,
+    )
+    return universe, len(rows) - len(kept)
+
+
+def _top(scores, count):
+    """Indices of the ``count`` highest non-NaN scores, best first (ties keep universe order)."""
+    present = np.flatnonzero(~np.isnan(scores))
+    return present[np.argsort(-scores[present], kind='stable')][:count]
+
+
+def _diversified(universe, count):
+    """Round-robin over industries, largest company of each first."""
+    seen = {}
+    turns = []
+    for industry in universe.industries:
+        turns.append(seen.get(industry, 0))
+        seen[industry] = turns[-1] + 1
+    return np.lexsort((np.arange(len(universe)), np.array(turns)))[:count]
+
+
+def _cluster_picks(universe, count, clusters, seed):
+    """Largest companies of each cluster, ``count // clusters`` apiece and the rest from the biggest clusters."""
+    result = cluster_stocks(universe.features, clusters, seed=seed)
+    row_of = {stock_id: index for index, stock_id in enumerate(universe.stock_ids)}
+    members = [[] for _ in range(clusters)]
+    for stock_id, label in zip(result.stock_ids, result.labels.tolist()):
+        members[label].append(row_of[stock_id])  # universe order is descending market cap
+    quotas = [count // clusters + (label < count % clusters) for label in range(clusters)]
+    picks = [index for label in range(clusters) for index in members[label][:quotas[label]]]
+    # Clusters smaller than their quota leave room for the next largest companies overall.
+    chosen = set(picks)
+    spare = [index for label in range(clusters) for index in members[label] if index not in chosen]
+    picks += sorted(spare)[:count - len(picks)]
+    return np.array(picks, dtype=np.int64)
+
+
+def _select(strategy, universe, spec, config):
+    """Return (row indices, raw weights) for ``strategy``."""
+    count = spec['num_holdings']
+    if strategy == 'market_cap':
+        rows = _top(universe.market_caps, count)
+        return rows, universe.market_caps[rows]
+    if strategy == 'equal_weight':
+        if config['selection_method'] == 'diversified':
+            rows = _diversified(universe, count)
+        else:
+            rng = np.random.default_rng(config['seed'])
+            rows = np.sort(rng.choice(len(universe), size=min(count, len(universe)), replace=False))
+        return rows, np.ones(len(rows))
+    if strategy == 'factor_based':
+        score = universe.factor_ranks[config['primary_factor']] * config['primary_weight']
+        if config['secondary_factor']:
+            # Stocks without a secondary rank count as the sector median.
+            secondary = np.nan_to_num(universe.factor_ranks[config['secondary_factor']], nan=50.0)
+            score = score + secondary * (1 - config['primary_weight'])
+        rows = _top(score, count)
+        return rows, np.ones(len(rows))
+    if strategy == 'risk_optimized':
+        returns = universe.returns
+        options = dict(config)
+        # Screen the whole universe with only the cap, then solve again over the chosen holdings.
+        screen = optimize_weights(returns.mean, returns.covariance, max_weight=max(spec['max_weight'], 1 / len(universe)), **options)
+        rows = np.sort(np.argsort(-screen.weights, kind='stable')[:count])
+        if len(rows) < count:
+            return rows, None
+        subset = np.ix_(rows, rows)
+        result = optimize_weights(
+            returns.mean[rows], returns.covariance[subset],
+            min_weight=spec['min_weight'], max_weight=spec['max_weight'], initial=screen.weights[rows], **options,
+        )
+        return rows, result.weights
+    return _cluster_picks(universe, count, config['num_clusters'], spec['seed']), None
+
+
+def _build_fund(task):
+    strategy, universe, spec, seed = task
+    try:
+        rows, weights = _select(strategy, universe, spec, spec['config'][strategy])
+        if len(rows) < spec['num_holdings']:
+            raise ValueError(
+                f'Only {len(rows)} stocks qualify for this strategy; {spec["num_holdings"]} holdings were requested.'
+            )
+        weights = np.ones(len(rows)) if weights is None else np.asarray(weights, dtype=np.float64)
+        weights = project(weights / weights.sum(), spec['min_weight'], spec['max_weight'])
+        returns = _subset(universe.returns, rows)
+        simulation = simulate_portfolio(
+            returns,
+            weights,
+            years=spec['years'],
+            initial_investment=spec['initial_investment'],
+            paths=spec['paths'],
+            method=spec['method'],
+            rebalancing=spec['rebalancing'],
+            seed=seed,
+        )
+    except ValueError as exc:
+        return {'error': str(exc)}
+
+    sector_weights = {}
+    for row, weight in zip(rows.tolist(), weights.tolist()):
+        sector = universe.sectors[row] or 'Unclassified'
+        sector_weights[sector] = sector_weights.get(sector, 0.0) + weight
+    order = np.argsort(-weights, kind='stable')
+    return {
+        'holdings': [
+            {
+                'id': universe.stock_ids[rows[index]],
+                'ticker': universe.tickers[rows[index]],
+                'company_name': universe.names[rows[index]],
+                'sector': universe.sectors[rows[index]],
+                'weight': round(float(weights[index]), 6),
+            }
+            for index in order.tolist()
+        ],
+        'statistics': {
+            'holdings': len(rows),
+            'expected_return': float(returns.mean @ weights),
+            'volatility': float(np.sqrt(max(weights @ returns.covariance @ weights, 0.0))),
+            'top_5_weight': float(np.sort(weights)[::-1][:5].sum()),
+            'sector_weights': dict(sorted(sector_weights.items(), key=lambda item: (-item[1], item[0]))),
+        },
+        'simulation': simulation.to_payload(),
+    }
+
+
+def _history_window(spec):
+    end = date.fromisoformat(spec['end']) if spec['end'] else date.today()
+    start = date.fromisoformat(spec['start']) if spec['start'] else end - timedelta(days=DEFAULT_HISTORY_DAYS)
+    if start >= end:
+        raise ValueError('start must be before end.')
+    return start, end
+
+
+def build_funds(dataset_key, spec, queryset, workers=1):
+    """Build and simulate every fund of ``spec`` over the stocks of ``queryset``; cached per spec."""
+    # Resolve the default window first so the cache key carries today's dates, not "until today".
+    start, end = _history_window(spec)
+    spec = {**spec, 'start': start.isoformat(), 'end': end.isoformat()}
+
+    def build():
+        universe, excluded = load_universe(dataset_key, queryset, start, end)
+        if not len(universe):
+            raise ValueError('No stocks in the universe have enough price history to simulate.')
+
+        seeds = dict(zip(STRATEGIES, np.random.SeedSequence(spec['seed']).spawn(len(STRATEGIES))))
+        tasks = [(name, universe, spec, seeds[name]) for name in spec['strategies']]
+        if workers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+                funds = list(executor.map(_build_fund, tasks))
+        else:
+            funds = [_build_fund(task) for task in tasks]
+
+        dates = universe.returns.dates
+        return {
+            'strategies': spec['strategies'],
+            'universe_size': len(universe),
+            'excluded': excluded,
+            'range': {
+                'start': dates[0].astype(date).isoformat() if len(dates) else None,
+                'end': dates[-1].astype(date).isoformat() if len(dates) else None,
+            },
+            'funds': dict(zip(spec['strategies'], funds)),
+        }
+
+    return cached_payload('fund_build', dataset_key, {'spec': json.dumps(spec, sort_keys=True)}, build)
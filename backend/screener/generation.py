@@ -0,0 +1,68 @@
+"""Dataset generation stamps shared by web workers and ingestion jobs.
+
+Data derived from a dataset (snapshots, cached responses) is tagged with the
+generation it was built from; writers call ``bump_generation`` to retire it.
+A bump also records when the dataset's stocks last changed (the latest
+``updated_at`` or ``prices_last_synced_at``), so responses can carry a
+``Last-Modified`` date without a query of their own.
+"""
+import time
+
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Max
+
+from .models import AccessibleStock, Stock
+
+STATE_CACHE_ALIAS = 'screener_state'
+DATASET_KEYS = ('classifier', 'accessible')
+DATASET_STOCK_MODELS = {'classifier': Stock, 'accessible': AccessibleStock}
+
+
+def _cache():
+    return caches[STATE_CACHE_ALIAS]
+
+
+def _key(dataset_key):
+    return f'screener:generation:{dataset_key}'
+
+
+def _modified_key(dataset_key):
+    return f'screener:modified:{dataset_key}'
+
+
+def _dataset_modified(dataset_key):
+    """Unix time of the latest ``updated_at``/``prices_last_synced_at`` of the dataset's stocks."""
+    latest = DATASET_STOCK_MODELS[dataset_key].objects.aggregate(
+        updated=Max('updated_at'), synced=Max('prices_last_synced_at'),
+    )
+    stamps = [value for value in latest.values() if value is not None]
+    return max(stamps).timestamp() if stamps else None
+
+
+def get_generation(dataset_key):
+    """Return the current generation stamp for a dataset (0 if never bumped)."""
+    return _cache().get(_key(dataset_key), 0)
+
+
+def get_last_modified(dataset_key):
+    """Return when the dataset last changed as of its latest bump (Unix time), or None."""
+    return _cache().get(_modified_key(dataset_key))
+
+
+def bump_generation(*dataset_keys):
+    """Mark datasets as changed; defaults to every dataset when none are given."""
+    # A nanosecond timestamp keeps stamps unique across processes without an
+    # atomic counter.
+    stamp = time.time_ns()
+    values = {}
+    for key in dataset_keys or DATASET_KEYS:
+        values[_key(key)] = stamp
+        values[_modified_key(key)] = _dataset_modified(key)
+    _cache().set_many(values, timeout=None)
+    return stamp
+
+
+def bump_generation_on_commit(*dataset_keys):
+    """Bump generations once the surrounding transaction commits."""
+    transaction.on_commit(lambda: bump_generation(*dataset_keys))
@@ -0,0 +1,156 @@
+"""Maintenance of the per-stock ``HistorySummary`` tables.
+
+A summary holds what the profile endpoint needs from a stock's history: the
+date span, the all-time high and low close (with the dates they occurred, so
+later writes can tell whether they are still valid) and the latest two bars.
+``apply_new_bars`` folds freshly written bars into an existing summary without
+reading history back; ``rebuild_summaries`` recomputes summaries from the
+stored rows and is the fallback whenever a write rewrites older bars.
+"""
+from decimal import Decimal
+
+import numpy as np
+
+from .price_store import PRICE_COLUMNS, PRICE_DECIMALS, grouped_history_rows, series_from_rows
+
+PRICE_QUANTUM = Decimal(1).scaleb(-PRICE_DECIMALS)
+
+_CLOSE = PRICE_COLUMNS.index('close_price')
+_LATEST_FIELDS = {
+    'latest_open': 'open_price',
+    'latest_high': 'high_price',
+    'latest_low': 'low_price',
+    'latest_close': 'close_price',
+    'latest_adjusted_close': 'adjusted_close',
+}
+
+
+def _price(value):
+    if value is None or np.isnan(value):
+        return None
+    return Decimal(repr(float(value))).quantize(PRICE_QUANTUM)
+
+
+def _day(value):
+    return value.astype('datetime64[D]').item()
+
+
+def summary_values(series):
+    """Return summary field values for a complete series, or None when it is empty."""
+    if not len(series):
+        return None
+    dates = np.asarray(series.dates, dtype='datetime64[D]')
+    close = np.asarray(series.values[_CLOSE])
+    values = {
+        'first_date': _day(dates[0]),
+        'last_date': _day(dates[-1]),
+        'high_close': None,
+        'high_close_date': None,
+        'low_close': None,
+        'low_close_date': None,
+    }
+    if not np.isnan(close).all():
+        high, low = int(np.nanargmax(close)), int(np.nanargmin(close))
+        values.update(
+            high_close=_price(close[high]),
+            high_close_date=_day(dates[high]),
+            low_close=_price(close[low]),
+            low_close_date=_day(dates[low]),
+        )
+    values.update(_latest_values(series, len(series) - 1))
+    if len(series) > 1:
+        values['previous_date'] = _day(dates[-2])
+        values['previous_close'] = _price(close[-2])
+    else:
+        values['previous_date'] = values['previous_close'] = None
+    return values
+
+
+def _latest_values(series, index):
+    values = {field: _price(series.values[PRICE_COLUMNS.index(column), index]) for field, column in _LATEST_FIELDS.items()}
+    volume = series.values[-1, index]
+    values['latest_volume'] = None if np.isnan(volume) else int(volume)
+    return values
+
+
+def rebuild_summaries(summary_model, price_model, stock_ids):
+    """Recompute summaries for ``stock_ids`` from stored rows (one query for the rows)."""
+    grouped = grouped_history_rows(price_model, stock_ids)
+    summaries = []
+    empty = []
+    for stock_id, rows in grouped.items():
+        values = summary_values(series_from_rows(rows))
+        if values is None:
+            empty.append(stock_id)
+        else:
+            summaries.append(summary_model(stock_id=stock_id, **values))
+    if empty:
+        summary_model.objects.filter(stock_id__in=empty).delete()
+    if summaries:
+        update_fields = [field.name for field in summary_model._meta.concrete_fields if not field.primary_key]
+        summary_model.objects.bulk_create(
+            summaries,
+            update_conflicts=True,
+            unique_fields=['stock'],
+            update_fields=update_fields,
+        )
+    return len(summaries)
+
+
+def apply_new_bars(summary_model, price_model, stock_id, series):
+    """Fold just-written bars into the stock's summary.
+
+    The summary is updated in place when the bars only append to history or
+    rewrite bars the summary does not depend on; otherwise it is rebuilt.
+    """
+    if not len(series):
+        return
+    summary = summary_model.objects.filter(stock_id=stock_id).first()
+    values = _merged_values(summary, series) if summary is not None else None
+    if values is None:
+        rebuild_summaries(summary_model, price_model, [stock_id])
+        return
+    for field, value in values.items():
+        setattr(summary, field, value)
+    summary.save()
+
+
+def _merged_values(summary, series):
+    dates = np.asarray(series.dates, dtype='datetime64[D]')
+    first_new = _day(dates[0])
+    # Rewritten bars may have held the stored extremes.
+    for extreme_date in (summary.high_close_date, summary.low_close_date):
+        if extreme_date is not None and extreme_date >= first_new:
+            return None
+    update = summary_values(series)
+    values = {
+        'first_date': min(summary.first_date, first_new),
+        'last_date': max(summary.last_date, update['last_date']),
+    }
+
+    high, low = summary.high_close, summary.low_close
+    values['high_close'], values['high_close_date'] = high, summary.high_close_date
+    values['low_close'], values['low_close_date'] = low, summary.low_close_date
+    if update['high_close'] is not None and (high is None or update['high_close'] > high):
+        values['high_close'], values['high_close_date'] = update['high_close'], update['high_close_date']
+    if update['low_close'] is not None and (low is None or update['low_close'] < low):
+        values['low_close'], values['low_close_date'] = update['low_close'], update['low_close_date']
+
+    if summary.last_date > update['last_date']:
+        # The write landed before the latest bar; the latest two bars are unknown here.
+        return None
+    if summary.last_date < first_new:
+        # Pure append: the stored latest bar becomes the previous one if needed.
+        previous = (summary.last_date, summary.latest_close)
+    elif summary.previous_date is not None and summary.previous_date < first_new:
+        previous = (summary.previous_date, summary.previous_close)
+    else:
+        previous = None
+    values.update({field: update[field] for field in (*_LATEST_FIELDS, 'latest_volume')})
+    if len(series) > 1:
+        values['previous_date'], values['previous_close'] = update['previous_date'], update['previous_close']
+    elif previous is not None:
+        values['previous_date'], values['previous_close'] = previous
+    else:
+        return None
+    return values
@@ -0,0 +1,268 @@
+"""Technical indicators maintained from stored price history.
+
+The engine works on a batch of stocks at once. Each stock carries a rolling
+state (``StockIndicators``): Wilder's RSI averages, the last close and a
+window of the latest ``WINDOW_LENGTH`` bars (close, high, low, volume). New
+bars are stepped through for the whole batch with NumPy vector operations,
+one time step at a time, so an incremental run after a sync touches only the
+bars written since ``last_date`` instead of the full history. Stocks without
+state (or whose older bars were rewritten) are replayed from their first bar,
+``REPLAY_CHUNK`` steps at a time, so the bar buffer stays the same size however
+long the longest history in the batch is.
+
+Outputs are RSI(14), simple moving averages, 52-week high/low, average and
+relative volume and the daily change. RSI, volume and change land on the
+stock's existing screener columns; the rest live on ``StockIndicators``.
+"""
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+import numpy as np
+from django.db import transaction
+
+from .models import (
+    AccessibleHistoricalPrice,
+    AccessibleStock,
+    AccessibleStockIndicators,
+    HistoricalPrice,
+    Stock,
+    StockIndicators,
+)
+from .price_store import PRICE_COLUMNS, grouped_history_rows, series_from_rows, stored_series
+
+DATASET_INDICATOR_MODELS = {
+    'classifier': (Stock, HistoricalPrice, StockIndicators),
+    'accessible': (AccessibleStock, AccessibleHistoricalPrice, AccessibleStockIndicators),
+}
+
+RSI_PERIOD = 14
+MOVING_AVERAGE_WINDOWS = (20, 50, 200)
+AVERAGE_VOLUME_WINDOW = 20
+WINDOW_LENGTH = 252  # trading days in a year, for the 52-week range
+REPLAY_CHUNK = 256  # time steps handed to RollingState.advance at once
+
+# Rows of the rolling window, taken from the PRICE_COLUMNS rows of a series
+WINDOW_COLUMNS = ('close_price', 'high_price', 'low_price', 'volume')
+_CLOSE, _HIGH, _LOW, _VOLUME = range(len(WINDOW_COLUMNS))
+_SERIES_ROWS = [PRICE_COLUMNS.index(column) for column in WINDOW_COLUMNS]
+
+STOCK_FIELDS = ('relative_strength_index', 'average_volume', 'relative_volume', 'price_change', 'price_change_percent')
+
+
+class RollingState:
+    """Rolling state for a batch of stocks, one array entry per stock."""
+
+    def __init__(self, count):
+        self.last_close = np.full(count, np.nan)
+        # Running sums of gains/losses until seed_count reaches RSI_PERIOD, Wilder averages after.
+        self.average_gain = np.zeros(count)
+        self.average_loss = np.zeros(count)
+        self.seed_count = np.zeros(count, dtype=np.int64)
+        self.window = np.full((count, len(WINDOW_COLUMNS), WINDOW_LENGTH), np.nan)
+
+    def load(self, index, record):
+        self.last_close[index] = np.nan if record.last_close is None else record.last_close
+        self.average_gain[index] = record.rsi_average_gain
+        self.average_loss[index] = record.rsi_average_loss
+        self.seed_count[index] = record.rsi_seed_count
+        window = np.frombuffer(bytes(record.rolling_window), dtype='<f8').reshape(len(WINDOW_COLUMNS), -1)
+        width = min(window.shape[1], WINDOW_LENGTH)
+        if width:
+            self.window[index, :, -width:] = window[:, -width:]
+
+    def advance(self, bars):
+        """Step through ``bars`` of shape (stocks, WINDOW_COLUMNS, steps).
+
+        Each stock's bars are right-aligned; NaN closes mark steps without a bar.
+        """
+        closes = bars[:, _CLOSE]
+        for step in range(closes.shape[1]):
+            close = closes[:, step]
+            present = ~np.isnan(close)
+            valid = present & ~np.isnan(self.last_close)
+            change = np.where(valid, close - np.where(valid, self.last_close, 0), 0)
+            gain, loss = np.maximum(change, 0), np.maximum(-change, 0)
+
+            seeding = valid & (self.seed_count < RSI_PERIOD)
+            smoothing = valid & ~seeding
+            self.average_gain[seeding] += gain[seeding]
+            self.average_loss[seeding] += loss[seeding]
+            self.seed_count[seeding] += 1
+            seeded = seeding & (self.seed_count == RSI_PERIOD)
+            self.average_gain[seeded] /= RSI_PERIOD
+            self.average_loss[seeded] /= RSI_PERIOD
+            self.average_gain[smoothing] = (self.average_gain[smoothing] * (RSI_PERIOD - 1) + gain[smoothing]) / RSI_PERIOD
+            self.average_loss[smoothing] = (self.average_loss[smoothing] * (RSI_PERIOD - 1) + loss[smoothing]) / RSI_PERIOD
+            self.last_close[present] = close[present]
+
+        # Append and compact: bars without a close move out left, the newest stay right-aligned.
+        window = np.concatenate([self.window, bars], axis=2)
+        order = np.argsort(~np.isnan(window[:, _CLOSE]), axis=1, kind='stable')
+        window = np.take_along_axis(window, order[:, None, :], axis=2)
+        self.window = np.ascontiguousarray(window[:, :, -WINDOW_LENGTH:])
+
+    def stored_window(self, index):
+        window = self.window[index]
+        filled = int(np.count_nonzero(~np.isnan(window[_CLOSE])))
+        return np.ascontiguousarray(window[:, WINDOW_LENGTH - filled:], dtype='<f8').tobytes()
+
+    def indicators(self):
+        """Return indicator arrays for the batch (NaN where not enough history)."""
+        closes = self.window[:, _CLOSE]
+        values = {}
+        for length in MOVING_AVERAGE_WINDOWS:
+            tail = closes[:, -length:]
+            complete = ~np.isnan(tail).any(axis=1)
+            values[f'sma_{length}'] = np.where(complete, np.where(complete[:, None], tail, 0).mean(axis=1), np.nan)
+
+        with np.errstate(all='ignore'):
+            highs = np.fmax(self.window[:, _HIGH], closes)
+            lows = np.fmin(self.window[:, _LOW], closes)
+            has_bars = ~np.isnan(closes).all(axis=1)
+            values['high_52_week'] = np.where(has_bars, np.where(np.isnan(highs), -np.inf, highs).max(axis=1), np.nan)
+            values['low_52_week'] = np.where(has_bars, np.where(np.isnan(lows), np.inf, lows).min(axis=1), np.nan)
+
+            relative_strength = self.average_gain / self.average_loss
+            rsi = np.where(self.average_loss == 0, np.where(self.average_gain == 0, 50.0, 100.0), 100 - 100 / (1 + relative_strength))
+            values['relative_strength_index'] = np.where(self.seed_count >= RSI_PERIOD, rsi, np.nan)
+
+            volumes = self.window[:, _VOLUME, -AVERAGE_VOLUME_WINDOW:]
+            counts = np.count_nonzero(~np.isnan(volumes), axis=1)
+            average_volume = np.where(counts > 0, np.nansum(volumes, axis=1) / np.maximum(counts, 1), np.nan)
+            values['average_volume'] = average_volume
+            values['relative_volume'] = np.where(average_volume > 0, self.window[:, _VOLUME, -1] / average_volume, np.nan)
+
+            change = closes[:, -1] - closes[:, -2]
+            values['price_change'] = change
+            values['price_change_percent'] = np.where(closes[:, -2] != 0, change / closes[:, -2] * 100, np.nan)
+        return values
+
+
+def _decimal(value, field):
+    """Quantize to the model field, or None when missing or out of its range."""
+    if value is None or not np.isfinite(value):
+        return None
+    try:
+        result = Decimal(repr(float(value))).quantize(Decimal(1).scaleb(-field.decimal_places))
+    except InvalidOperation:
+        return None
+    if len(result.as_tuple().digits) > field.max_digits:
+        return None
+    return result
+
+
+def _load_series(dataset_key, price_model, stock_ids, since):
+    """Bars after ``since[stock_id]`` (all bars when None), from the price store or one query per group."""
+    series = {}
+    pending_full, pending_since = [], []
+    for stock_id in stock_ids:
+        stored = stored_series(dataset_key, stock_id)
+        start = since.get(stock_id)
+        if stored is not None:
+            series[stock_id] = stored.window(start + timedelta(days=1) if start else None)
+        elif start is None:
+            pending_full.append(stock_id)
+        else:
+            pending_since.append(stock_id)
+
+    if pending_full:
+        for stock_id, rows in grouped_history_rows(price_model, pending_full).items():
+            series[stock_id] = series_from_rows(rows)
+    if pending_since:
+        earliest = min(since[stock_id] for stock_id in pending_since) + timedelta(days=1)
+        for stock_id, rows in grouped_history_rows(price_model, pending_since, earliest).items():
+            series[stock_id] = series_from_rows([row for row in rows if row[0] > since[stock_id]])
+    return series
+
+
+def refresh_indicators(dataset_key, stock_ids, rewritten_from=None, full=False):
+    """Bring indicators for ``stock_ids`` up to date; return how many stocks were updated.
+
+    ``rewritten_from`` maps stock ids to the earliest bar date just written.
+    Stocks whose state already covers that date are replayed from scratch, as
+    are all stocks when ``full`` is set.
+    """
+    stock_model, price_model, indicator_model = DATASET_INDICATOR_MODELS[dataset_key]
+    stock_ids = list(dict.fromkeys(stock_ids))
+    if not stock_ids:
+        return 0
+    rewritten_from = rewritten_from or {}
+
+    records = {} if full else indicator_model.objects.in_bulk(stock_ids)
+    for stock_id, first_written in rewritten_from.items():
+        record = records.get(stock_id)
+        if record is not None and first_written is not None and first_written <= record.last_date:
+            del records[stock_id]
+
+    state = RollingState(len(stock_ids))
+    since = {}
+    for index, stock_id in enumerate(stock_ids):
+        record = records.get(stock_id)
+        if record is not None:
+            state.load(index, record)
+            since[stock_id] = record.last_date
+
+    series = _load_series(dataset_key, price_model, stock_ids, since)
+    steps = max((len(item) for item in series.values()), default=0)
+    # (index, first step, price rows) per stock, right-aligned on the batch's steps
+    active = []
+    last_dates = {}
+    for index, stock_id in enumerate(stock_ids):
+        item = series.get(stock_id)
+        if item is not None and len(item):
+            active.append((index, steps - len(item), item.values))
+            last_dates[stock_id] = item.last_date
+        elif stock_id in since:
+            last_dates[stock_id] = since[stock_id]
+
+    for start in range(0, steps, REPLAY_CHUNK):
+        stop = min(start + REPLAY_CHUNK, steps)
+        bars = np.full((len(stock_ids), len(WINDOW_COLUMNS), stop - start), np.nan)
+        for index, first, rows in active:
+            begin = max(start, first)
+            if begin < stop:
+                bars[index, :, begin - start:] = rows[_SERIES_ROWS, begin - first:stop - first]
+        state.advance(bars)
+    values = state.indicators()
+
+    indicator_fields = {field.name: field for field in indicator_model._meta.concrete_fields}
+    stock_fields = {name: stock_model._meta.get_field(name) for name in STOCK_FIELDS}
+    indicator_rows, stocks = [], []
+    for index, stock_id in enumerate(stock_ids):
+        if stock_id not in last_dates:
+            continue  # no history at all
+        last_close = state.last_close[index]
+        indicator_rows.append(indicator_model(
+            stock_id=stock_id,
+            last_date=last_dates[stock_id],
+            last_close=None if np.isnan(last_close) else float(last_close),
+            rsi_average_gain=float(state.average_gain[index]),
+            rsi_average_loss=float(state.average_loss[index]),
+            rsi_seed_count=int(state.seed_count[index]),
+            rolling_window=state.stored_window(index),
+            **{
+                name: _decimal(values[name][index], indicator_fields[name])
+                for name in ('sma_20', 'sma_50', 'sma_200', 'high_52_week', 'low_52_week')
+            },
+        ))
+        average_volume = values['average_volume'][index]
+        stocks.append(stock_model(
+            pk=stock_id,
+            relative_strength_index=_decimal(values['relative_strength_index'][index], stock_fields['relative_strength_index']),
+            average_volume=None if np.isnan(average_volume) else int(round(average_volume)),
+            relative_volume=_decimal(values['relative_volume'][index], stock_fields['relative_volume']),
+            price_change=_decimal(values['price_change'][index], stock_fields['price_change']),
+            price_change_percent=_decimal(values['price_change_percent'][index], stock_fields['price_change_percent']),
+        ))
+
+    with transaction.atomic():
+        if indicator_rows:
+            indicator_model.objects.bulk_create(
+                indicator_rows,
+                update_conflicts=True,
+                unique_fields=['stock'],
+                update_fields=[name for name, field in indicator_fields.items() if not field.primary_key],
+            )
+        if stocks:
+            stock_model.objects.bulk_update(stocks, STOCK_FIELDS)
+    return len(indicator_rows)
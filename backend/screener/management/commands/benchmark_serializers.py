@@ -0,0 +1,141 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from screener.models import (
+    AccessibleExchange,
+    AccessibleIndustry,
+    AccessibleSector,
+    AccessibleStock,
+    Exchange,
+    Industry,
+    Sector,
+    Stock,
+)
+from screener.row_serializer import ValuesRowSerializer
+from screener.serializers import AccessibleStockSerializer, StockSerializer
+
+BENCHMARK_DATASETS = {
+    "Stock": (Exchange, Sector, Industry, Stock, StockSerializer),
+    "AccessibleStock": (AccessibleExchange, AccessibleSector, AccessibleIndustry, AccessibleStock, AccessibleStockSerializer),
+}
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Compare rows/sec of the DRF stock serializer and the .values() fast path on synthetic rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows",
+            type=int,
+            default=5000,
+            help="Synthetic stocks created per model (default: 5000).",
+        )
+        parser.add_argument(
+            "--page-size",
+            type=int,
+            default=200,
+            help="Rows serialized per page, like a list response (default: 200).",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=3,
+            help="Timing runs per serializer; the best one is reported (default: 3).",
+        )
+
+    def handle(self, *args, **options):
+        rows = max(1, options["rows"])
+        page_size = max(1, options["page_size"])
+        repeat = max(1, options["repeat"])
+
+        # Synthetic rows live in a transaction that is always rolled back.
+        try:
+            with transaction.atomic():
+                for label, bundle in BENCHMARK_DATASETS.items():
+                    self._benchmark(label, bundle, rows, page_size, repeat)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _benchmark(self, label, bundle, rows, page_size, repeat):
+        exchange_model, sector_model, industry_model, stock_model, serializer_class = bundle
+        exchange = exchange_model.objects.create(code="BENCHX", name="Benchmark Exchange", country="Nowhere")
+        sector = sector_model.objects.create(name="Benchmark Sector")
+        industry = industry_model.objects.create(name="Benchmark Industry", sector=sector)
+        stock_model.objects.bulk_create(
+            [
+                stock_model(
+                    ticker=f"BENCH{index}",
+                    company_name=f"Benchmark Company {index}",
+                    exchange=exchange,
+                    sector=sector if index % 5 else None,
+                    industry=industry if index % 5 else None,
+                    country="Nowhere",
+                    price=Decimal(index % 1000) / 7,
+                    market_cap=Decimal(index) * 1_000_000,
+                    pe_ratio=Decimal(index % 90) / 3 if index % 3 else None,
+                    dividend_yield=Decimal(index % 10) / 4,
+                    volume=index * 10,
+                    fair_value_label="Undervalued" if index % 2 else None,
+                )
+                for index in range(rows)
+            ],
+            batch_size=1000,
+        )
+        queryset = stock_model.objects.filter(exchange=exchange).order_by("ticker")
+        row_serializer = ValuesRowSerializer(serializer_class)
+
+        def drf_pages():
+            instances = queryset.select_related("exchange", "sector", "industry")
+            return [
+                serializer_class(instances[offset:offset + page_size], many=True).data
+                for offset in range(0, rows, page_size)
+            ]
+
+        def fast_pages():
+            values = row_serializer.values(queryset)
+            return [row_serializer.serialize(values[offset:offset + page_size]) for offset in range(0, rows, page_size)]
+
+        renderer = JSONRenderer()
+        if renderer.render(drf_pages()) != renderer.render(fast_pages()):
+            raise CommandError(f"{label}: fast-path output differs from {serializer_class.__name__}.")
+
+        # Serialization alone, on rows that were already fetched.
+        instances = list(queryset.select_related("exchange", "sector", "industry"))
+        value_rows = list(row_serializer.values(queryset))
+
+        def drf_serialize():
+            return serializer_class(instances, many=True).data
+
+        def fast_serialize():
+            return row_serializer.serialize(value_rows)
+
+        for stage, drf_func, fast_func in (
+            ("query + serialize", drf_pages, fast_pages),
+            ("serialize only", drf_serialize, fast_serialize),
+        ):
+            drf_seconds = self._best_of(drf_func, repeat)
+            fast_seconds = self._best_of(fast_func, repeat)
+            self.stdout.write(
+                f"{label} ({stage}, {rows} rows): "
+                f"DRF {rows / drf_seconds:,.0f} rows/s | "
+                f"fast path {rows / fast_seconds:,.0f} rows/s | "
+                f"{drf_seconds / fast_seconds:.1f}x"
+            )
+
+    @staticmethod
+    def _best_of(func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
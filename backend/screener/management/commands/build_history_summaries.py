@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+
+from screener.history_summary import rebuild_summaries
+from screener.models import (
+    AccessibleHistoricalPrice,
+    AccessibleHistorySummary,
+    AccessibleStock,
+    HistoricalPrice,
+    HistorySummary,
+    Stock,
+)
+
+DATASET_SUMMARY_MODELS = {
+    "classifier": (Stock, HistoricalPrice, HistorySummary),
+    "accessible": (AccessibleStock, AccessibleHistoricalPrice, AccessibleHistorySummary),
+}
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-stock history summaries used by the profile endpoint."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dataset",
+            choices=sorted(DATASET_SUMMARY_MODELS),
+            action="append",
+            help="Dataset(s) to rebuild (default: all).",
+        )
+        parser.add_argument(
+            "--tickers",
+            nargs="+",
+            help="Limit the rebuild to the provided tickers.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=200,
+            help="Number of stocks whose history is loaded per query (default: 200).",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options["batch_size"])
+
+        for dataset_key in options.get("dataset") or sorted(DATASET_SUMMARY_MODELS):
+            stock_model, price_model, summary_model = DATASET_SUMMARY_MODELS[dataset_key]
+            stocks = stock_model.objects.order_by("id")
+            if options.get("tickers"):
+                stocks = stocks.filter(ticker__in=options["tickers"])
+            stock_ids = list(stocks.values_list("id", flat=True))
+
+            written = 0
+            for offset in range(0, len(stock_ids), batch_size):
+                written += rebuild_summaries(summary_model, price_model, stock_ids[offset:offset + batch_size])
+                self.stdout.write(f"[{dataset_key}] {min(offset + batch_size, len(stock_ids))}/{len(stock_ids)} stocks scanned")
+
+            self.stdout.write(self.style.SUCCESS(f"[{dataset_key}] Wrote {written} history summaries"))
@@ -0,0 +1,85 @@
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from screener.models import AccessibleHistoricalPrice, AccessibleStock, HistoricalPrice, Stock
+from screener.price_store import PRICE_COLUMNS, PriceSeries, PriceStore
+
+DATASET_PRICE_MODELS = {
+    "classifier": (Stock, HistoricalPrice),
+    "accessible": (AccessibleStock, AccessibleHistoricalPrice),
+}
+
+
+class Command(BaseCommand):
+    help = "Rebuild the columnar price store from HistoricalPrice rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dataset",
+            choices=sorted(DATASET_PRICE_MODELS),
+            action="append",
+            help="Dataset(s) to rebuild (default: all).",
+        )
+        parser.add_argument(
+            "--tickers",
+            nargs="+",
+            help="Limit the rebuild to the provided tickers.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=200,
+            help="Number of stocks whose history is loaded per query (default: 200).",
+        )
+        parser.add_argument(
+            "--directory",
+            help="Store location (default: settings.PRICE_STORE_DIR).",
+        )
+
+    def handle(self, *args, **options):
+        store = PriceStore(options.get("directory") or settings.PRICE_STORE_DIR)
+        batch_size = max(1, options["batch_size"])
+
+        for dataset_key in options.get("dataset") or sorted(DATASET_PRICE_MODELS):
+            stock_model, price_model = DATASET_PRICE_MODELS[dataset_key]
+            stocks = stock_model.objects.order_by("id")
+            if options.get("tickers"):
+                stocks = stocks.filter(ticker__in=options["tickers"])
+            stock_ids = list(stocks.values_list("id", flat=True))
+
+            written = 0
+            rows_written = 0
+            for offset in range(0, len(stock_ids), batch_size):
+                batch_ids = stock_ids[offset:offset + batch_size]
+                for stock_id, series in self._load_batch(price_model, batch_ids):
+                    store.write(dataset_key, stock_id, series)
+                    written += 1
+                    rows_written += len(series)
+                # Stocks without history get no files so reads fall back to the database.
+                self.stdout.write(f"[{dataset_key}] {min(offset + batch_size, len(stock_ids))}/{len(stock_ids)} stocks scanned")
+
+            self.stdout.write(
+                self.style.SUCCESS(f"[{dataset_key}] Wrote {written} series ({rows_written} rows) to {store.root}")
+            )
+
+    @staticmethod
+    def _load_batch(price_model, stock_ids):
+        rows = list(
+            price_model.objects.filter(stock_id__in=stock_ids)
+            .order_by("stock_id", "date")
+            .values_list("stock_id", "date", *PRICE_COLUMNS)
+        )
+        if not rows:
+            return
+        owners = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        dates = np.array([row[1] for row in rows], dtype="datetime64[D]")
+        values = np.array(
+            [[np.nan if value is None else float(value) for value in row[2:]] for row in rows],
+            dtype=np.float64,
+        ).T
+        bounds = np.flatnonzero(np.diff(owners)) + 1
+        starts = np.concatenate([[0], bounds])
+        ends = np.concatenate([bounds, [len(rows)]])
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            yield int(owners[start]), PriceSeries(dates[start:end], np.ascontiguousarray(values[:, start:end]))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from screener.factors import DATASET_FACTOR_MODELS, refresh_factor_scores
+from screener.generation import bump_generation
+
+
+class Command(BaseCommand):
+    help = "Recompute sector-relative value, quality, momentum and size scores and ranks."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dataset",
+            choices=sorted(DATASET_FACTOR_MODELS),
+            action="append",
+            help="Dataset(s) to score (default: all).",
+        )
+
+    def handle(self, *args, **options):
+        for dataset_key in options.get("dataset") or sorted(DATASET_FACTOR_MODELS):
+            scored = refresh_factor_scores(dataset_key)
+            if scored:
+                bump_generation(dataset_key)
+            self.stdout.write(self.style.SUCCESS(f"[{dataset_key}] Scored {scored} stocks"))
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+
+from screener.factors import refresh_factor_scores
+from screener.generation import bump_generation
+from screener.indicators import DATASET_INDICATOR_MODELS, refresh_indicators
+
+
+class Command(BaseCommand):
+    help = "Update RSI, moving averages, volume and 52-week indicators from stored price history."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dataset",
+            choices=sorted(DATASET_INDICATOR_MODELS),
+            action="append",
+            help="Dataset(s) to update (default: all).",
+        )
+        parser.add_argument(
+            "--tickers",
+            nargs="+",
+            help="Limit the update to the provided tickers.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=200,
+            help="Number of stocks processed together (default: 200).",
+        )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Discard the rolling state and recompute from each stock's full history.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options["batch_size"])
+
+        for dataset_key in options.get("dataset") or sorted(DATASET_INDICATOR_MODELS):
+            stock_model = DATASET_INDICATOR_MODELS[dataset_key][0]
+            stocks = stock_model.objects.order_by("id")
+            if options.get("tickers"):
+                stocks = stocks.filter(ticker__in=options["tickers"])
+            stock_ids = list(stocks.values_list("id", flat=True))
+
+            updated = 0
+            for offset in range(0, len(stock_ids), batch_size):
+                updated += refresh_indicators(dataset_key, stock_ids[offset:offset + batch_size], full=options["full"])
+                self.stdout.write(f"[{dataset_key}] {min(offset + batch_size, len(stock_ids))}/{len(stock_ids)} stocks scanned")
+
+            if updated:
+                # Momentum scores are read from the indicator state.
+                refresh_factor_scores(dataset_key)
+                bump_generation(dataset_key)
+            self.stdout.write(self.style.SUCCESS(f"[{dataset_key}] Updated indicators for {updated} stocks"))
@@ -5,10 +5,18 @@ from decimal import Decimal, ROUND_HALF_UP
 import pandas as pd
 import yfinance as yf
 from django.core.management.base import BaseCommand, CommandError
-from django.db import models, transaction
+from django.db import models
 from django.utils import timezone
 
-from screener.models import HistoricalPrice, Stock
+from screener.factors import refresh_factor_scores
+from screener.generation import bump_generation
+from screener.history_summary import apply_new_bars
+from screener.indicators import refresh_indicators
+from screener.models import HistoricalPrice, HistorySummary, Stock
+from screener.price_pipeline import FetchBatch, PricePipeline
+from screener.price_sources import YFinanceSource, normalize_price_frame
+from screener.price_store import get_price_store, series_from_frame
+from screener.price_writer import upsert_price_frames
 
 YF_SUFFIX_MAP = {
     "LSE": ".L",
@@ -36,6 +44,9 @@ logger = logging.getLogger(__name__)
 
 class Command(BaseCommand):
     help = "Fetch daily historical prices from yfinance and upsert them into HistoricalPrice."
+    # A price source (anything with fetch(symbols, start_date, end_date)) can be
+    # injected through call_command(..., price_source=...) for the pipelined mode.
+    stealth_options = ("price_source",)
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -74,6 +85,41 @@ class Command(BaseCommand):
             action="store_true",
             help="Ignore prices_last_synced_at and refetch from the provided/default start date.",
         )
+        parser.add_argument(
+            "--pipeline",
+            action="store_true",
+            help="Download several tickers per request on a thread pool while writes run in the main thread.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Concurrent download workers in pipeline mode (default: 4).",
+        )
+        parser.add_argument(
+            "--group-size",
+            type=int,
+            default=20,
+            help="Tickers per download request in pipeline mode (default: 20).",
+        )
+        parser.add_argument(
+            "--rate-limit",
+            type=float,
+            default=2.0,
+            help="Maximum download requests per second per host in pipeline mode (default: 2, 0 disables).",
+        )
+        parser.add_argument(
+            "--retries",
+            type=int,
+            default=3,
+            help="Retries with exponential backoff for failed downloads in pipeline mode (default: 3).",
+        )
+        parser.add_argument(
+            "--retry-backoff",
+            type=float,
+            default=1.0,
+            help="Base delay in seconds before the first retry; doubles on each attempt (default: 1).",
+        )
 
     def handle(self, *args, **options):
         start_override = self._parse_date_option(options.get("start"), "start")
@@ -87,7 +133,7 @@ class Command(BaseCommand):
         dry_run = options["dry_run"]
         force = options["force"]
 
-        queryset = Stock.objects.all().order_by("id")
+        queryset = Stock.objects.select_related("exchange").order_by("id")
         if tickers:
             queryset = queryset.filter(
                 models.Q(ticker__in=tickers) | models.Q(full_ticker__in=tickers)
@@ -98,27 +144,48 @@ class Command(BaseCommand):
             self.stdout.write(self.style.WARNING("No stocks matched the selection criteria."))
             return
 
-        processed = 0
-        created_rows = 0
-        updated_rows = 0
-        failures = []
+        self.created_rows = 0
+        self.updated_rows = 0
+        self.synced = 0
+        self.failures = []
+        self.written_from = {}
+        self.dry_run = dry_run
+        self.price_store = None if dry_run else get_price_store()
         end_date = end_override or date.today()
 
-        iterator = queryset.iterator(chunk_size=batch_size)
-        for stock in iterator:
-            if max_stocks and processed >= max_stocks:
-                break
+        if options["pipeline"]:
+            processed = self._sync_pipelined(
+                queryset, total, start_override, end_date, force, batch_size, max_stocks, options
+            )
+        else:
+            processed = self._sync_sequential(
+                queryset, total, start_override, end_date, force, batch_size, max_stocks
+            )
+
+        if self.written_from:
+            self._refresh_indicators(batch_size)
+            self._refresh_factor_scores()
+        if self.synced:
+            bump_generation("classifier")
+
+        self.stdout.write(self.style.NOTICE(f"Processed stocks: {processed}"))
+        self.stdout.write(self.style.NOTICE(f"Inserted rows: {self.created_rows}, Updated rows: {self.updated_rows}"))
+
+        if self.failures:
+            self.stdout.write(self.style.WARNING("Failures encountered:"))
+            for failure in self.failures:
+                self.stdout.write(self.style.WARNING(f"  - {failure}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Historical price sync completed without failures."))
 
+    def _sync_sequential(self, queryset, total, start_override, end_date, force, batch_size, max_stocks):
+        processed = 0
+        for stock, start_date in self._plan_sync(queryset, start_override, force, batch_size, max_stocks):
             processed += 1
             symbol = self._resolve_symbol(stock)
-            start_date = self._determine_start_date(stock, start_override, force)
 
             if start_date and start_date > end_date:
-                self.stdout.write(
-                    self.style.WARNING(
-                        f"[SKIP] {symbol}: start_date {start_date} is after end_date {end_date}. Nothing to fetch."
-                    )
-                )
+                self._skip_up_to_date(symbol, start_date, end_date)
                 continue
 
             range_label = f"{start_date}" if start_date else "max"
@@ -127,54 +194,172 @@ class Command(BaseCommand):
                 df = self._download_prices(symbol, start_date, end_date)
             except Exception as exc:  # noqa: BLE001 - capture all errors to keep the loop going
                 message = f"[FAIL] {symbol}: {exc}"
-                failures.append(message)
+                self.failures.append(message)
                 logger.exception("Error downloading prices for %s", symbol)
                 self.stdout.write(self.style.ERROR(message))
                 continue
 
-            if df.empty:
-                self.stdout.write(self.style.WARNING(f"[SKIP] {symbol}: no data returned."))
-                continue
+            self._record_prices(stock, symbol, df)
+        return processed
 
-            if dry_run:
-                self.stdout.write(self.style.HTTP_INFO(f"[DRY RUN] {symbol}: {len(df)} rows fetched."))
+    def _sync_pipelined(self, queryset, total, start_override, end_date, force, batch_size, max_stocks, options):
+        """Group stocks by start date into multi-ticker downloads fetched concurrently."""
+        groups = {}
+        processed = 0
+        for stock, start_date in self._plan_sync(queryset, start_override, force, batch_size, max_stocks):
+            processed += 1
+            symbol = self._resolve_symbol(stock)
+            if start_date and start_date > end_date:
+                self._skip_up_to_date(symbol, start_date, end_date)
                 continue
-
+            groups.setdefault(start_date, {}).setdefault(symbol, []).append(stock)
+
+        group_size = max(1, options["group_size"])
+        batches = []
+        stocks_by_batch = {}
+        for start_date, stocks_by_symbol in groups.items():
+            symbols = list(stocks_by_symbol)
+            for offset in range(0, len(symbols), group_size):
+                batch = FetchBatch(tuple(symbols[offset:offset + group_size]), start_date, end_date)
+                batches.append(batch)
+                stocks_by_batch[batch] = stocks_by_symbol
+
+        pipeline = PricePipeline(
+            options.get("price_source") or YFinanceSource(),
+            workers=options["workers"],
+            rate_limit=options["rate_limit"],
+            retries=options["retries"],
+            backoff=options["retry_backoff"],
+        )
+        for done, result in enumerate(pipeline.run(batches), start=1):
+            batch = result.batch
+            range_label = f"{batch.start_date}" if batch.start_date else "max"
+            self.stdout.write(
+                f"[{done}/{len(batches)}] Fetched {len(batch.symbols)} symbols "
+                f"({range_label} -> {batch.end_date}) in {result.attempts} attempt(s)"
+            )
+            stocks_by_symbol = stocks_by_batch[batch]
+            for symbol in batch.symbols:
+                if result.error is not None:
+                    message = f"[FAIL] {symbol}: {result.error}"
+                    self.failures.append(message)
+                    self.stdout.write(self.style.ERROR(message))
+                    continue
+                frame = result.frames.get(symbol, pd.DataFrame())
+                for stock in stocks_by_symbol[symbol]:
+                    self._record_prices(stock, symbol, frame)
+        return processed
+
+    def _plan_sync(self, queryset, start_override, force, batch_size, max_stocks):
+        """Yield ``(stock, start_date)`` using one grouped MAX(date) query per chunk of stocks."""
+        if max_stocks:
+            queryset = queryset[:max_stocks]
+        needs_latest = not start_override and not force
+        chunk = []
+        for stock in queryset.iterator(chunk_size=batch_size):
+            chunk.append(stock)
+            if len(chunk) >= batch_size:
+                yield from self._plan_chunk(chunk, start_override, force, needs_latest)
+                chunk = []
+        if chunk:
+            yield from self._plan_chunk(chunk, start_override, force, needs_latest)
+
+    def _plan_chunk(self, stocks, start_override, force, needs_latest):
+        latest_dates = {}
+        if needs_latest:
+            latest_dates = dict(
+                HistoricalPrice.objects.filter(stock_id__in=[stock.pk for stock in stocks])
+                .order_by()
+                .values("stock_id")
+                .annotate(latest=models.Max("date"))
+                .values_list("stock_id", "latest")
+            )
+        for stock in stocks:
+            yield stock, self._determine_start_date(stock, latest_dates.get(stock.pk), start_override, force)
+
+    def _refresh_indicators(self, batch_size):
+        """Extend indicator state with the bars written by this run."""
+        stock_ids = list(self.written_from)
+        for offset in range(0, len(stock_ids), batch_size):
+            chunk = stock_ids[offset:offset + batch_size]
             try:
-                created, updated = self._upsert_prices(stock, df)
+                refresh_indicators("classifier", chunk, rewritten_from=self.written_from)
             except Exception as exc:  # noqa: BLE001
-                message = f"[FAIL] {symbol}: upsert failed ({exc})"
-                failures.append(message)
-                logger.exception("Error upserting prices for %s", symbol)
+                message = f"[FAIL] indicators for {len(chunk)} stocks could not be updated ({exc})"
+                self.failures.append(message)
+                logger.exception("Error refreshing indicators")
                 self.stdout.write(self.style.ERROR(message))
-                continue
 
-            created_rows += created
-            updated_rows += updated
-            latest_close = self._latest_close_price(df)
-            now = timezone.now()
-            update_kwargs = {
-                "prices_last_synced_at": now,
-                "updated_at": now,
-            }
-            if latest_close is not None:
-                update_kwargs["price"] = latest_close
-            Stock.objects.filter(pk=stock.pk).update(**update_kwargs)
-            self.stdout.write(
-                self.style.SUCCESS(
-                    f"[OK] {symbol}: {created} inserted, {updated} updated (total {len(df)} rows)."
-                )
+    def _refresh_factor_scores(self):
+        """Re-rank momentum (and the other factors) now that indicator state has moved."""
+        try:
+            refresh_factor_scores("classifier")
+        except Exception as exc:  # noqa: BLE001
+            message = f"[FAIL] factor scores could not be updated ({exc})"
+            self.failures.append(message)
+            logger.exception("Error refreshing factor scores")
+            self.stdout.write(self.style.ERROR(message))
+
+    def _skip_up_to_date(self, symbol, start_date, end_date):
+        self.stdout.write(
+            self.style.WARNING(
+                f"[SKIP] {symbol}: start_date {start_date} is after end_date {end_date}. Nothing to fetch."
             )
+        )
 
-        self.stdout.write(self.style.NOTICE(f"Processed stocks: {processed}"))
-        self.stdout.write(self.style.NOTICE(f"Inserted rows: {created_rows}, Updated rows: {updated_rows}"))
+    def _record_prices(self, stock: Stock, symbol: str, df: pd.DataFrame) -> None:
+        """Upsert a downloaded frame, refresh the price store and the stock's latest price."""
+        if df.empty:
+            self.stdout.write(self.style.WARNING(f"[SKIP] {symbol}: no data returned."))
+            return
 
-        if failures:
-            self.stdout.write(self.style.WARNING("Failures encountered:"))
-            for failure in failures:
-                self.stdout.write(self.style.WARNING(f"  - {failure}"))
-        else:
-            self.stdout.write(self.style.SUCCESS("Historical price sync completed without failures."))
+        if self.dry_run:
+            self.stdout.write(self.style.HTTP_INFO(f"[DRY RUN] {symbol}: {len(df)} rows fetched."))
+            return
+
+        try:
+            created, updated = self._upsert_prices(stock, df)
+        except Exception as exc:  # noqa: BLE001
+            message = f"[FAIL] {symbol}: upsert failed ({exc})"
+            self.failures.append(message)
+            logger.exception("Error upserting prices for %s", symbol)
+            self.stdout.write(self.style.ERROR(message))
+            return
+
+        self.created_rows += created
+        self.updated_rows += updated
+        series = series_from_frame(df)
+        self.written_from[stock.pk] = series.first_date
+        if self.price_store is not None:
+            try:
+                self.price_store.merge("classifier", stock.pk, series)
+            except OSError as exc:
+                message = f"[FAIL] {symbol}: price store update failed ({exc})"
+                self.failures.append(message)
+                logger.exception("Error writing price store for %s", symbol)
+                self.stdout.write(self.style.ERROR(message))
+        try:
+            apply_new_bars(HistorySummary, HistoricalPrice, stock.pk, series)
+        except Exception as exc:  # noqa: BLE001
+            message = f"[FAIL] {symbol}: history summary update failed ({exc})"
+            self.failures.append(message)
+            logger.exception("Error updating history summary for %s", symbol)
+            self.stdout.write(self.style.ERROR(message))
+        latest_close = self._latest_close_price(df)
+        now = timezone.now()
+        update_kwargs = {
+            "prices_last_synced_at": now,
+            "updated_at": now,
+        }
+        if latest_close is not None:
+            update_kwargs["price"] = latest_close
+        Stock.objects.filter(pk=stock.pk).update(**update_kwargs)
+        self.synced += 1
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"[OK] {symbol}: {created} inserted, {updated} updated (total {len(df)} rows)."
+            )
+        )
 
     @staticmethod
     def _parse_date_option(value: str | None, label: str) -> date | None:
@@ -186,13 +371,12 @@ class Command(BaseCommand):
             raise CommandError(f"Invalid {label} date '{value}'. Expected format YYYY-MM-DD.") from exc
 
     @staticmethod
-    def _determine_start_date(stock: Stock, override: date | None, force: bool) -> date | None:
+    def _determine_start_date(
+        stock: Stock, latest_price: date | None, override: date | None, force: bool
+    ) -> date | None:
         if override:
             return override
         if not force:
-            latest_price = (
-                stock.historical_prices.order_by("-date").values_list("date", flat=True).first()
-            )
             if latest_price:
                 return latest_price + timedelta(days=1)
             if stock.prices_last_synced_at:
@@ -222,57 +406,10 @@ class Command(BaseCommand):
                 progress=False,
                 threads=False,
             )
-        if df is None or df.empty:
-            return pd.DataFrame()
-        if isinstance(df.columns, pd.MultiIndex):
-            df.columns = df.columns.get_level_values(0)
-        df = df.rename(
-            columns={
-                "Open": "open_price",
-                "High": "high_price",
-                "Low": "low_price",
-                "Close": "close_price",
-                "Adj Close": "adjusted_close",
-                "Volume": "volume",
-            }
-        )
-        df.index = df.index.tz_localize(None)
-        return df[["open_price", "high_price", "low_price", "close_price", "adjusted_close", "volume"]]
+        return normalize_price_frame(df)
 
     def _upsert_prices(self, stock: Stock, df: pd.DataFrame) -> tuple[int, int]:
-        records = []
-        dates = []
-        for idx, row in df.iterrows():
-            price_date = idx.date() if isinstance(idx, datetime) else idx
-            dates.append(price_date)
-            records.append(
-                HistoricalPrice(
-                    stock=stock,
-                    date=price_date,
-                    open_price=self._to_decimal(row.get("open_price")),
-                    high_price=self._to_decimal(row.get("high_price")),
-                    low_price=self._to_decimal(row.get("low_price")),
-                    close_price=self._to_decimal(row.get("close_price")),
-                    adjusted_close=self._to_decimal(row.get("adjusted_close")),
-                    volume=self._to_int(row.get("volume")),
-                )
-            )
-
-        existing_dates = set(
-            HistoricalPrice.objects.filter(stock=stock, date__in=dates).values_list("date", flat=True)
-        )
-
-        with transaction.atomic():
-            HistoricalPrice.objects.bulk_create(
-                records,
-                update_conflicts=True,
-                unique_fields=["stock", "date"],
-                update_fields=["open_price", "high_price", "low_price", "close_price", "adjusted_close", "volume", "updated_at"],
-            )
-
-        created_count = len(dates) - len(existing_dates)
-        updated_count = len(existing_dates)
-        return created_count, updated_count
+        return upsert_price_frames(HistoricalPrice, [(stock.pk, df)])
 
     @staticmethod
     def _latest_close_price(df: pd.DataFrame) -> Decimal | None:
@@ -284,18 +421,6 @@ class Command(BaseCommand):
         value = Decimal(str(series.iloc[-1]))
         return value.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
-    @staticmethod
-    def _to_decimal(value) -> Decimal | None:
-        if value is None or pd.isna(value):
-            return None
-        return Decimal(str(round(float(value), 4)))
-
-    @staticmethod
-    def _to_int(value):
-        if value is None or pd.isna(value):
-            return None
-        return int(value)
-
     def _resolve_symbol(self, stock: Stock) -> str:
         """
         Convert stored ticker metadata into a yfinance-compatible symbol.
@@ -1,12 +1,18 @@
+from concurrent.futures import ProcessPoolExecutor
 from decimal import Decimal, InvalidOperation
 import re
 from pathlib import Path
 
 import pandas as pd
+from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
+from django.utils import timezone
 
+from screener.factors import refresh_factor_scores
+from screener.generation import bump_generation
 from screener.models import Exchange, Industry, Sector, Stock
+from screener.workbooks import load_ticker_sheet
 
 COUNTRY_ALIASES = {
     'india_mid_cap': 'India',
@@ -226,10 +232,38 @@ class Command(BaseCommand):
             action='store_true',
             help='Process files and show summary without writing to the database'
         )
+        parser.add_argument(
+            '--bulk',
+            action='store_true',
+            help='Resolve dimensions and stocks in memory and write with bulk_create/bulk_update'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Rows per bulk write in --bulk mode (default: 500)'
+        )
+        parser.add_argument(
+            '--jobs',
+            type=int,
+            default=1,
+            help='Worker processes used to parse workbooks in parallel (default: 1)'
+        )
+        parser.add_argument(
+            '--cache-dir',
+            help='Directory for Parquet copies of parsed workbooks (default: settings.IMPORT_CACHE_DIR)'
+        )
+        parser.add_argument(
+            '--no-cache',
+            action='store_true',
+            help='Always parse the Excel files instead of using cached Parquet copies'
+        )
 
     def handle(self, *args, **options):
         directory = Path(options['directory']).resolve()
         dry_run = options['dry_run']
+        self.bulk = options.get('bulk', False)
+        self.chunk_size = max(1, options.get('chunk_size') or 500)
 
         if not directory.exists():
             raise CommandError(f"Directory not found: {directory}")
@@ -242,15 +276,31 @@ class Command(BaseCommand):
         overall_updated = 0
         overall_skipped = 0
 
-        for excel_path in excel_files:
-            self.stdout.write(self.style.MIGRATE_HEADING(f"\nProcessing {excel_path.name}"))
-            created, updated, skipped = self._process_file(excel_path, dry_run=dry_run)
-            overall_created += created
-            overall_updated += updated
-            overall_skipped += skipped
-            self.stdout.write(
-                f"  {excel_path.name}: {created} created, {updated} updated, {skipped} skipped"
-            )
+        cache_dir = None if options.get('no_cache') else (options.get('cache_dir') or settings.IMPORT_CACHE_DIR)
+        jobs = max(1, options.get('jobs') or 1)
+        if jobs > 1 and len(excel_files) > 1:
+            # Parsing runs in worker processes; rows are still written here, one file at a time.
+            executor = ProcessPoolExecutor(max_workers=min(jobs, len(excel_files)))
+            sheets = executor.map(load_ticker_sheet, excel_files, [cache_dir] * len(excel_files))
+        else:
+            executor = None
+            sheets = (load_ticker_sheet(excel_path, cache_dir) for excel_path in excel_files)
+
+        try:
+            for excel_path, (sheet, cached) in zip(excel_files, sheets):
+                self.stdout.write(self.style.MIGRATE_HEADING(f"\nProcessing {excel_path.name}"))
+                if cached:
+                    self.stdout.write("  Using cached copy of unchanged workbook")
+                created, updated, skipped = self._process_file(excel_path, sheet, dry_run=dry_run)
+                overall_created += created
+                overall_updated += updated
+                overall_skipped += skipped
+                self.stdout.write(
+                    f"  {excel_path.name}: {created} created, {updated} updated, {skipped} skipped"
+                )
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
 
         self.stdout.write(self.style.SUCCESS("\nImport complete"))
         self.stdout.write(f"Total created: {overall_created}")
@@ -259,14 +309,16 @@ class Command(BaseCommand):
 
         if dry_run:
             self.stdout.write(self.style.WARNING("Dry run enabled: no database changes were saved."))
+        else:
+            scored = refresh_factor_scores('classifier')
+            self.stdout.write(f"Factor scores refreshed for {scored} stocks")
+            bump_generation('classifier')
 
-    def _process_file(self, excel_path: Path, dry_run: bool = False):
-        header_index = self._locate_header(excel_path)
-        if header_index is None:
+    def _process_file(self, excel_path: Path, df, dry_run: bool = False):
+        if df is None:
             self.stdout.write(self.style.WARNING("  Header row not found; skipping file"))
             return 0, 0, 0
 
-        df = pd.read_excel(excel_path, header=header_index)
         df = df.dropna(how='all')
         df.columns = [COLUMN_MAP.get(str(col).strip().lower(), None) for col in df.columns]
         df = df.loc[:, [col for col in df.columns if col]]  # drop columns without a mapping
@@ -292,6 +344,11 @@ class Command(BaseCommand):
         @transaction.atomic
         def _import_rows():
             nonlocal file_created, file_updated, file_skipped
+            if self.bulk:
+                file_created, file_updated, file_skipped = self._import_rows_bulk(df, excel_path, context_defaults)
+                if dry_run:
+                    raise transaction.TransactionManagementError("Dry run requested")
+                return
             for _, row in df.iterrows():
                 result = self._import_row(row, excel_path, context_defaults)
                 if result == 'created':
@@ -311,31 +368,20 @@ class Command(BaseCommand):
 
         return file_created, file_updated, file_skipped
 
-    def _locate_header(self, excel_path: Path):
-        preview = pd.read_excel(excel_path, header=None)
-        for idx, row in preview.iterrows():
-            values = [
-                str(value).strip().lower()
-                for value in row
-                if isinstance(value, str)
-            ]
-            if 'ticker' in values:
-                return idx
-        return None
-
-    def _import_row(self, row, excel_path: Path, context_defaults: dict):
+    def _prepare_row(self, row, excel_path: Path, context_defaults: dict):
+        """Map a spreadsheet row to exchange, classification and stock values, or None to skip."""
         ticker_source = _coalesce(row.get('ticker'))
         if context_defaults.get('use_full_ticker'):
             ticker_source = _coalesce(row.get('full_ticker'), ticker_source)
 
         ticker = _normalize_ticker(ticker_source)
         if not ticker:
-            return 'skipped'
+            return None
 
         company_name = _coalesce(row.get('company_name'), row.get('name'))
         if not company_name:
             self.stdout.write(f"    Skipping {ticker}: missing company name")
-            return 'skipped'
+            return None
 
         exchange_name = _coalesce(row.get('exchange_long_name'), context_defaults.get('exchange_name_fallback'))
         exchange_code_raw = _normalise_code(row.get('exchange_short_name'), context_defaults['exchange_code_fallback'])
@@ -355,8 +401,54 @@ class Command(BaseCommand):
 
         exchange_country = _normalize_country(_coalesce(row.get('operating_country')) or _coalesce(excel_path.stem))
 
+        stock_defaults = {
+            'company_name': company_name,
+            'full_ticker': _coalesce(row.get('full_ticker')),
+            'country': _normalize_country(_coalesce(row.get('operating_country'), row.get('country'), row.get('operating_country_iso'), exchange_country, 'Unknown')),
+            'operating_country': _normalize_country(_coalesce(row.get('operating_country'))),
+            'operating_country_iso': _coalesce(row.get('operating_country_iso')),
+            'exchange_long_name': canonical_name,
+            'exchange_short_name': _coalesce(row.get('exchange_short_name')) or canonical_code,
+            'price': _parse_decimal(row.get('price')),
+            'price_target': _parse_decimal(row.get('price_target')),
+            'fair_value': _parse_decimal(row.get('fair_value')),
+            'fair_value_label': _coalesce(row.get('fair_value_label')),
+            'analyst_target': _parse_decimal(row.get('analyst_target')),
+            'analyst_target_label': _coalesce(row.get('analyst_target_label')),
+            'health_label': _coalesce(row.get('health_label')),
+            'market_cap': _parse_decimal(row.get('market_cap')),
+            'dividend_per_share': _parse_decimal(row.get('dividend_per_share')),
+            'dividend_yield': _parse_decimal(row.get('dividend_yield')),
+            'relative_strength_index': _parse_decimal(row.get('relative_strength_index')),
+            'pe_ratio': _parse_decimal(row.get('pe_ratio')),
+            'price_to_book': _cap_decimal(_parse_decimal(row.get('price_to_book')), SMALL_DECIMAL_LIMIT),
+            'price_to_sales': _cap_decimal(_parse_decimal(row.get('price_to_sales')), SMALL_DECIMAL_LIMIT),
+            'enterprise_value': _parse_decimal(row.get('enterprise_value')),
+            'total_debt_to_total_capital': _parse_decimal(row.get('total_debt_to_total_capital')),
+            'float_shares_to_outstanding': _parse_decimal(row.get('float_shares_to_outstanding')),
+        }
+
+        return {
+            'ticker': ticker,
+            'company_name': company_name,
+            'exchange_code': canonical_code,
+            'exchange_name': canonical_name,
+            'exchange_country': exchange_country,
+            'sector_name': _coalesce(row.get('sector')),
+            'industry_name': _coalesce(row.get('industry')),
+            'stock_defaults': stock_defaults,
+        }
+
+    def _import_row(self, row, excel_path: Path, context_defaults: dict):
+        prepared = self._prepare_row(row, excel_path, context_defaults)
+        if prepared is None:
+            return 'skipped'
+        ticker = prepared['ticker']
+        canonical_name = prepared['exchange_name']
+        exchange_country = prepared['exchange_country']
+
         exchange, _ = Exchange.objects.get_or_create(
-            code=canonical_code,
+            code=prepared['exchange_code'],
             defaults={
                 'name': canonical_name,
                 'country': exchange_country or 'Unknown',
@@ -376,11 +468,11 @@ class Command(BaseCommand):
         sector_obj = None
         industry_obj = None
 
-        sector_name = _coalesce(row.get('sector'))
+        sector_name = prepared['sector_name']
         if sector_name:
             sector_obj, _ = Sector.objects.get_or_create(name=sector_name)
 
-        industry_name = _coalesce(row.get('industry'))
+        industry_name = prepared['industry_name']
         if industry_name:
             industry_obj, _ = Industry.objects.get_or_create(
                 name=industry_name,
@@ -391,33 +483,10 @@ class Command(BaseCommand):
                 industry_obj.save()
 
         stock_defaults = {
-            'company_name': company_name,
-            'full_ticker': _coalesce(row.get('full_ticker')),
+            **prepared['stock_defaults'],
             'exchange': exchange,
             'sector': sector_obj,
             'industry': industry_obj,
-            'country': _normalize_country(_coalesce(row.get('operating_country'), row.get('country'), row.get('operating_country_iso'), exchange_country, 'Unknown')),
-            'operating_country': _normalize_country(_coalesce(row.get('operating_country'))),
-            'operating_country_iso': _coalesce(row.get('operating_country_iso')),
-            'exchange_long_name': canonical_name,
-            'exchange_short_name': _coalesce(row.get('exchange_short_name')) or canonical_code,
-            'price': _parse_decimal(row.get('price')),
-            'price_target': _parse_decimal(row.get('price_target')),
-            'fair_value': _parse_decimal(row.get('fair_value')),
-            'fair_value_label': _coalesce(row.get('fair_value_label')),
-            'analyst_target': _parse_decimal(row.get('analyst_target')),
-            'analyst_target_label': _coalesce(row.get('analyst_target_label')),
-            'health_label': _coalesce(row.get('health_label')),
-            'market_cap': _parse_decimal(row.get('market_cap')),
-            'dividend_per_share': _parse_decimal(row.get('dividend_per_share')),
-            'dividend_yield': _parse_decimal(row.get('dividend_yield')),
-            'relative_strength_index': _parse_decimal(row.get('relative_strength_index')),
-            'pe_ratio': _parse_decimal(row.get('pe_ratio')),
-            'price_to_book': _cap_decimal(_parse_decimal(row.get('price_to_book')), SMALL_DECIMAL_LIMIT),
-            'price_to_sales': _cap_decimal(_parse_decimal(row.get('price_to_sales')), SMALL_DECIMAL_LIMIT),
-            'enterprise_value': _parse_decimal(row.get('enterprise_value')),
-            'total_debt_to_total_capital': _parse_decimal(row.get('total_debt_to_total_capital')),
-            'float_shares_to_outstanding': _parse_decimal(row.get('float_shares_to_outstanding')),
         }
 
         try:
@@ -430,5 +499,180 @@ class Command(BaseCommand):
             return 'skipped'
 
         action = 'created' if created else 'updated'
-        self.stdout.write(f"    {action.title()} {ticker} ({company_name})")
+        self.stdout.write(f"    {action.title()} {ticker} ({prepared['company_name']})")
         return action
+
+    def _import_rows_bulk(self, df, excel_path: Path, context_defaults: dict):
+        """Import a sheet with preloaded dimension caches and chunked bulk writes.
+
+        Rows are applied in sheet order against in-memory objects so the
+        resulting state and the created/updated/skipped counts match the
+        row-by-row import.
+        """
+        prepared_rows = []
+        skipped = 0
+        for row in df.to_dict('records'):
+            prepared = self._prepare_row(row, excel_path, context_defaults)
+            if prepared is None:
+                skipped += 1
+            else:
+                prepared_rows.append(prepared)
+        if not prepared_rows:
+            return 0, 0, skipped
+
+        exchanges = self._resolve_exchanges(prepared_rows)
+        sectors = self._resolve_sectors(prepared_rows)
+        industries = self._resolve_industries(prepared_rows, sectors)
+
+        tickers = list(dict.fromkeys(prepared['ticker'] for prepared in prepared_rows))
+        existing = {}
+        for offset in range(0, len(tickers), self.chunk_size):
+            for stock in Stock.objects.filter(ticker__in=tickers[offset:offset + self.chunk_size]):
+                existing.setdefault(stock.ticker, []).append(stock)
+
+        new_stocks = {}
+        changed_stocks = {}
+        outcomes = []
+        for prepared in prepared_rows:
+            ticker = prepared['ticker']
+            values = {
+                **prepared['stock_defaults'],
+                'exchange': exchanges[prepared['exchange_code']],
+                'sector': sectors.get(prepared['sector_name']),
+                'industry': industries.get(prepared['industry_name']),
+            }
+            matches = existing.get(ticker, [])
+            if len(matches) > 1:
+                self.stdout.write(self.style.ERROR(
+                    f"    Error importing {ticker}: get() returned more than one Stock -- it returned {len(matches)}!"
+                ))
+                skipped += 1
+                continue
+            if matches:
+                stock, action = matches[0], 'updated'
+                changed_stocks[stock.pk] = stock
+            elif ticker in new_stocks:
+                stock, action = new_stocks[ticker], 'updated'
+            else:
+                stock, action = Stock(ticker=ticker), 'created'
+                new_stocks[ticker] = stock
+            for field_name, value in values.items():
+                setattr(stock, field_name, value)
+            outcomes.append((stock, action))
+            self.stdout.write(f"    {action.title()} {ticker} ({prepared['company_name']})")
+
+        update_fields = [*prepared_rows[0]['stock_defaults'], 'exchange', 'sector', 'industry', 'updated_at']
+        failed = self._write_stocks(list(new_stocks.values()), list(changed_stocks.values()), update_fields)
+        created = updated = 0
+        for stock, action in outcomes:
+            if id(stock) in failed:
+                skipped += 1
+            elif action == 'created':
+                created += 1
+            else:
+                updated += 1
+        return created, updated, skipped
+
+    def _resolve_exchanges(self, prepared_rows):
+        exchanges = {exchange.code: exchange for exchange in Exchange.objects.all()}
+        new_exchanges = {}
+        changed = {}
+        for prepared in prepared_rows:
+            code = prepared['exchange_code']
+            name = prepared['exchange_name']
+            country = prepared['exchange_country']
+            exchange = exchanges.get(code)
+            if exchange is None:
+                exchange = Exchange(code=code, name=name, country=country or 'Unknown')
+                exchanges[code] = new_exchanges[code] = exchange
+            if name and exchange.name != name:
+                exchange.name = name
+                changed[code] = exchange
+            if country and exchange.country != country:
+                exchange.country = country
+                changed[code] = exchange
+        Exchange.objects.bulk_create(new_exchanges.values())
+        Exchange.objects.bulk_update(
+            [exchange for code, exchange in changed.items() if code not in new_exchanges], ['name', 'country']
+        )
+        return self._reload_missing_pks(Exchange, 'code', exchanges)
+
+    def _resolve_sectors(self, prepared_rows):
+        sectors = {sector.name: sector for sector in Sector.objects.all()}
+        new_sectors = [
+            Sector(name=name)
+            for name in dict.fromkeys(prepared['sector_name'] for prepared in prepared_rows)
+            if name and name not in sectors
+        ]
+        Sector.objects.bulk_create(new_sectors)
+        sectors.update((sector.name, sector) for sector in new_sectors)
+        return self._reload_missing_pks(Sector, 'name', sectors)
+
+    def _resolve_industries(self, prepared_rows, sectors):
+        industries = {industry.name: industry for industry in Industry.objects.all()}
+        new_industries = {}
+        changed = {}
+        for prepared in prepared_rows:
+            name = prepared['industry_name']
+            if not name:
+                continue
+            sector = sectors.get(prepared['sector_name'])
+            industry = industries.get(name)
+            if industry is None:
+                if sector is None:
+                    # An industry cannot be created without a sector; leave it unset.
+                    continue
+                industry = Industry(name=name, sector=sector)
+                industries[name] = new_industries[name] = industry
+            elif sector is not None and industry.sector_id != sector.pk:
+                industry.sector = sector
+                changed[name] = industry
+        Industry.objects.bulk_create(new_industries.values())
+        Industry.objects.bulk_update(
+            [industry for name, industry in changed.items() if name not in new_industries], ['sector']
+        )
+        return self._reload_missing_pks(Industry, 'name', industries)
+
+    @staticmethod
+    def _reload_missing_pks(model, key_field, objects):
+        """Fetch primary keys for rows whose backend could not return them from bulk_create."""
+        missing = [key for key, obj in objects.items() if obj.pk is None]
+        if missing:
+            for obj in model.objects.filter(**{f'{key_field}__in': missing}):
+                objects[getattr(obj, key_field)] = obj
+        return objects
+
+    def _write_stocks(self, new_stocks, changed_stocks, update_fields):
+        """Write stocks in chunks; return ids of objects that could not be saved."""
+        now = timezone.now()
+        for stock in changed_stocks:
+            stock.updated_at = now
+
+        failed = set()
+        for offset in range(0, len(new_stocks), self.chunk_size):
+            chunk = new_stocks[offset:offset + self.chunk_size]
+            try:
+                with transaction.atomic():
+                    Stock.objects.bulk_create(chunk)
+            except Exception:  # pylint: disable=broad-except
+                failed.update(self._save_individually(chunk))
+        for offset in range(0, len(changed_stocks), self.chunk_size):
+            chunk = changed_stocks[offset:offset + self.chunk_size]
+            try:
+                with transaction.atomic():
+                    Stock.objects.bulk_update(chunk, update_fields)
+            except Exception:  # pylint: disable=broad-except
+                failed.update(self._save_individually(chunk))
+        return failed
+
+    def _save_individually(self, stocks):
+        """Fallback for a chunk the database rejected: save rows one by one to isolate failures."""
+        failed = set()
+        for stock in stocks:
+            try:
+                with transaction.atomic():
+                    stock.save()
+            except Exception as exc:  # pylint: disable=broad-except
+                self.stdout.write(self.style.ERROR(f"    Error importing {stock.ticker}: {exc}"))
+                failed.add(id(stock))
+        return failed
@@ -2,6 +2,7 @@ from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 import pandas as pd
 from pathlib import Path
+from screener.generation import bump_generation_on_commit
 from screener.models import Stock, Sector, Industry, Exchange
 
 
@@ -280,6 +281,7 @@ class Command(BaseCommand):
             if dry_run:
                 self.stdout.write(self.style.WARNING("\nDRY RUN MODE - No changes were made to the database"))
             else:
+                bump_generation_on_commit('classifier')
                 self.stdout.write(self.style.SUCCESS(f"\nSuccessfully updated {total_updated} stock classifications"))
 
         except Exception as e:
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.6 on 2026-10-18 02:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('screener', '0007_accessibleexchange_accessiblesector_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccessibleHistorySummary',
+            fields=[
+                ('stock', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='history_summary', serialize=False, to='screener.accessiblestock')),
+                ('first_date', models.DateField()),
+                ('last_date', models.DateField()),
+                ('high_close', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True)),
+                ('high_close_date', models.DateField(blank=True, null=True)),
+                ('low_close', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True)),
+                ('low_close_date', models.DateField(blank=True, null=True)),
+                ('latest_open', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True)),
+                ('latest_high', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True)),
+                ('latest_low', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True)),
+                ('latest_close', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True)),
+                ('latest_adjusted_close', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True)),
+                ('latest_volume', models.BigIntegerField(blank=True, null=True)),
+                ('previous_date', models.DateField(blank=True, null=True)),
+                ('previous_close', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='HistorySummary',
+            fields=[
+                ('stock', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='history_summary', serialize=False, to='screener.stock')),
+                ('first_date', models.DateField()),
+                ('last_date', models.DateField()),
+                ('high_close', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True)),
+                ('high_close_date', models.DateField(blank=True, null=True)),
+                ('low_close', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True)),
+                ('low_close_date', models.DateField(blank=True, null=True)),
+                ('latest_open', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True)),
+                ('latest_high', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True)),
+                ('latest_low', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True)),
+                ('latest_close', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True)),
+                ('latest_adjusted_close', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True)),
+                ('latest_volume', models.BigIntegerField(blank=True, null=True)),
+                ('previous_date', models.DateField(blank=True, null=True)),
+                ('previous_close', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.6 on 2026-10-18 03:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('screener', '0008_history_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccessibleStockIndicators',
+            fields=[
+                ('stock', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='indicators', serialize=False, to='screener.accessiblestock')),
+                ('last_date', models.DateField()),
+                ('sma_20', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True)),
+                ('sma_50', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True)),
+                ('sma_200', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True)),
+                ('high_52_week', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True)),
+                ('low_52_week', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True)),
+                ('last_close', models.FloatField(blank=True, null=True)),
+                ('rsi_average_gain', models.FloatField(default=0)),
+                ('rsi_average_loss', models.FloatField(default=0)),
+                ('rsi_seed_count', models.PositiveSmallIntegerField(default=0)),
+                ('rolling_window', models.BinaryField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockIndicators',
+            fields=[
+                ('stock', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='indicators', serialize=False, to='screener.stock')),
+                ('last_date', models.DateField()),
+                ('sma_20', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True)),
+                ('sma_50', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True)),
+                ('sma_200', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True)),
+                ('high_52_week', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True)),
+                ('low_52_week', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True)),
+                ('last_close', models.FloatField(blank=True, null=True)),
+                ('rsi_average_gain', models.FloatField(default=0)),
+                ('rsi_average_loss', models.FloatField(default=0)),
+                ('rsi_seed_count', models.PositiveSmallIntegerField(default=0)),
+                ('rolling_window', models.BinaryField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
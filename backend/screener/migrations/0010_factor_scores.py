@@ -0,0 +1,50 @@
+# Generated by Django 5.2.6 on 2026-10-18 03:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('screener', '0009_stock_indicators'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccessibleFactorScore',
+            fields=[
+                ('stock', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='factor_scores', serialize=False, to='screener.accessiblestock')),
+                ('value_score', models.FloatField(blank=True, null=True)),
+                ('value_rank', models.FloatField(blank=True, db_index=True, null=True)),
+                ('quality_score', models.FloatField(blank=True, null=True)),
+                ('quality_rank', models.FloatField(blank=True, db_index=True, null=True)),
+                ('momentum_score', models.FloatField(blank=True, null=True)),
+                ('momentum_rank', models.FloatField(blank=True, db_index=True, null=True)),
+                ('size_score', models.FloatField(blank=True, null=True)),
+                ('size_rank', models.FloatField(blank=True, db_index=True, null=True)),
+                ('momentum_3m', models.FloatField(blank=True, null=True)),
+                ('momentum_6m', models.FloatField(blank=True, null=True)),
+                ('momentum_12_1', models.FloatField(blank=True, null=True)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FactorScore',
+            fields=[
+                ('stock', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='factor_scores', serialize=False, to='screener.stock')),
+                ('value_score', models.FloatField(blank=True, null=True)),
+                ('value_rank', models.FloatField(blank=True, db_index=True, null=True)),
+                ('quality_score', models.FloatField(blank=True, null=True)),
+                ('quality_rank', models.FloatField(blank=True, db_index=True, null=True)),
+                ('momentum_score', models.FloatField(blank=True, null=True)),
+                ('momentum_rank', models.FloatField(blank=True, db_index=True, null=True)),
+                ('size_score', models.FloatField(blank=True, null=True)),
+                ('size_rank', models.FloatField(blank=True, db_index=True, null=True)),
+                ('momentum_3m', models.FloatField(blank=True, null=True)),
+                ('momentum_6m', models.FloatField(blank=True, null=True)),
+                ('momentum_12_1', models.FloatField(blank=True, null=True)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -122,6 +122,71 @@ class HistoricalPrice(models.Model):
     def __str__(self):
         return f"{self.stock.ticker} @ {self.date}"
 
+class HistorySummary(models.Model):
+    """Precomputed span, extremes and latest bars of a stock's price history."""
+    stock = models.OneToOneField(Stock, on_delete=models.CASCADE, primary_key=True, related_name='history_summary')
+    first_date = models.DateField()
+    last_date = models.DateField()
+    high_close = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
+    high_close_date = models.DateField(null=True, blank=True)
+    low_close = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
+    low_close_date = models.DateField(null=True, blank=True)
+    latest_open = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
+    latest_high = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
+    latest_low = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
+    latest_close = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
+    latest_adjusted_close = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
+    latest_volume = models.BigIntegerField(null=True, blank=True)
+    previous_date = models.DateField(null=True, blank=True)
+    previous_close = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.stock.ticker} {self.first_date}..{self.last_date}"
+
+class StockIndicators(models.Model):
+    """Indicators derived from price history plus the rolling state to extend them."""
+    stock = models.OneToOneField(Stock, on_delete=models.CASCADE, primary_key=True, related_name='indicators')
+    last_date = models.DateField()
+    sma_20 = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
+    sma_50 = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
+    sma_200 = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
+    high_52_week = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
+    low_52_week = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
+
+    # Rolling state: Wilder averages (running sums while seeding) and the last 252 bars
+    last_close = models.FloatField(null=True, blank=True)
+    rsi_average_gain = models.FloatField(default=0)
+    rsi_average_loss = models.FloatField(default=0)
+    rsi_seed_count = models.PositiveSmallIntegerField(default=0)
+    rolling_window = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.stock.ticker} indicators @ {self.last_date}"
+
+
+class FactorScore(models.Model):
+    """Sector-relative factor scores (mean z-score) and percentile ranks (0-100)."""
+    stock = models.OneToOneField(Stock, on_delete=models.CASCADE, primary_key=True, related_name='factor_scores')
+    value_score = models.FloatField(null=True, blank=True)
+    value_rank = models.FloatField(null=True, blank=True, db_index=True)
+    quality_score = models.FloatField(null=True, blank=True)
+    quality_rank = models.FloatField(null=True, blank=True, db_index=True)
+    momentum_score = models.FloatField(null=True, blank=True)
+    momentum_rank = models.FloatField(null=True, blank=True, db_index=True)
+    size_score = models.FloatField(null=True, blank=True)
+    size_rank = models.FloatField(null=True, blank=True, db_index=True)
+
+    # Trailing returns behind the momentum score
+    momentum_3m = models.FloatField(null=True, blank=True)
+    momentum_6m = models.FloatField(null=True, blank=True)
+    momentum_12_1 = models.FloatField(null=True, blank=True)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.stock.ticker} factor scores"
+
 
 class AccessibleExchange(models.Model):
     code = models.CharField(max_length=10, unique=True)
@@ -251,3 +316,70 @@ class AccessibleHistoricalPrice(models.Model):
 
     def __str__(self):
         return f"{self.stock.ticker} @ {self.date}"
+
+
+class AccessibleHistorySummary(models.Model):
+    """Precomputed span, extremes and latest bars of a stock's price history."""
+    stock = models.OneToOneField(AccessibleStock, on_delete=models.CASCADE, primary_key=True, related_name='history_summary')
+    first_date = models.DateField()
+    last_date = models.DateField()
+    high_close = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
+    high_close_date = models.DateField(null=True, blank=True)
+    low_close = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
+    low_close_date = models.DateField(null=True, blank=True)
+    latest_open = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
+    latest_high = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
+    latest_low = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
+    latest_close = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
+    latest_adjusted_close = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
+    latest_volume = models.BigIntegerField(null=True, blank=True)
+    previous_date = models.DateField(null=True, blank=True)
+    previous_close = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.stock.ticker} {self.first_date}..{self.last_date}"
+
+
+class AccessibleStockIndicators(models.Model):
+    """Indicators derived from price history plus the rolling state to extend them."""
+    stock = models.OneToOneField(AccessibleStock, on_delete=models.CASCADE, primary_key=True, related_name='indicators')
+    last_date = models.DateField()
+    sma_20 = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
+    sma_50 = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
+    sma_200 = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
+    high_52_week = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
+    low_52_week = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
+
+    # Rolling state: Wilder averages (running sums while seeding) and the last 252 bars
+    last_close = models.FloatField(null=True, blank=True)
+    rsi_average_gain = models.FloatField(default=0)
+    rsi_average_loss = models.FloatField(default=0)
+    rsi_seed_count = models.PositiveSmallIntegerField(default=0)
+    rolling_window = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.stock.ticker} indicators @ {self.last_date}"
+
+
+class AccessibleFactorScore(models.Model):
+    """Sector-relative factor scores (mean z-score) and percentile ranks (0-100)."""
+    stock = models.OneToOneField(AccessibleStock, on_delete=models.CASCADE, primary_key=True, related_name='factor_scores')
+    value_score = models.FloatField(null=True, blank=True)
+    value_rank = models.FloatField(null=True, blank=True, db_index=True)
+    quality_score = models.FloatField(null=True, blank=True)
+    quality_rank = models.FloatField(null=True, blank=True, db_index=True)
+    momentum_score = models.FloatField(null=True, blank=True)
+    momentum_rank = models.FloatField(null=True, blank=True, db_index=True)
+    size_score = models.FloatField(null=True, blank=True)
+    size_rank = models.FloatField(null=True, blank=True, db_index=True)
+
+    # Trailing returns behind the momentum score
+    momentum_3m = models.FloatField(null=True, blank=True)
+    momentum_6m = models.FloatField(null=True, blank=True)
+    momentum_12_1 = models.FloatField(null=True, blank=True)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.stock.ticker} factor scores"
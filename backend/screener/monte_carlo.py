@@ -0,0 +1,213 @@
+"""Monte Carlo projections of portfolio value for the fund simulator.
+
+Daily log returns are either drawn from a multivariate normal fitted to a
+``ReturnsMatrix`` (correlated through a Cholesky factor of the covariance)
+or bootstrapped from its historical rows, so cross-asset correlation on a
+given day is kept. Paths are simulated in chunks with NumPy array
+operations: each chunk steps one rebalancing period at a time, growing every
+holding by its cumulative return and resetting to the target weights at the
+end of the period. Growth is only needed on sampled days and period ends, so
+the normal model draws one shock per segment between them (a sum of k normal
+days is normal with k times the mean and covariance). Chunk sizes are bounded by ``max_chunk_bytes``, so 10,000
+paths of ten years over 30 holdings never materialize at once; only the
+portfolio value on every ``sample_every``-th day is kept for the fan chart.
+
+``simulate_strategies`` runs several weightings of the same universe,
+optionally in worker processes. Each strategy draws from its own seed derived
+from the caller's, so results do not depend on the number of workers.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from .returns import TRADING_DAYS
+
+METHODS = ('normal', 'bootstrap')
+
+# Trading days between rebalances; None holds the initial shares throughout.
+REBALANCING_PERIODS = {
+    'monthly': 21,
+    'quarterly': 63,
+    'semi_annually': 126,
+    'annually': 252,
+    'never': None,
+}
+
+DEFAULT_PATHS = 10_000
+DEFAULT_PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+DEFAULT_SAMPLE_EVERY = 21
+MAX_CHUNK_BYTES = 64 * 1024 * 1024
+
+
+@dataclass
+class SimulationResult:
+    days: np.ndarray  # trading days from the start for each fan-chart column
+    percentiles: dict  # percentile -> portfolio values on ``days``
+    final_values: np.ndarray
+    initial_investment: float
+    summary: dict = field(default_factory=dict)
+
+    def to_payload(self):
+        return {
+            'days': self.days.tolist(),
+            'percentiles': {str(key): values.tolist() for key, values in self.percentiles.items()},
+            'summary': self.summary,
+        }
+
+
+def _cholesky(covariance):
+    """Lower-triangular factor of ``covariance``, tolerating rank deficiency."""
+    try:
+        return np.linalg.cholesky(covariance)
+    except np.linalg.LinAlgError:
+        # Singular (e.g. duplicate holdings): factor through the clipped eigen decomposition.
+        eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+        return eigenvectors * np.sqrt(np.clip(eigenvalues, 0, None))
+
+
+class _ReturnSampler:
+    """Draw summed daily log returns over consecutive segments of days."""
+
+    def __init__(self, returns, method):
+        if method == 'normal':
+            if np.isnan(returns.mean).any() or np.isnan(returns.covariance).any():
+                raise ValueError('Not enough price history to estimate the mean and covariance of every holding.')
+            self.mean = returns.mean / TRADING_DAYS
+            self.factor = _cholesky(returns.covariance / TRADING_DAYS)
+        elif method == 'bootstrap':
+            history = returns.returns[~np.isnan(returns.returns).any(axis=1)]
+            if not len(history):
+                raise ValueError('No dates on which every holding has a return to bootstrap from.')
+            self.history = history
+        else:
+            raise ValueError(f'Unknown simulation method {method!r}; expected one of {", ".join(METHODS)}.')
+        self.method = method
+
+    def segment_sums(self, rng, paths, lengths):
+        """Return (paths, segments, assets) sums of log returns over segments of ``lengths`` days."""
+        if self.method == 'normal':
+            # A sum of k i.i.d. normal days is one normal draw with k times the mean and covariance.
+            shocks = rng.standard_normal((paths, len(lengths), len(self.mean)))
+            return (shocks @ self.factor.T) * np.sqrt(lengths)[:, None] + np.outer(lengths, self.mean)
+        rows = rng.integers(0, len(self.history), size=(paths, int(lengths.sum())))
+        return np.add.reduceat(self.history[rows], np.r_[0, np.cumsum(lengths)[:-1]], axis=1)
+
+
+def _simulate_chunk(sampler, rng, weights, paths, horizon, period, block, sample_days, initial_investment):
+    """Return portfolio values on ``sample_days`` for ``paths`` paths."""
+    holdings = np.broadcast_to(weights * initial_investment, (paths, len(weights))).copy()
+    samples = np.empty((paths, len(sample_days)))
+    sampled = 0
+    day = 0
+    while day < horizon:
+        length = min(block, horizon - day)
+        # Sampled days falling in this block, as offsets into it (day numbers start at 1).
+        wanted = sample_days[(sample_days > day) & (sample_days <= day + length)] - day - 1
+        # Growth is only needed at sampled days and at the block end.
+        cuts = np.union1d(wanted, [length - 1])
+        segments = sampler.segment_sums(rng, paths, np.diff(np.r_[-1, cuts]))
+        growth = np.exp(np.cumsum(segments, axis=1))
+        if len(wanted):
+            at = np.searchsorted(cuts, wanted)
+            samples[:, sampled:sampled + len(wanted)] = np.einsum('pn,pdn->pd', holdings, growth[:, at])
+            sampled += len(wanted)
+        holdings *= growth[:, -1]
+        day += length
+        if period and day % period == 0:
+            holdings = holdings.sum(axis=1, keepdims=True) * weights
+    return samples
+
+
+def _summary(final_values, initial_investment, percentiles):
+    returns = final_values / initial_investment - 1
+    var_95, var_99 = np.percentile(returns, [5, 1])
+    return {
+        'median': float(np.median(final_values)),
+        'mean': float(final_values.mean()),
+        'probability_of_loss': float((final_values < initial_investment).mean()),
+        'value_at_risk_95': float(var_95),
+        'value_at_risk_99': float(var_99),
+        'expected_shortfall_95': float(returns[returns <= var_95].mean()),
+        'final_percentiles': {str(key): float(value) for key, value in zip(percentiles, np.percentile(final_values, percentiles))},
+    }
+
+
+def simulate_portfolio(
+    returns,
+    weights,
+    years=4,
+    initial_investment=100_000,
+    paths=DEFAULT_PATHS,
+    method='normal',
+    rebalancing='quarterly',
+    percentiles=DEFAULT_PERCENTILES,
+    seed=None,
+    sample_every=DEFAULT_SAMPLE_EVERY,
+    max_chunk_bytes=MAX_CHUNK_BYTES,
+):
+    """Simulate ``paths`` futures of a portfolio over ``returns.stock_ids``.
+
+    ``weights`` are target weights in ``returns.stock_ids`` order and are
+    normalized to sum to one. The same ``seed`` and inputs give the same result.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    if weights.shape != (len(returns.stock_ids),):
+        raise ValueError(f'Expected {len(returns.stock_ids)} weights, got {weights.size}.')
+    if (weights < 0).any() or weights.sum() <= 0:
+        raise ValueError('Weights must be non-negative and not all zero.')
+    if rebalancing not in REBALANCING_PERIODS:
+        raise ValueError(f'Unknown rebalancing frequency {rebalancing!r}; expected one of {", ".join(REBALANCING_PERIODS)}.')
+    weights = weights / weights.sum()
+    sampler = _ReturnSampler(returns, method)
+
+    horizon = int(round(years * TRADING_DAYS))
+    if horizon < 1 or paths < 1:
+        raise ValueError('The horizon and the number of paths must be positive.')
+    period = REBALANCING_PERIODS[rebalancing]
+    block = period or TRADING_DAYS
+    sample_days = np.unique(np.r_[np.arange(sample_every, horizon, max(1, sample_every)), horizon])
+    # Bounded by the bootstrap's daily draws for one block, the largest array alive.
+    chunk = max(1, int(max_chunk_bytes // (2 * 8 * block * len(weights))))
+
+    rng = np.random.default_rng(seed)
+    values = np.empty((paths, len(sample_days)))
+    for offset in range(0, paths, chunk):
+        count = min(chunk, paths - offset)
+        values[offset:offset + count] = _simulate_chunk(
+            sampler, rng, weights, count, horizon, period, block, sample_days, initial_investment,
+        )
+
+    final_values = values[:, -1].copy()
+    fan = np.percentile(values, percentiles, axis=0)
+    return SimulationResult(
+        days=np.r_[0, sample_days],
+        percentiles={
+            percentile: np.r_[initial_investment, row]
+            for percentile, row in zip(percentiles, fan)
+        },
+        final_values=final_values,
+        initial_investment=float(initial_investment),
+        summary=_summary(final_values, initial_investment, percentiles),
+    )
+
+
+def _simulate_strategy(args):
+    returns, weights, options = args
+    return simulate_portfolio(returns, weights, **options)
+
+
+def simulate_strategies(returns, strategies, seed=None, workers=1, **options):
+    """Run ``simulate_portfolio`` for each ``{name: weights}`` strategy.
+
+    With ``workers`` > 1 strategies run in a process pool.
+    """
+    names = list(strategies)
+    seeds = np.random.SeedSequence(seed).spawn(len(names))
+    tasks = [(returns, strategies[name], {**options, 'seed': child}) for name, child in zip(names, seeds)]
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            results = list(executor.map(_simulate_strategy, tasks))
+    else:
+        results = [_simulate_strategy(task) for task in tasks]
+    return dict(zip(names, results))
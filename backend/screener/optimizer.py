@@ -0,0 +1,327 @@
+"""Long-only mean-variance optimization for the Risk-Optimized strategy.
+
+Weights are constrained to ``min_weight <= w <= max_weight`` with
+``sum(w) == 1``. Every objective is solved by projected gradient methods on
+that set, using an exact O(N log N) Euclidean projection:
+
+``min_volatility``
+    minimize ``w' S w`` (accelerated projected gradient with restarts).
+``multi_objective``
+    minimize ``risk_weight * w' S w - return_weight * mu' w``.
+``target_return``
+    minimum variance with ``mu' w >= target_return``, found by a bracketed
+    root search on the return multiplier of the ``multi_objective`` form.
+``max_sharpe``
+    maximize ``(mu' w - rf) / sqrt(w' S w)``. The ratio is pseudo-concave
+    where the excess return is positive, so projected gradient ascent from a
+    positive starting point reaches the global maximum.
+
+``S`` is the Ledoit-Wolf shrinkage of the sample covariance of daily log
+returns towards a scaled identity, which keeps it well conditioned when a
+universe has about as many stocks as observations. ``optimize_universe``
+caches these inputs per dataset generation and remembers the last solution
+for each universe and constraint set, so a re-solve after a slider change
+starts next to its answer.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+from django.core.cache import cache
+
+from .response_cache import RESPONSE_CACHE_TIMEOUT, cached_payload, response_cache_key
+from .returns import TRADING_DAYS, returns_matrix
+
+OBJECTIVES = ('max_sharpe', 'min_volatility', 'target_return', 'multi_objective')
+
+MAX_ITERATIONS = 5000
+TOLERANCE = 1e-9
+RETURN_TOLERANCE = 1e-6
+
+
+@dataclass
+class OptimizationResult:
+    weights: np.ndarray
+    expected_return: float
+    volatility: float
+    sharpe_ratio: float | None
+    iterations: int
+    converged: bool
+
+
+def ledoit_wolf(returns):
+    """Return ``(covariance, shrinkage)`` for a (T x N) matrix of returns.
+
+    Shrinks the sample covariance towards ``mu * I`` with the intensity from
+    Ledoit & Wolf, "A well-conditioned estimator for large-dimensional
+    covariance matrices" (2004).
+    """
+    observations, count = returns.shape
+    centered = returns - returns.mean(axis=0)
+    sample = centered.T @ centered / observations
+    mu = np.trace(sample) / count
+    squared = centered ** 2
+    # Variance of the entries of x x' around the sample covariance, and distance to the target.
+    beta = (np.sum(squared.T @ squared) / observations - np.sum(sample ** 2)) / (count * observations)
+    delta = np.sum((sample - mu * np.eye(count)) ** 2) / count
+    shrinkage = 0.0 if delta == 0 else min(beta, delta) / delta
+    return (1 - shrinkage) * sample + shrinkage * mu * np.eye(count), float(shrinkage)
+
+
+def check_bounds(count, min_weight, max_weight):
+    if not 0 <= min_weight <= max_weight:
+        raise ValueError('Weight bounds must satisfy 0 <= min_weight <= max_weight.')
+    if count * min_weight > 1 + RETURN_TOLERANCE or count * max_weight < 1 - RETURN_TOLERANCE:
+        raise ValueError(f'Weight bounds cannot sum to 100% over {count} holdings.')
+
+
+def project(values, min_weight, max_weight):
+    """Euclidean projection onto ``{w : sum(w) == 1, min_weight <= w <= max_weight}``.
+
+    ``sum(clip(values - tau))`` is piecewise linear and decreasing in ``tau``
+    with breakpoints at ``values - max_weight`` and ``values - min_weight``;
+    walk the sorted breakpoints and interpolate where it crosses one.
+    """
+    count = len(values)
+    breakpoints = np.r_[values - max_weight, values - min_weight]
+    # The slope drops by one when a weight leaves its upper bound and recovers when it hits the lower one.
+    slopes = np.r_[np.full(count, -1.0), np.full(count, 1.0)]
+    order = np.argsort(breakpoints, kind='stable')
+    breakpoints, slopes = breakpoints[order], np.cumsum(slopes[order])
+    totals = count * max_weight + np.r_[0.0, np.cumsum(slopes[:-1] * np.diff(breakpoints))]
+    index = int(np.searchsorted(-totals, -1.0, side='left'))
+    if index == 0:
+        tau = breakpoints[0]
+    elif index >= len(breakpoints):
+        tau = breakpoints[-1]
+    else:
+        # totals[index - 1] > 1 >= totals[index]; the segment between has slope slopes[index - 1].
+        tau = breakpoints[index - 1] + (totals[index - 1] - 1.0) / -slopes[index - 1]
+    return np.clip(values - tau, min_weight, max_weight)
+
+
+def max_return_weights(mean, min_weight, max_weight):
+    """The highest-return portfolio: fill the best stocks up to ``max_weight`` in turn."""
+    weights = np.full(len(mean), min_weight)
+    remaining = 1.0 - weights.sum()
+    for index in np.argsort(-mean, kind='stable'):
+        step = min(max_weight - min_weight, remaining)
+        weights[index] += step
+        remaining -= step
+        if remaining <= 0:
+            break
+    return weights
+
+
+def _solve_quadratic(quadratic, linear, lipschitz, start, min_weight, max_weight):
+    """Minimize ``w' Q w - c' w`` with FISTA; return (weights, iterations, converged)."""
+    step = 1.0 / lipschitz if lipschitz > 0 else 1.0
+    weights = momentum = start
+    scale = 1.0
+    for iteration in range(1, MAX_ITERATIONS + 1):
+        gradient = 2 * quadratic @ momentum - linear
+        updated = project(momentum - step * gradient, min_weight, max_weight)
+        if np.abs(updated - weights).max() < TOLERANCE:
+            return updated, iteration, True
+        if gradient @ (updated - weights) > 0:
+            # Momentum is pointing uphill: restart it (O'Donoghue & Candes adaptive restart).
+            scale = 1.0
+            momentum = updated
+        else:
+            next_scale = (1 + np.sqrt(1 + 4 * scale * scale)) / 2
+            momentum = updated + ((scale - 1) / next_scale) * (updated - weights)
+            scale = next_scale
+        weights = updated
+    return weights, MAX_ITERATIONS, False
+
+
+def _solve_sharpe(mean, covariance, risk_free_rate, start, min_weight, max_weight):
+    """Projected gradient ascent on the Sharpe ratio with backtracking."""
+    excess = mean - risk_free_rate
+
+    def sharpe(weights):
+        return (excess @ weights) / np.sqrt(weights @ covariance @ weights)
+
+    weights = start
+    if excess @ weights <= 0 or not np.isfinite(sharpe(weights)):
+        weights = max_return_weights(mean, min_weight, max_weight)
+    value = sharpe(weights)
+    step = 1.0
+    for iteration in range(1, MAX_ITERATIONS + 1):
+        variance = weights @ covariance @ weights
+        volatility = np.sqrt(variance)
+        gradient = excess / volatility - (excess @ weights) * (covariance @ weights) / (variance * volatility)
+        while True:
+            candidate = project(weights + step * gradient, min_weight, max_weight)
+            candidate_value = sharpe(candidate)
+            if candidate_value >= value + 1e-4 * gradient @ (candidate - weights) or step < 1e-12:
+                break
+            step /= 2
+        if np.abs(candidate - weights).max() < TOLERANCE or candidate_value < value:
+            return (candidate if candidate_value >= value else weights), iteration, True
+        weights, value = candidate, candidate_value
+        step *= 2
+    return weights, MAX_ITERATIONS, False
+
+
+def optimize_weights(
+    mean,
+    covariance,
+    objective='max_sharpe',
+    risk_free_rate=0.0,
+    target_return=None,
+    return_weight=0.5,
+    risk_weight=0.5,
+    min_weight=0.0,
+    max_weight=1.0,
+    initial=None,
+    lipschitz=None,
+):
+    """Solve one objective for annualized ``mean`` and ``covariance``.
+
+    ``initial`` warm-starts the solver; ``lipschitz`` is the largest
+    eigenvalue of ``covariance`` when the caller already knows it.
+    """
+    mean = np.asarray(mean, dtype=np.float64)
+    covariance = np.asarray(covariance, dtype=np.float64)
+    count = len(mean)
+    if objective not in OBJECTIVES:
+        raise ValueError(f'Unknown objective {objective!r}; expected one of {", ".join(OBJECTIVES)}.')
+    if not count:
+        raise ValueError('The universe has no stocks with price history.')
+    check_bounds(count, min_weight, max_weight)
+    if lipschitz is None:
+        lipschitz = float(np.linalg.eigvalsh(covariance)[-1])
+    start = np.full(count, 1.0 / count) if initial is None or len(initial) != count else np.asarray(initial, dtype=np.float64)
+    start = project(start, min_weight, max_weight)
+
+    if objective == 'max_sharpe':
+        if max_return_weights(mean, min_weight, max_weight) @ mean <= risk_free_rate:
+            raise ValueError('No portfolio within the weight bounds returns more than the risk-free rate.')
+        weights, iterations, converged = _solve_sharpe(mean, covariance, risk_free_rate, start, min_weight, max_weight)
+    elif objective == 'min_volatility':
+        weights, iterations, converged = _solve_quadratic(covariance, np.zeros(count), 2 * lipschitz, start, min_weight, max_weight)
+    elif objective == 'multi_objective':
+        weights, iterations, converged = _solve_quadratic(
+            risk_weight * covariance, return_weight * mean, 2 * risk_weight * lipschitz, start, min_weight, max_weight,
+        )
+    else:
+        weights, iterations, converged = _solve_target_return(mean, covariance, target_return, lipschitz, start, min_weight, max_weight)
+
+    expected_return = float(mean @ weights)
+    volatility = float(np.sqrt(max(weights @ covariance @ weights, 0.0)))
+    return OptimizationResult(
+        weights=weights,
+        expected_return=expected_return,
+        volatility=volatility,
+        sharpe_ratio=(expected_return - risk_free_rate) / volatility if volatility > 0 else None,
+        iterations=iterations,
+        converged=converged,
+    )
+
+
+def _solve_target_return(mean, covariance, target_return, lipschitz, start, min_weight, max_weight):
+    if target_return is None:
+        raise ValueError('The target_return objective needs a target return.')
+    if max_return_weights(mean, min_weight, max_weight) @ mean < target_return - RETURN_TOLERANCE:
+        raise ValueError('The target return is higher than any portfolio within the weight bounds can reach.')
+    total = 0
+
+    def solve(multiplier, initial):
+        nonlocal total
+        weights, iterations, converged = _solve_quadratic(covariance, multiplier * mean, 2 * lipschitz, initial, min_weight, max_weight)
+        total += iterations
+        return weights, converged
+
+    weights, converged = solve(0.0, start)
+    if mean @ weights >= target_return - RETURN_TOLERANCE:
+        return weights, total, converged
+    # The return of the solution grows with the return multiplier: bracket the
+    # target, then find the multiplier that meets it by regula falsi (Illinois).
+    low, low_gap = 0.0, mean @ weights - target_return
+    high = 1.0
+    best, best_converged = solve(high, weights)
+    high_gap = mean @ best - target_return
+    while high_gap < -RETURN_TOLERANCE and high < 1e8:
+        low, low_gap = high, high_gap
+        high *= 4
+        best, best_converged = solve(high, best)
+        high_gap = mean @ best - target_return
+    side = 0
+    for _ in range(100):
+        if high_gap <= RETURN_TOLERANCE or high - low <= 1e-12 * high:
+            break
+        middle = (low * high_gap - high * low_gap) / (high_gap - low_gap)
+        candidate, candidate_converged = solve(middle, best)
+        gap = mean @ candidate - target_return
+        if gap >= -RETURN_TOLERANCE:
+            high, high_gap, best, best_converged = middle, gap, candidate, candidate_converged
+            if side == 1:
+                low_gap /= 2
+            side = 1
+        else:
+            low, low_gap = middle, gap
+            if side == -1:
+                high_gap /= 2
+            side = -1
+    return best, total, best_converged
+
+
+def optimization_inputs(dataset_key, stock_ids, start=None, end=None):
+    """Cached annualized mean, shrunk covariance and its largest eigenvalue for a universe."""
+    def build():
+        matrix = returns_matrix(dataset_key, stock_ids, start, end, missing='drop')
+        count = len(matrix.stock_ids)
+        if len(matrix) > 1 and count:
+            daily, shrinkage = ledoit_wolf(matrix.returns)
+            covariance = daily * TRADING_DAYS
+            lipschitz = float(np.linalg.eigvalsh(covariance)[-1])
+        else:
+            covariance, shrinkage, lipschitz = np.full((count, count), np.nan), None, None
+        return {
+            'stock_ids': matrix.stock_ids,
+            'missing': matrix.missing,
+            'dates': (matrix.dates[0], matrix.dates[-1]) if len(matrix) else None,
+            'observations': len(matrix),
+            'mean': matrix.mean,
+            'covariance': covariance,
+            'shrinkage': shrinkage,
+            'lipschitz': lipschitz,
+        }
+
+    return cached_payload('optimizer_inputs', dataset_key, _universe_params(stock_ids, start, end), build)
+
+
+def _universe_params(stock_ids, start, end):
+    return {
+        'stocks': ','.join(str(stock_id) for stock_id in stock_ids),
+        'start': start.isoformat() if start else None,
+        'end': end.isoformat() if end else None,
+    }
+
+
+def optimize_universe(dataset_key, stock_ids, start=None, end=None, min_weight=0.0, max_weight=1.0, **options):
+    """Optimize over ``stock_ids`` warm-started from the last solution for the same universe and bounds.
+
+    Returns ``(result, inputs)``; see ``optimize_weights`` for ``options``.
+    """
+    stock_ids = list(dict.fromkeys(stock_ids))
+    inputs = optimization_inputs(dataset_key, stock_ids, start, end)
+    if inputs['observations'] < 2:
+        raise ValueError('Not enough shared price history to estimate risk for this universe.')
+
+    warm_key = response_cache_key(
+        'optimizer_warm_start',
+        dataset_key,
+        {**_universe_params(stock_ids, start, end), 'min_weight': min_weight, 'max_weight': max_weight},
+    )
+    result = optimize_weights(
+        inputs['mean'],
+        inputs['covariance'],
+        min_weight=min_weight,
+        max_weight=max_weight,
+        initial=cache.get(warm_key),
+        lipschitz=inputs['lipschitz'],
+        **options,
+    )
+    cache.set(warm_key, result.weights, RESPONSE_CACHE_TIMEOUT)
+    return result, inputs
@@ -1,7 +1,19 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+import json
+from base64 import b64decode, b64encode
+from decimal import Decimal
 
+from django.core.cache import cache
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
-class CustomPageNumberPagination(PageNumberPagination):
+from .generation import get_generation
+
+
+class ClampedPageSizeMixin:
     page_size_query_param = 'page_size'
     page_size = 30  # Default page size
     max_page_size = 200  # Maximum allowed page size
@@ -17,4 +29,136 @@ class CustomPageNumberPagination(PageNumberPagination):
                     return min(page_size, self.max_page_size)
             except (KeyError, ValueError):
                 pass
-        return self.page_size
\ No newline at end of file
+        return self.page_size
+
+
+class CustomPageNumberPagination(ClampedPageSizeMixin, PageNumberPagination):
+    pass
+
+
+class KeysetPagination(ClampedPageSizeMixin, BasePagination):
+    """
+    Cursor pagination keyed on (ordering value, id).
+
+    Pages are fetched with a WHERE clause seeking past the last row seen, so
+    every page costs O(page_size) regardless of depth. Only the first ordering
+    term is used; ``id`` breaks ties in the same direction and NULLs always
+    sort last. The total count is skipped unless ``include_count=true`` is
+    passed, and is then cached per dataset generation and filter set.
+    """
+    cursor_query_param = 'cursor'
+    count_query_param = 'include_count'
+    count_cache_timeout = 300
+    default_ordering = 'ticker'
+    # Parameters that change the page but not the filtered row set
+    non_filter_params = ('cursor', 'page_size', 'ordering', 'pagination', 'include_count', 'format')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+
+        self.field, self.descending = self.get_ordering(queryset)
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor['r'])
+
+        self.count = None
+        if request.query_params.get(self.count_query_param, '').lower() == 'true':
+            self.count = self.get_count(queryset, request, view)
+
+        ordered = queryset.order_by(*self.get_order_by(reverse))
+        if cursor:
+            ordered = ordered.filter(self.seek_filter(cursor['v'], cursor['id'], reverse))
+
+        rows = list(ordered[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        if reverse:
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        self.first_row = rows[0] if rows else None
+        self.last_row = rows[-1] if rows else None
+        if not rows:
+            self.has_next = self.has_previous = False
+        return rows
+
+    def get_ordering(self, queryset):
+        ordering = list(queryset.query.order_by) or [self.default_ordering]
+        term = str(ordering[0])
+        return term.lstrip('-'), term.startswith('-')
+
+    def get_order_by(self, reverse=False):
+        descending = self.descending != reverse
+        # NULLs trail the display order, so they lead when walking backwards.
+        nulls = {'nulls_first': True} if reverse else {'nulls_last': True}
+        value = F(self.field).desc(**nulls) if descending else F(self.field).asc(**nulls)
+        return [value, '-id' if descending else 'id']
+
+    def seek_filter(self, value, pk, reverse=False):
+        """Rows strictly after (value, pk) in the display order, or before it when reversing."""
+        descending = self.descending != reverse
+        op = 'lt' if descending else 'gt'
+        field = self.field
+        if value is None:
+            tie = Q(**{f'{field}__isnull': True, f'id__{op}': pk})
+            return Q(**{f'{field}__isnull': False}) | tie if reverse else tie
+        seek = Q(**{f'{field}__{op}': value}) | Q(**{field: value, f'id__{op}': pk})
+        return seek if reverse else seek | Q(**{f'{field}__isnull': True})
+
+    def get_count(self, queryset, request, view=None):
+        dataset_key = view.get_dataset_key() if hasattr(view, 'get_dataset_key') else 'classifier'
+        filters = sorted(
+            (key, value)
+            for key, value in request.query_params.items()
+            if key not in self.non_filter_params
+        )
+        digest = hashlib.sha1(json.dumps(filters).encode()).hexdigest()
+        key = f'screener:count:{dataset_key}:{get_generation(dataset_key)}:{digest}'
+        count = cache.get(key)
+        if count is None:
+            count = queryset.order_by().count()
+            cache.set(key, count, self.count_cache_timeout)
+        return count
+
+    def encode_cursor(self, row, reverse):
+        value = getattr(row, self.field)
+        if isinstance(value, Decimal):
+            value = str(value)
+        payload = json.dumps({'v': value, 'id': row.pk, 'r': int(reverse)}, separators=(',', ':'))
+        encoded = b64encode(payload.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(b64decode(encoded.encode('ascii')).decode('utf-8'))
+            cursor['id'] = int(cursor['id'])
+            cursor['r'] = bool(cursor.get('r'))
+            cursor.setdefault('v', None)
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound('Invalid cursor')
+        return cursor
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.last_row, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor(self.first_row, reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'count': self.count,
+            'results': data,
+        })
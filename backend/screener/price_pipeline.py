@@ -0,0 +1,138 @@
+"""Concurrent fetch stage for price syncs.
+
+Download batches are fetched by a bounded pool of worker threads and handed
+to the caller through a bounded queue, so the caller can write one batch to
+the database while the next ones are still downloading. Each source host is
+rate limited and failed fetches are retried with exponential backoff.
+"""
+import logging
+import queue
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class FetchBatch:
+    symbols: tuple[str, ...]
+    start_date: date | None
+    end_date: date
+
+
+@dataclass
+class FetchResult:
+    batch: FetchBatch
+    frames: dict = field(default_factory=dict)
+    error: Exception | None = None
+    attempts: int = 0
+
+
+class RateLimiter:
+    """Space out calls so each host sees at most ``rate`` requests per second."""
+
+    def __init__(self, rate: float | None, clock=time.monotonic, sleep=time.sleep):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._clock = clock
+        self._sleep = sleep
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host: str) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = self._clock()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            self._sleep(slot - now)
+
+
+class PricePipeline:
+    _DONE = object()
+
+    def __init__(
+        self,
+        source,
+        workers: int = 4,
+        rate_limit: float | None = 2.0,
+        retries: int = 3,
+        backoff: float = 1.0,
+        queue_size: int = 4,
+        sleep=time.sleep,
+    ):
+        self.source = source
+        self.workers = max(1, workers)
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.queue_size = max(1, queue_size)
+        self.sleep = sleep
+        self.limiter = RateLimiter(rate_limit, sleep=sleep)
+        self.host = getattr(source, "host", "default")
+
+    def fetch(self, batch: FetchBatch) -> FetchResult:
+        """Fetch one batch, retrying with exponential backoff and jitter."""
+        attempt = 0
+        while True:
+            attempt += 1
+            self.limiter.wait(self.host)
+            try:
+                frames = self.source.fetch(batch.symbols, batch.start_date, batch.end_date)
+                return FetchResult(batch, frames or {}, attempts=attempt)
+            except Exception as exc:  # noqa: BLE001 - any source error is retried, then reported
+                if attempt > self.retries:
+                    return FetchResult(batch, error=exc, attempts=attempt)
+                delay = self.backoff * (2 ** (attempt - 1)) * (1 + random.random() * 0.25)
+                logger.warning("Fetch of %s failed (%s); retrying in %.1fs", ",".join(batch.symbols), exc, delay)
+                self.sleep(delay)
+
+    def run(self, batches):
+        """Yield a FetchResult per batch, in completion order."""
+        tasks = queue.Queue()
+        for batch in batches:
+            tasks.put(batch)
+        results = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+
+        def _put(item):
+            while not stop.is_set():
+                try:
+                    results.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+
+        def _worker():
+            try:
+                while not stop.is_set():
+                    try:
+                        batch = tasks.get_nowait()
+                    except queue.Empty:
+                        break
+                    _put(self.fetch(batch))
+            finally:
+                _put(self._DONE)
+
+        threads = [
+            threading.Thread(target=_worker, name=f"price-fetch-{index}", daemon=True)
+            for index in range(min(self.workers, tasks.qsize()))
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            finished = 0
+            while finished < len(threads):
+                item = results.get()
+                if item is self._DONE:
+                    finished += 1
+                    continue
+                yield item
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
@@ -0,0 +1,70 @@
+from datetime import date, timedelta
+
+import pandas as pd
+import yfinance as yf
+
+PRICE_FRAME_COLUMNS = {
+    "Open": "open_price",
+    "High": "high_price",
+    "Low": "low_price",
+    "Close": "close_price",
+    "Adj Close": "adjusted_close",
+    "Volume": "volume",
+}
+
+
+def normalize_price_frame(df: pd.DataFrame | None) -> pd.DataFrame:
+    """Rename a single-symbol yfinance frame to HistoricalPrice column names."""
+    if df is None or df.empty:
+        return pd.DataFrame()
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = df.columns.get_level_values(0)
+    df = df.rename(columns=PRICE_FRAME_COLUMNS)
+    df.index = df.index.tz_localize(None)
+    return df[list(PRICE_FRAME_COLUMNS.values())]
+
+
+def split_multi_symbol_frame(df: pd.DataFrame | None, symbols) -> dict[str, pd.DataFrame]:
+    """Split a grouped multi-ticker download into one normalized frame per symbol."""
+    frames = {}
+    if df is None or df.empty:
+        return frames
+    if not isinstance(df.columns, pd.MultiIndex):
+        # yfinance returns flat columns when only one symbol was requested.
+        if len(symbols) == 1:
+            frames[symbols[0]] = normalize_price_frame(df).dropna(how="all")
+        return frames
+
+    level = 0 if set(symbols) & set(df.columns.get_level_values(0)) else 1
+    available = set(df.columns.get_level_values(level))
+    for symbol in symbols:
+        if symbol not in available:
+            continue
+        frame = df.xs(symbol, axis=1, level=level).copy()
+        frame = normalize_price_frame(frame).dropna(how="all")
+        if not frame.empty:
+            frames[symbol] = frame
+    return frames
+
+
+class YFinanceSource:
+    """Daily bars from Yahoo Finance, several symbols per download call."""
+
+    host = "query1.finance.yahoo.com"
+
+    def fetch(self, symbols, start_date: date | None, end_date: date) -> dict[str, pd.DataFrame]:
+        symbols = list(symbols)
+        kwargs = {
+            "tickers": symbols,
+            "end": (end_date + timedelta(days=1)).isoformat(),
+            "interval": "1d",
+            "auto_adjust": False,
+            "progress": False,
+            "threads": False,
+            "group_by": "ticker",
+        }
+        if start_date:
+            kwargs["start"] = start_date.isoformat()
+        else:
+            kwargs["period"] = "max"
+        return split_multi_symbol_frame(yf.download(**kwargs), symbols)
@@ -0,0 +1,244 @@
+"""Read-optimized columnar store for daily price history.
+
+Each stock gets two ``.npy`` files under ``PRICE_STORE_DIR/<dataset>/``:
+``<id>.dates.npy`` (sorted ``datetime64[D]``) and ``<id>.values.npy``, a
+C-contiguous float64 array of shape (6, n) holding one row per
+``PRICE_COLUMNS`` entry with NaN for missing values. Reads are memory-mapped,
+so window slices are zero-copy views. ``HistoricalPrice`` stays the system of
+record; the ``historical_prices`` command keeps the store in step and
+``build_price_store`` backfills it.
+"""
+import os
+import tempfile
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+PRICE_COLUMNS = ('open_price', 'high_price', 'low_price', 'close_price', 'adjusted_close', 'volume')
+PRICE_DECIMALS = 4
+
+
+class PriceSeries:
+    """Daily bars as a date axis plus one float64 row per price column."""
+
+    __slots__ = ('dates', 'values')
+
+    def __init__(self, dates, values):
+        self.dates = dates
+        self.values = values
+
+    @classmethod
+    def empty(cls):
+        return cls(np.empty(0, dtype='datetime64[D]'), np.empty((len(PRICE_COLUMNS), 0), dtype=np.float64))
+
+    def __len__(self):
+        return len(self.dates)
+
+    def column(self, name):
+        return self.values[PRICE_COLUMNS.index(name)]
+
+    def window(self, start=None, end=None):
+        """Return the bars between ``start`` and ``end`` inclusive as views."""
+        lo = 0 if start is None else int(np.searchsorted(self.dates, np.datetime64(start, 'D'), side='left'))
+        hi = len(self.dates) if end is None else int(np.searchsorted(self.dates, np.datetime64(end, 'D'), side='right'))
+        return PriceSeries(self.dates[lo:hi], self.values[:, lo:hi])
+
+    def tail(self, count):
+        if count >= len(self.dates):
+            return self
+        return PriceSeries(self.dates[-count:], self.values[:, -count:])
+
+    @property
+    def first_date(self):
+        return self.dates[0].astype(date) if len(self.dates) else None
+
+    @property
+    def last_date(self):
+        return self.dates[-1].astype(date) if len(self.dates) else None
+
+    def to_columns(self, include_dates=True):
+        """Return parallel lists keyed like ``to_records`` rows, NaN as None."""
+        missing = np.isnan(self.values)
+        columns = {'date': np.datetime_as_string(self.dates, unit='D').tolist()} if include_dates else {}
+        for index, name in enumerate(PRICE_COLUMNS[:-1]):
+            columns[name] = np.where(missing[index], None, self.values[index]).tolist()
+        columns['volume'] = np.where(missing[-1], None, np.nan_to_num(self.values[-1]).astype(np.int64)).tolist()
+        return columns
+
+    def to_records(self):
+        """Return rows shaped like ``HistoricalPriceSerializer`` output."""
+        dates = np.datetime_as_string(self.dates, unit='D').tolist()
+        missing = np.isnan(self.values)
+        columns = [
+            np.where(missing[index], None, self.values[index]).tolist()
+            for index in range(len(PRICE_COLUMNS) - 1)
+        ]
+        volume = self.values[-1]
+        volumes = np.where(missing[-1], None, np.nan_to_num(volume).astype(np.int64)).tolist()
+        return [
+            {
+                'date': day,
+                'open_price': open_price,
+                'high_price': high_price,
+                'low_price': low_price,
+                'close_price': close_price,
+                'adjusted_close': adjusted_close,
+                'volume': vol,
+            }
+            for day, open_price, high_price, low_price, close_price, adjusted_close, vol in zip(dates, *columns, volumes)
+        ]
+
+
+def series_from_frame(df):
+    """Build a series from a downloaded price frame indexed by date."""
+    if df is None or df.empty:
+        return PriceSeries.empty()
+    dates = np.asarray(df.index.values, dtype='datetime64[D]')
+    values = np.vstack([
+        df[column].to_numpy(dtype=np.float64, na_value=np.nan) if column in df.columns else np.full(len(df), np.nan)
+        for column in PRICE_COLUMNS
+    ])
+    values[:-1] = np.round(values[:-1], PRICE_DECIMALS)
+    values[-1] = np.trunc(values[-1])
+    order = np.argsort(dates, kind='stable')
+    return PriceSeries(dates[order], np.ascontiguousarray(values[:, order]))
+
+
+def series_from_rows(rows):
+    """Build a series from ``(date, open, high, low, close, adj close, volume)`` rows."""
+    if not rows:
+        return PriceSeries.empty()
+    dates = np.array([row[0] for row in rows], dtype='datetime64[D]')
+    values = np.array(
+        [[np.nan if value is None else float(value) for value in row[1:]] for row in rows],
+        dtype=np.float64,
+    ).T
+    order = np.argsort(dates, kind='stable')
+    return PriceSeries(dates[order], np.ascontiguousarray(values[:, order]))
+
+
+def history_rows(history_qs):
+    """Fetch price rows for ``series_from_rows`` without building model instances."""
+    return list(history_qs.order_by('date').values_list('date', *PRICE_COLUMNS))
+
+
+def merge_series(existing, update):
+    """Union two series by date; rows in ``update`` win on overlapping dates."""
+    if existing is None or not len(existing):
+        return update
+    if not len(update):
+        return existing
+    keep = ~np.isin(existing.dates, update.dates)
+    dates = np.concatenate([existing.dates[keep], update.dates])
+    values = np.concatenate([existing.values[:, keep], update.values], axis=1)
+    order = np.argsort(dates, kind='stable')
+    return PriceSeries(dates[order], np.ascontiguousarray(values[:, order]))
+
+
+def align_series(series_list):
+    """Reindex series onto the union of their dates; gaps become NaN.
+
+    Returns the shared date axis and one series per input, all using it.
+    """
+    if not series_list:
+        return np.empty(0, dtype='datetime64[D]'), []
+    dates = np.unique(np.concatenate([np.asarray(series.dates, dtype='datetime64[D]') for series in series_list]))
+    aligned = []
+    for series in series_list:
+        values = np.full((len(PRICE_COLUMNS), len(dates)), np.nan)
+        values[:, np.searchsorted(dates, series.dates)] = series.values
+        aligned.append(PriceSeries(dates, values))
+    return dates, aligned
+
+
+def grouped_history_rows(history_model, stock_ids, start=None, end=None):
+    """Fetch rows for many stocks in one query, grouped by stock id."""
+    history_qs = history_model.objects.filter(stock_id__in=stock_ids)
+    if start:
+        history_qs = history_qs.filter(date__gte=start)
+    if end:
+        history_qs = history_qs.filter(date__lte=end)
+    grouped = {stock_id: [] for stock_id in stock_ids}
+    for stock_id, *row in history_qs.order_by('stock_id', 'date').values_list('stock_id', 'date', *PRICE_COLUMNS):
+        grouped[stock_id].append(row)
+    return grouped
+
+
+class PriceStore:
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def _paths(self, dataset_key, stock_id):
+        directory = self.root / dataset_key
+        return directory / f'{stock_id}.dates.npy', directory / f'{stock_id}.values.npy'
+
+    def read(self, dataset_key, stock_id):
+        """Return a memory-mapped series for the stock, or None if not stored."""
+        dates_path, values_path = self._paths(dataset_key, stock_id)
+        try:
+            dates = np.load(dates_path, mmap_mode='r')
+            values = np.load(values_path, mmap_mode='r')
+        except (FileNotFoundError, ValueError):
+            return None
+        if values.shape != (len(PRICE_COLUMNS), len(dates)):
+            # A writer replaced one file but not yet the other.
+            return None
+        return PriceSeries(dates, values)
+
+    def write(self, dataset_key, stock_id, series):
+        dates_path, values_path = self._paths(dataset_key, stock_id)
+        dates_path.parent.mkdir(parents=True, exist_ok=True)
+        self._atomic_save(values_path, np.ascontiguousarray(series.values, dtype=np.float64))
+        self._atomic_save(dates_path, np.asarray(series.dates, dtype='datetime64[D]'))
+
+    def merge(self, dataset_key, stock_id, series):
+        """Merge new bars into the stored series and return the result."""
+        existing = self.read(dataset_key, stock_id)
+        merged = merge_series(existing, series)
+        self.write(dataset_key, stock_id, merged)
+        return merged
+
+    def delete(self, dataset_key, stock_id):
+        for path in self._paths(dataset_key, stock_id):
+            path.unlink(missing_ok=True)
+
+    @staticmethod
+    def _atomic_save(path, array):
+        handle, tmp_name = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as tmp_file:
+                np.save(tmp_file, array)
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+
+def get_price_store():
+    """Return the configured price store, or None when it is disabled."""
+    if not getattr(settings, 'PRICE_STORE_ENABLED', False):
+        return None
+    return PriceStore(settings.PRICE_STORE_DIR)
+
+
+def stored_series(dataset_key, stock_id):
+    """Return the stored series for a stock, or None if unavailable."""
+    store = get_price_store()
+    if store is None:
+        return None
+    return store.read(dataset_key, stock_id)
+
+
+def load_series(dataset_key, stock, start=None, end=None):
+    """Read a stock's bars from the store, falling back to the database."""
+    series = stored_series(dataset_key, stock.pk)
+    if series is not None:
+        return series.window(start, end)
+    history_qs = stock.historical_prices.all()
+    if start:
+        history_qs = history_qs.filter(date__gte=start)
+    if end:
+        history_qs = history_qs.filter(date__lte=end)
+    return series_from_rows(history_rows(history_qs))
@@ -0,0 +1,178 @@
+"""Bulk upsert of downloaded price frames into a HistoricalPrice-style table.
+
+Frames are converted column-wise (vectorized rounding and NaN masking)
+instead of row by row. PostgreSQL streams the rows with ``COPY`` into a
+temporary staging table and merges them with one ``INSERT ... ON CONFLICT``
+that also reports how many rows were inserted and how many updated. SQLite
+uses batched ``executemany`` upserts; other backends fall back to
+``bulk_create(update_conflicts=True)``.
+"""
+import io
+
+import numpy as np
+import pandas as pd
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .price_store import PRICE_COLUMNS, PRICE_DECIMALS
+
+DECIMAL_COLUMNS = PRICE_COLUMNS[:-1]
+EXECUTEMANY_CHUNK = 5000
+
+
+def price_frame_columns(stock_id, df):
+    """Return a normalized, de-duplicated column frame ready for writing."""
+    dates = pd.DatetimeIndex(df.index).normalize()
+    frame = pd.DataFrame({'stock_id': np.full(len(df), stock_id, dtype=np.int64), 'date': dates.date})
+    for column in DECIMAL_COLUMNS:
+        values = df[column].to_numpy(dtype=np.float64, na_value=np.nan) if column in df.columns else np.full(len(df), np.nan)
+        frame[column] = np.round(values, PRICE_DECIMALS)
+    volume = df['volume'].to_numpy(dtype=np.float64, na_value=np.nan) if 'volume' in df.columns else np.full(len(df), np.nan)
+    frame['volume'] = pd.array(np.trunc(volume), dtype='Int64')
+    # The last row wins when a download repeats a date, matching bulk_create's upsert.
+    return frame.drop_duplicates(subset=['stock_id', 'date'], keep='last').reset_index(drop=True)
+
+
+def upsert_price_frames(model, frames):
+    """Upsert ``(stock_id, DataFrame)`` pairs; return (inserted, updated) counts."""
+    parts = [price_frame_columns(stock_id, df) for stock_id, df in frames if df is not None and not df.empty]
+    if not parts:
+        return 0, 0
+    rows = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+    rows = rows.drop_duplicates(subset=['stock_id', 'date'], keep='last')
+
+    if connection.vendor == 'postgresql':
+        return _copy_upsert(model, rows)
+    if connection.vendor == 'sqlite':
+        return _executemany_upsert(model, rows)
+    return _bulk_create_upsert(model, rows)
+
+
+def _column_names(model):
+    opts = model._meta
+    return {name: opts.get_field(name).column for name in ('stock', 'date', *PRICE_COLUMNS, 'created_at', 'updated_at')}
+
+
+def _copy_upsert(model, rows):
+    opts = model._meta
+    columns = _column_names(model)
+    quote = connection.ops.quote_name
+    table = quote(opts.db_table)
+    staging = quote(f'{opts.db_table}_staging')
+    quoted = ', '.join(quote(columns[name]) for name in ('stock', 'date', *PRICE_COLUMNS))
+    definitions = ', '.join(
+        f'{quote(columns[name])} '
+        f'{opts.get_field(name).rel_db_type(connection) if name == "stock" else opts.get_field(name).db_type(connection)}'
+        for name in ('stock', 'date', *PRICE_COLUMNS)
+    )
+    updates = ', '.join(
+        f'{quote(columns[name])} = EXCLUDED.{quote(columns[name])}'
+        for name in (*PRICE_COLUMNS, 'updated_at')
+    )
+    copy_sql = f'COPY {staging} ({quoted}) FROM STDIN WITH (FORMAT text)'
+    merge_sql = (
+        f'WITH upserted AS ('
+        f'INSERT INTO {table} ({quoted}, {quote(columns["created_at"])}, {quote(columns["updated_at"])}) '
+        f'SELECT {quoted}, %s, %s FROM {staging} '
+        f'ON CONFLICT ({quote(columns["stock"])}, {quote(columns["date"])}) DO UPDATE SET {updates} '
+        f'RETURNING (xmax = 0) AS inserted'
+        f') SELECT COUNT(*) FILTER (WHERE inserted), COUNT(*) FILTER (WHERE NOT inserted) FROM upserted'
+    )
+
+    buffer = io.StringIO()
+    rows.to_csv(buffer, sep='\t', header=False, index=False, na_rep='\\N')
+    buffer.seek(0)
+    now = timezone.now()
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        # The staging table lives for the session and is emptied before each load.
+        cursor.execute(f'CREATE TEMPORARY TABLE IF NOT EXISTS {staging} ({definitions})')
+        cursor.execute(f'TRUNCATE {staging}')
+        raw_cursor = cursor.cursor
+        if hasattr(raw_cursor, 'copy_expert'):
+            raw_cursor.copy_expert(copy_sql, buffer)
+        else:
+            with raw_cursor.copy(copy_sql) as copy:
+                copy.write(buffer.getvalue())
+        cursor.execute(merge_sql, [now, now])
+        inserted, updated = cursor.fetchone()
+    return int(inserted), int(updated)
+
+
+def _existing_count(model, rows):
+    """Count rows that already exist with one range query per call."""
+    stock_ids = rows['stock_id'].unique().tolist()
+    existing = model.objects.filter(
+        stock_id__in=stock_ids,
+        date__gte=rows['date'].min(),
+        date__lte=rows['date'].max(),
+    ).order_by().values_list('stock_id', 'date')
+    keys = set(existing)
+    if not keys:
+        return 0
+    incoming = zip(rows['stock_id'].tolist(), rows['date'].tolist())
+    return sum(1 for key in incoming if key in keys)
+
+
+def _row_tuples(rows, now):
+    ops = connection.ops
+    stamp = ops.adapt_datetimefield_value(now)
+    dates = [ops.adapt_datefield_value(value) for value in rows['date'].tolist()]
+    decimals = [
+        np.where(rows[column].isna().to_numpy(), None, rows[column].to_numpy(dtype=object)).tolist()
+        for column in DECIMAL_COLUMNS
+    ]
+    volume = rows['volume'].astype(object).where(rows['volume'].notna(), None).tolist()
+    return list(zip(rows['stock_id'].tolist(), dates, *decimals, volume, [stamp] * len(rows), [stamp] * len(rows)))
+
+
+def _executemany_upsert(model, rows):
+    columns = _column_names(model)
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    names = [columns['stock'], columns['date'], *(columns[name] for name in PRICE_COLUMNS),
+             columns['created_at'], columns['updated_at']]
+    updates = ', '.join(
+        f'{quote(columns[name])} = excluded.{quote(columns[name])}'
+        for name in (*PRICE_COLUMNS, 'updated_at')
+    )
+    sql = (
+        f'INSERT INTO {table} ({", ".join(quote(name) for name in names)}) '
+        f'VALUES ({", ".join(["%s"] * len(names))}) '
+        f'ON CONFLICT ({quote(columns["stock"])}, {quote(columns["date"])}) DO UPDATE SET {updates}'
+    )
+
+    with transaction.atomic():
+        existing = _existing_count(model, rows)
+        tuples = _row_tuples(rows, timezone.now())
+        with connection.cursor() as cursor:
+            for offset in range(0, len(tuples), EXECUTEMANY_CHUNK):
+                cursor.executemany(sql, tuples[offset:offset + EXECUTEMANY_CHUNK])
+    return len(rows) - existing, existing
+
+
+def _bulk_create_upsert(model, rows):
+    decimals = {
+        column: np.where(rows[column].isna().to_numpy(), None, rows[column].to_numpy(dtype=object)).tolist()
+        for column in DECIMAL_COLUMNS
+    }
+    volume = rows['volume'].astype(object).where(rows['volume'].notna(), None).tolist()
+    objects = [
+        model(
+            stock_id=stock_id,
+            date=price_date,
+            volume=volume[index],
+            **{column: decimals[column][index] for column in DECIMAL_COLUMNS},
+        )
+        for index, (stock_id, price_date) in enumerate(zip(rows['stock_id'].tolist(), rows['date'].tolist()))
+    ]
+    with transaction.atomic():
+        existing = _existing_count(model, rows)
+        model.objects.bulk_create(
+            objects,
+            batch_size=EXECUTEMANY_CHUNK,
+            update_conflicts=True,
+            unique_fields=['stock', 'date'],
+            update_fields=[*PRICE_COLUMNS, 'updated_at'],
+        )
+    return len(rows) - existing, existing
@@ -0,0 +1,103 @@
+"""Column-oriented renderers for price history responses.
+
+Views that support them put a ``PriceSeries`` under ``results`` when the
+accepted renderer has ``renders_series`` set; the renderer then writes the
+columns straight from the NumPy arrays instead of one dict per bar.
+
+* ``?format=columnar`` - JSON with parallel arrays under ``results``.
+* ``?format=arrow`` - an Apache Arrow IPC stream with one record batch
+  (``date`` as date32, prices as float64, ``volume`` as int64, missing values
+  as nulls); the remaining payload keys are stored as schema metadata. When
+  ``results`` is a list of entries carrying aligned ``series``, each entry
+  becomes a struct column named by its stock id.
+"""
+import json
+
+import numpy as np
+import pyarrow as pa
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from .price_store import PRICE_COLUMNS, PriceSeries
+
+
+def _series(results):
+    return results if isinstance(results, PriceSeries) else PriceSeries.empty()
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    format = 'columnar'
+    renders_series = True
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict) and 'results' in data:
+            data = {**data, 'results': _series(data['results']).to_columns()}
+        return super().render(data, accepted_media_type, renderer_context)
+
+
+class ArrowRenderer(BaseRenderer):
+    media_type = 'application/vnd.apache.arrow.stream'
+    format = 'arrow'
+    charset = None
+    render_style = 'binary'
+    renders_series = True
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not isinstance(data, dict) or 'results' not in data:
+            # Errors have no series to encode, so they stay readable JSON.
+            response = (renderer_context or {}).get('response')
+            if response is not None:
+                response['Content-Type'] = 'application/json'
+            return JSONRenderer().render(data, renderer_context=renderer_context)
+
+        metadata = {
+            key: json.dumps(value, default=str)
+            for key, value in data.items()
+            if key != 'results'
+        }
+        results = data['results']
+        if isinstance(results, list):
+            batch = self._aligned_batch(results, metadata)
+        else:
+            series = _series(results)
+            batch = pa.RecordBatch.from_arrays(
+                [_date_array(series), *_price_arrays(series)],
+                names=['date', *PRICE_COLUMNS],
+            )
+        batch = batch.replace_schema_metadata(metadata)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, batch.schema) as writer:
+            writer.write_batch(batch)
+        return sink.getvalue().to_pybytes()
+
+    @staticmethod
+    def _aligned_batch(entries, metadata):
+        """One ``date`` column plus a struct column per entry, named by its stock id.
+
+        Tickers repeat across exchanges, so they stay in the ``results`` metadata.
+        """
+        dates = entries[0]['series'] if entries else PriceSeries.empty()
+        arrays = [_date_array(dates)]
+        names = ['date']
+        for entry in entries:
+            arrays.append(pa.StructArray.from_arrays(_price_arrays(entry['series']), names=list(PRICE_COLUMNS)))
+            names.append(str(entry['id']))
+        metadata['results'] = json.dumps(
+            [{key: value for key, value in entry.items() if key != 'series'} for entry in entries],
+            default=str,
+        )
+        return pa.RecordBatch.from_arrays(arrays, names=names)
+
+
+def _date_array(series):
+    return pa.array(np.asarray(series.dates, dtype='datetime64[D]'), type=pa.date32())
+
+
+def _price_arrays(series):
+    missing = np.isnan(series.values)
+    arrays = [
+        pa.array(series.values[index], type=pa.float64(), mask=missing[index])
+        for index in range(len(PRICE_COLUMNS) - 1)
+    ]
+    volume = np.nan_to_num(series.values[-1]).astype(np.int64)
+    arrays.append(pa.array(volume, type=pa.int64(), mask=missing[-1]))
+    return arrays
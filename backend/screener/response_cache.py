@@ -0,0 +1,88 @@
+"""Generation-versioned caching for read-mostly API responses.
+
+Payloads live in the default cache and are keyed by endpoint, dataset,
+dataset generation and the query parameters the payload depends on. Writers
+bump the generation (see ``generation.bump_generation``), so stale entries are
+never read again and simply age out.
+
+The same generation backs HTTP validators: ``conditional_on_generation``
+answers ``If-None-Match`` with a 304 before the view runs any query.
+Responses also carry ``Last-Modified`` from the stock timestamps recorded at
+the last bump, but only the ETag decides a 304: HTTP dates have whole-second
+precision, so a change within the same second would still pass
+``If-Modified-Since``.
+"""
+import hashlib
+import json
+from functools import wraps
+
+from django.core.cache import cache
+from django.http import HttpRequest
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework.request import Request
+
+from .generation import get_generation, get_last_modified
+
+RESPONSE_CACHE_TIMEOUT = 60 * 60
+
+
+def response_cache_key(name, dataset_key, params=None):
+    values = sorted((key, value) for key, value in (params or {}).items() if value not in (None, ''))
+    digest = hashlib.sha1(json.dumps(values).encode()).hexdigest()
+    return f'screener:response:{name}:{dataset_key}:{get_generation(dataset_key)}:{digest}'
+
+
+def cached_payload(name, dataset_key, params, build):
+    """Return the cached payload for this dataset generation, building it on a miss."""
+    key = response_cache_key(name, dataset_key, params)
+    payload = cache.get(key)
+    if payload is None:
+        payload = build()
+        cache.set(key, payload, RESPONSE_CACHE_TIMEOUT)
+    return payload
+
+
+def generation_etag(name, dataset_key, request, resolved=None):
+    """Strong ETag for a response built from one dataset generation and these params.
+
+    ``resolved`` holds inputs the view derives beyond the query string, such
+    as a default window ending today.
+    """
+    renderer = getattr(request, 'accepted_renderer', None)
+    params = sorted((key, values) for key, values in request.GET.lists())
+    signature = [name, dataset_key, get_generation(dataset_key), getattr(renderer, 'format', None), params, resolved]
+    return f'"{hashlib.sha1(json.dumps(signature).encode()).hexdigest()}"'
+
+
+def conditional_on_generation(name, dataset_for_request, resolved_params=None):
+    """Decorate a view so unchanged responses are answered with 304 Not Modified.
+
+    ``dataset_for_request`` maps the request to its dataset key. Views whose
+    response depends on more than the query string and the generation pass
+    ``resolved_params``, which maps the request to JSON-serializable values
+    that join the ETag. Works for both function views and view set methods.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            request = next(arg for arg in args if isinstance(arg, (Request, HttpRequest)))
+            dataset_key = dataset_for_request(request)
+            resolved = resolved_params(request) if resolved_params else None
+            etag = generation_etag(name, dataset_key, request, resolved)
+
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                return not_modified
+
+            response = view(*args, **kwargs)
+            if response.status_code == 200:
+                response['ETag'] = etag
+                last_modified = get_last_modified(dataset_key)
+                if last_modified is not None:
+                    response['Last-Modified'] = http_date(last_modified)
+                # Always revalidate; the validators make that cheap.
+                patch_cache_control(response, no_cache=True)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,191 @@
+"""Date-aligned daily log returns for a universe of holdings.
+
+``build_returns_matrix`` turns the price history of N stocks into a dense
+(T x N) float64 matrix of daily log returns on adjusted closes (the close
+where no adjusted close was recorded) together with the annualized mean,
+volatility and covariance the fund simulator works from. Prices are read
+from the price store when enabled and otherwise with one grouped query.
+``returns_matrix`` caches the result per dataset generation, universe and
+window, so repeated simulations over the same holdings reuse it.
+
+How dates where some holdings have no price are treated is set by
+``missing``:
+
+``drop``
+    keep only dates on which every holding has a price (the default).
+``ffill``
+    carry the last price forward, so a gap contributes a zero return; returns
+    before a holding's first price stay NaN, so callers working with a subset
+    of the holdings can trim to that subset's own common start.
+``pairwise``
+    keep the union of dates with NaN returns where a holding has no price;
+    means use each holding's own returns and covariances the dates both
+    holdings share.
+"""
+import numpy as np
+
+from .models import AccessibleHistoricalPrice, HistoricalPrice
+from .price_store import PRICE_COLUMNS, grouped_history_rows, series_from_rows, stored_series
+from .response_cache import cached_payload
+
+DATASET_PRICE_MODELS = {
+    'classifier': HistoricalPrice,
+    'accessible': AccessibleHistoricalPrice,
+}
+
+TRADING_DAYS = 252
+MISSING_POLICIES = ('drop', 'ffill', 'pairwise')
+
+_CLOSE = PRICE_COLUMNS.index('close_price')
+_ADJUSTED = PRICE_COLUMNS.index('adjusted_close')
+
+
+class ReturnsMatrix:
+    """Daily log returns for a universe plus their annualized statistics.
+
+    ``returns`` has one row per date in ``dates`` (the later day of each
+    return) and one column per id in ``stock_ids``. Stocks with no prices in
+    the window are listed in ``missing`` and get no column.
+    """
+
+    __slots__ = ('dates', 'stock_ids', 'missing', 'returns', 'mean', 'volatility', 'covariance')
+
+    def __init__(self, dates, stock_ids, missing, returns, mean, volatility, covariance):
+        self.dates = dates
+        self.stock_ids = stock_ids
+        self.missing = missing
+        self.returns = returns
+        self.mean = mean
+        self.volatility = volatility
+        self.covariance = covariance
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def correlation(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.covariance / np.outer(self.volatility, self.volatility)
+
+
+def _load_prices(dataset_key, stock_ids, start, end):
+    """Return {stock_id: (dates, prices)} for stocks with at least one price."""
+    price_model = DATASET_PRICE_MODELS[dataset_key]
+    series = {}
+    pending = []
+    for stock_id in stock_ids:
+        stored = stored_series(dataset_key, stock_id)
+        if stored is None:
+            pending.append(stock_id)
+        else:
+            series[stock_id] = stored.window(start, end)
+    if pending:
+        for stock_id, rows in grouped_history_rows(price_model, pending, start, end).items():
+            series[stock_id] = series_from_rows(rows)
+
+    prices = {}
+    for stock_id in stock_ids:
+        item = series[stock_id]
+        values = np.where(np.isnan(item.values[_ADJUSTED]), item.values[_CLOSE], item.values[_ADJUSTED])
+        keep = values > 0  # also drops NaN; log returns need positive prices
+        if keep.any():
+            prices[stock_id] = (np.asarray(item.dates[keep], dtype='datetime64[D]'), values[keep])
+    return prices
+
+
+def _forward_fill(prices):
+    """Fill NaN with the last earlier value in the same column."""
+    present = ~np.isnan(prices)
+    rows = np.where(present, np.arange(len(prices))[:, None], 0)
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    filled = prices[rows, np.arange(prices.shape[1])]
+    # Leading gaps have no earlier value and stay NaN.
+    filled[~np.maximum.accumulate(present, axis=0)] = np.nan
+    return filled
+
+
+def _pairwise_covariance(returns):
+    """Sample covariance over the rows each pair of columns has in common."""
+    present = ~np.isnan(returns)
+    values = np.where(present, returns, 0.0)
+    weights = present.astype(np.float64)
+    counts = weights.T @ weights
+    sums = values.T @ weights  # sums[i, j]: column i over rows where j is also present
+    products = values.T @ values
+    with np.errstate(invalid='ignore', divide='ignore'):
+        covariance = (products - sums * sums.T / counts) / (counts - 1)
+    covariance[counts < 2] = np.nan
+    return covariance
+
+
+def build_returns_matrix(dataset_key, stock_ids, start=None, end=None, missing='drop'):
+    """Build the returns matrix for ``stock_ids`` from prices between ``start`` and ``end``."""
+    if missing not in MISSING_POLICIES:
+        raise ValueError(f'Unknown missing-data policy {missing!r}; expected one of {", ".join(MISSING_POLICIES)}.')
+    stock_ids = list(dict.fromkeys(stock_ids))
+    prices_by_stock = _load_prices(dataset_key, stock_ids, start, end)
+    present_ids = [stock_id for stock_id in stock_ids if stock_id in prices_by_stock]
+    absent_ids = [stock_id for stock_id in stock_ids if stock_id not in prices_by_stock]
+
+    if present_ids:
+        dates = np.unique(np.concatenate([prices_by_stock[stock_id][0] for stock_id in present_ids]))
+    else:
+        dates = np.empty(0, dtype='datetime64[D]')
+    prices = np.full((len(dates), len(present_ids)), np.nan)
+    for column, stock_id in enumerate(present_ids):
+        stock_dates, values = prices_by_stock[stock_id]
+        prices[np.searchsorted(dates, stock_dates), column] = values
+
+    if missing == 'drop':
+        keep = ~np.isnan(prices).any(axis=1)
+        dates, prices = dates[keep], prices[keep]
+    elif missing == 'ffill':
+        prices = _forward_fill(prices)
+
+    log_prices = np.log(prices)
+    if missing == 'pairwise':
+        # Each return spans from the holding's previous price, wherever that falls.
+        log_prices = _forward_fill(log_prices)
+        returns = np.diff(log_prices, axis=0)
+        returns[np.isnan(prices[1:])] = np.nan
+    else:
+        returns = np.diff(log_prices, axis=0)
+    dates = dates[1:]
+
+    observations = np.count_nonzero(~np.isnan(returns), axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.nansum(returns, axis=0) / observations
+    if missing != 'drop':
+        covariance = _pairwise_covariance(returns)
+    elif len(returns) > 1:
+        covariance = np.atleast_2d(np.cov(returns, rowvar=False))
+    else:
+        covariance = np.full((len(present_ids), len(present_ids)), np.nan)
+
+    covariance = covariance * TRADING_DAYS
+    return ReturnsMatrix(
+        dates=dates,
+        stock_ids=present_ids,
+        missing=absent_ids,
+        returns=np.ascontiguousarray(returns),
+        mean=mean * TRADING_DAYS,
+        volatility=np.sqrt(np.diag(covariance)),
+        covariance=covariance,
+    )
+
+
+def returns_matrix(dataset_key, stock_ids, start=None, end=None, missing='drop'):
+    """Cached ``build_returns_matrix``; entries retire with the dataset generation."""
+    stock_ids = list(dict.fromkeys(stock_ids))
+    params = {
+        'stocks': ','.join(str(stock_id) for stock_id in stock_ids),
+        'start': start.isoformat() if start else None,
+        'end': end.isoformat() if end else None,
+        'missing': missing,
+    }
+    return cached_payload(
+        'returns_matrix',
+        dataset_key,
+        params,
+        lambda: build_returns_matrix(dataset_key, stock_ids, start, end, missing),
+    )
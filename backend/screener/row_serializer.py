@@ -0,0 +1,133 @@
+"""Serialize ``.values()`` rows with the output of a DRF model serializer.
+
+``ValuesRowSerializer`` inspects a serializer class once and compiles a
+converter table: which ``.values()`` column feeds each output key and how the
+value is converted. Serializing a page is then a dict build per row instead
+of DRF's per-field ``get_attribute``/``to_representation`` machinery, with
+byte-identical JSON output.
+"""
+import copy
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.settings import api_settings
+
+from .serializers import DecimalAsFloatField, decimal_to_float
+
+# Fields whose to_representation is the identity for the values the database
+# driver already returns (str, int, bool and related primary keys).
+PASSTHROUGH_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.IntegerField,
+    PrimaryKeyRelatedField,
+)
+
+
+class ValuesRowSerializer:
+    def __init__(self, serializer_class, fields=None):
+        serializer = serializer_class()
+        table = []
+        for name, field in serializer.fields.items():
+            if field.write_only or (fields is not None and name not in fields):
+                continue
+            path = '__'.join(field.source_attrs)
+            # For ``sector.name`` DRF omits the key when the relation is empty.
+            guard = '__'.join(field.source_attrs[:-1]) or None
+            convert, binds_timezone = self._converter(field)
+            table.append((name, path, guard, convert, binds_timezone))
+        self._use_table(table)
+
+    def _use_table(self, table):
+        columns = []
+        for _, path, guard, _, _ in table:
+            columns.append(path)
+            if guard:
+                columns.append(guard)
+        self.table = table
+        self.columns = list(dict.fromkeys(columns))
+        self.field_names = [name for name, *_ in table]
+        self.relations = list(dict.fromkeys(guard for _, _, guard, _, _ in table if guard))
+
+    def subset(self, fields):
+        """Return a row serializer for ``fields`` only, reusing this one's converters."""
+        subset = copy.copy(self)
+        subset._use_table([entry for entry in self.table if entry[0] in fields])
+        return subset
+
+    @staticmethod
+    def _converter(field):
+        """Return ``(converter, binds_timezone)`` for a serializer field."""
+        if isinstance(field, DecimalAsFloatField):
+            return decimal_to_float, False
+        if isinstance(field, PASSTHROUGH_FIELDS):
+            return None, False
+        if isinstance(field, serializers.DateTimeField):
+            output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+            if output_format and output_format.lower() == ISO_8601 and not hasattr(field, 'timezone'):
+                return _iso_datetime_converter(field), True
+        return field.to_representation, False
+
+    def values(self, queryset):
+        """Return a ``.values()`` queryset projecting exactly the needed columns."""
+        return queryset.values(*self.columns)
+
+    def only(self, queryset, *extra):
+        """Restrict a model queryset to the needed columns and joins (plus ``extra`` fields)."""
+        return queryset.select_related(None).select_related(*self.relations).only(*self.columns, *extra)
+
+    def serialize(self, rows):
+        # The active timezone is resolved once per call rather than per value.
+        current_timezone = timezone.get_current_timezone() if settings.USE_TZ else None
+        table = [
+            (name, path, guard, convert(current_timezone) if binds_timezone else convert)
+            for name, path, guard, convert, binds_timezone in self.table
+        ]
+        results = []
+        for row in rows:
+            data = {}
+            for name, path, guard, convert in table:
+                if guard is not None and row[guard] is None:
+                    continue
+                value = row[path]
+                data[name] = value if value is None or convert is None else convert(value)
+            results.append(data)
+        return results
+
+    def to_representation(self, row):
+        return self.serialize([row])[0]
+
+
+def _iso_datetime_converter(field):
+    """DateTimeField.to_representation for ISO 8601 output with a pre-resolved timezone."""
+    def bind(current_timezone):
+        def convert(value):
+            if isinstance(value, str):
+                return value
+            if current_timezone is not None and timezone.is_aware(value):
+                value = value.astimezone(current_timezone)
+            else:
+                value = field.enforce_timezone(value)
+            text = value.isoformat()
+            return text[:-6] + 'Z' if text.endswith('+00:00') else text
+        return convert
+    return bind
+
+
+@lru_cache(maxsize=None)
+def _full_row_serializer(serializer_class):
+    return ValuesRowSerializer(serializer_class)
+
+
+def get_row_serializer(serializer_class, fields=None):
+    """Return the compiled row serializer for a serializer class (and field subset).
+
+    Only the full serializer is cached per class: ``fields`` comes from the
+    client, and caching every subset would let requests grow the cache
+    without bound. Subsets are cheap slices of the cached converter table.
+    """
+    full = _full_row_serializer(serializer_class)
+    return full if fields is None else full.subset(fields)
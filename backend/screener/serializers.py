@@ -15,6 +15,22 @@ from .models import (
 )
 
 
+def decimal_to_float(value):
+    """Convert Decimal to float, handle None values"""
+    if value is None:
+        return None
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+class DecimalAsFloatField(serializers.ReadOnlyField):
+    """Read-only decimal rendered as a JSON number rather than a string."""
+
+    def to_representation(self, value):
+        return decimal_to_float(value)
+
+
 class ExchangeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Exchange
@@ -42,55 +58,20 @@ class StockSerializer(serializers.ModelSerializer):
     industry_name = serializers.CharField(source='industry.name', read_only=True)
 
     # Override decimal fields to return floats for frontend compatibility
-    market_cap = serializers.SerializerMethodField()
-    price = serializers.SerializerMethodField()
-    pe_ratio = serializers.SerializerMethodField()
-    peg_ratio = serializers.SerializerMethodField()
-    price_change_percent = serializers.SerializerMethodField()
-    fair_value = serializers.SerializerMethodField()
-    fair_value_upside = serializers.SerializerMethodField()
-    analyst_target = serializers.SerializerMethodField()
-    analyst_upside = serializers.SerializerMethodField()
+    market_cap = DecimalAsFloatField()
+    price = DecimalAsFloatField()
+    pe_ratio = DecimalAsFloatField()
+    peg_ratio = DecimalAsFloatField()
+    price_change_percent = DecimalAsFloatField()
+    fair_value = DecimalAsFloatField()
+    fair_value_upside = DecimalAsFloatField()
+    analyst_target = DecimalAsFloatField()
+    analyst_upside = DecimalAsFloatField()
 
     class Meta:
         model = Stock
         fields = '__all__'
 
-    def _decimal_to_float(self, value):
-        """Convert Decimal to float, handle None values"""
-        if value is None:
-            return None
-        if isinstance(value, Decimal):
-            return float(value)
-        return value
-
-    def get_market_cap(self, obj):
-        return self._decimal_to_float(obj.market_cap)
-
-    def get_price(self, obj):
-        return self._decimal_to_float(obj.price)
-
-    def get_pe_ratio(self, obj):
-        return self._decimal_to_float(obj.pe_ratio)
-
-    def get_peg_ratio(self, obj):
-        return self._decimal_to_float(obj.peg_ratio)
-
-    def get_price_change_percent(self, obj):
-        return self._decimal_to_float(obj.price_change_percent)
-
-    def get_fair_value(self, obj):
-        return self._decimal_to_float(obj.fair_value)
-
-    def get_fair_value_upside(self, obj):
-        return self._decimal_to_float(obj.fair_value_upside)
-
-    def get_analyst_target(self, obj):
-        return self._decimal_to_float(obj.analyst_target)
-
-    def get_analyst_upside(self, obj):
-        return self._decimal_to_float(obj.analyst_upside)
-
     def validate(self, data):
         """Validate that industry belongs to the same sector as the stock's sector"""
         sector = data.get('sector')
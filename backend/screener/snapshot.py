@@ -0,0 +1,320 @@
+"""In-memory columnar snapshots of the stock datasets.
+
+When ``SCREENER_SNAPSHOT_ENABLED`` is set, every worker keeps one snapshot per
+dataset: NumPy columns for the numeric filters, categorical codes for the
+exchange/sector/industry/country lookups and the pre-serialized API rows.
+Stock lists and filtered stats are then answered with vectorized masks and no
+database round trips. A snapshot is rebuilt lazily whenever the dataset
+generation (see ``screener.generation``) moves on.
+"""
+import threading
+from collections import Counter
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from rest_framework.exceptions import ValidationError
+
+from .generation import get_generation
+from .stats import FilteredStatsAccumulator
+
+ORDERING_FIELDS = ('ticker', 'company_name', 'price', 'market_cap', 'pe_ratio')
+# Text columns are ranked in the database's order so its collation decides, as on the ORM path.
+TEXT_ORDERING_FIELDS = ('ticker', 'company_name')
+DEFAULT_ORDERING = ('ticker',)
+NUMERIC_FILTERS = (
+    ('price_min', 'price', np.greater_equal),
+    ('price_max', 'price', np.less_equal),
+    ('market_cap_min', 'market_cap', np.greater_equal),
+    ('market_cap_max', 'market_cap', np.less_equal),
+)
+
+_snapshots = {}
+_lock = threading.Lock()
+
+
+def _float_column(values):
+    return np.array([np.nan if value is None else float(value) for value in values], dtype=np.float64)
+
+
+def _categorize(values):
+    """Encode values as (categories, codes); missing values get code -1."""
+    categories = sorted({value for value in values if value is not None})
+    positions = {value: index for index, value in enumerate(categories)}
+    codes = np.array([positions.get(value, -1) for value in values], dtype=np.int32)
+    return categories, codes
+
+
+def _collation_ranks(stock_ids, ordered_rows):
+    """Rank stocks by ``(id, value)`` rows in database order; equal values share a rank."""
+    rank_of = {}
+    rank = -1
+    previous = object()
+    for stock_id, value in ordered_rows:
+        if value != previous:
+            rank += 1
+            previous = value
+        rank_of[stock_id] = rank
+    return np.array([rank_of[stock_id] for stock_id in stock_ids], dtype=np.int64)
+
+
+def _exact_sum(cents):
+    total = int(np.sum(cents, dtype=np.int64)) if len(cents) else 0
+    return Decimal(total).scaleb(-2)
+
+
+class SnapshotRows:
+    """Lazy sequence of serialized rows for a set of snapshot positions."""
+
+    def __init__(self, rows, positions):
+        self._rows = rows
+        self._positions = positions
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self._rows[position] for position in self._positions[item].tolist()]
+        return self._rows[int(self._positions[item])]
+
+
+class StockSnapshot:
+    def __init__(self, dataset_key, generation, stocks, serialized_rows, industries, text_orders):
+        self.dataset_key = dataset_key
+        self.generation = generation
+        self.rows = serialized_rows
+        self.size = len(stocks)
+
+        self.ticker_lower = np.array([stock.ticker.lower() for stock in stocks], dtype=str)
+        self.company_name_lower = np.array([stock.company_name.lower() for stock in stocks], dtype=str)
+
+        self.columns = {
+            'price': _float_column([stock.price for stock in stocks]),
+            'market_cap': _float_column([stock.market_cap for stock in stocks]),
+            'pe_ratio': _float_column([stock.pe_ratio for stock in stocks]),
+        }
+        self.has_market_cap = ~np.isnan(self.columns['market_cap'])
+        # Market cap has two decimal places; integer cents keep sums exact.
+        self.market_cap_cents = np.array(
+            [int(stock.market_cap.scaleb(2)) if stock.market_cap is not None else 0 for stock in stocks],
+            dtype=np.int64,
+        )
+
+        self.exchange_codes, self.exchange_code_idx = _categorize([stock.exchange.code for stock in stocks])
+        self.exchange_names, self.exchange_name_idx = _categorize([stock.exchange.name for stock in stocks])
+        self.industry_names, self.industry_idx = _categorize(
+            [stock.industry.name if stock.industry else None for stock in stocks]
+        )
+        self.sector_names, self.sector_idx = _categorize(
+            [stock.industry.sector.name if stock.industry else None for stock in stocks]
+        )
+        self.countries, self.country_idx = _categorize([stock.country for stock in stocks])
+        self.known_country = np.array(
+            [bool(country) and country.lower() != 'unknown' for country in self.countries] + [False],
+            dtype=bool,
+        )
+
+        industry_sectors = {}
+        for stock in stocks:
+            if stock.industry:
+                industry_sectors[stock.industry.name] = stock.industry.sector.name
+        self.industry_sectors = [industry_sectors[name] for name in self.industry_names]
+
+        # Lower-cased industry lookup mirroring Industry.objects.filter(name__iexact=...).first()
+        self.industry_lookup = {}
+        for industry in industries:
+            self.industry_lookup.setdefault(industry.name.lower(), (industry.name, industry.sector.name))
+
+        stock_ids = [stock.pk for stock in stocks]
+        self.sort_keys = {field: _collation_ranks(stock_ids, text_orders[field]) for field in TEXT_ORDERING_FIELDS}
+        null_key = np.inf if connection.features.nulls_order_largest else -np.inf
+        for field in ('price', 'market_cap', 'pe_ratio'):
+            column = self.columns[field]
+            self.sort_keys[field] = np.where(np.isnan(column), null_key, column)
+
+        self.companies = [self._company_row(stock) for stock in stocks]
+
+    @classmethod
+    def build(cls, dataset_key, models_bundle, serializer_class):
+        generation = get_generation(dataset_key)
+        stocks = list(
+            models_bundle['stock'].objects
+            .select_related('exchange', 'sector', 'industry__sector')
+            .order_by('id')
+        )
+        serialized_rows = serializer_class(stocks, many=True).data
+        industries = models_bundle['industry'].objects.select_related('sector').order_by('id')
+        text_orders = {
+            field: list(models_bundle['stock'].objects.order_by(field, 'id').values_list('id', field))
+            for field in TEXT_ORDERING_FIELDS
+        }
+        return cls(dataset_key, generation, stocks, [dict(row) for row in serialized_rows], industries, text_orders)
+
+    @staticmethod
+    def _company_row(stock):
+        sector_name = None
+        if stock.industry and getattr(stock.industry, 'sector', None):
+            sector_name = stock.industry.sector.name
+        elif stock.sector:
+            sector_name = stock.sector.name
+        return {
+            'ticker': stock.ticker,
+            'company_name': stock.company_name,
+            'price': float(stock.price) if stock.price else None,
+            'market_cap': float(stock.market_cap) if stock.market_cap else None,
+            'pe_ratio': float(stock.pe_ratio) if stock.pe_ratio else None,
+            'health_label': stock.health_label,
+            'exchange_name': stock.exchange.name if stock.exchange else None,
+            'exchange_code': stock.exchange.code if stock.exchange else None,
+            'sector_name': sector_name,
+            'industry_name': stock.industry.name if stock.industry else None,
+            'country': stock.country,
+        }
+
+    def _category_mask(self, categories, codes, predicate):
+        matches = np.array([predicate(category) for category in categories] + [False], dtype=bool)
+        return matches[codes]
+
+    def filter_mask(self, params, exact_classification=False):
+        """Return a boolean mask for the screener filters in ``params``.
+
+        List views match sector and industry with ``icontains`` (``StockFilter``);
+        filtered stats use ``iexact`` (``apply_stock_filters``).
+        """
+        mask = np.ones(self.size, dtype=bool)
+
+        exchange = params.get('exchange')
+        if exchange:
+            value = exchange.lower()
+            mask &= self._category_mask(self.exchange_codes, self.exchange_code_idx, lambda c: c.lower() == value)
+
+        for param, categories, codes in (
+            ('sector', self.sector_names, self.sector_idx),
+            ('industry', self.industry_names, self.industry_idx),
+        ):
+            raw = params.get(param)
+            if not raw:
+                continue
+            value = raw.lower()
+            if exact_classification:
+                mask &= self._category_mask(categories, codes, lambda c: c.lower() == value)
+            else:
+                mask &= self._category_mask(categories, codes, lambda c: value in c.lower())
+
+        country = params.get('country')
+        if country:
+            value = country.lower()
+            mask &= self._category_mask(self.countries, self.country_idx, lambda c: c.lower() == value)
+
+        search = params.get('search')
+        if search:
+            term = search.lower()
+            mask &= (np.strings.find(self.ticker_lower, term) >= 0) | (np.strings.find(self.company_name_lower, term) >= 0)
+
+        for param, column, compare in NUMERIC_FILTERS:
+            raw = params.get(param)
+            if not raw:
+                continue
+            try:
+                bound = float(Decimal(raw))
+            except (ArithmeticError, ValueError):
+                raise ValidationError({param: ['Enter a number.']})
+            mask &= compare(self.columns[column], bound)
+
+        return mask
+
+    def order(self, mask, ordering_param=None):
+        """Return positions selected by ``mask`` sorted like OrderingFilter would."""
+        terms = []
+        if ordering_param:
+            terms = [term.strip() for term in ordering_param.split(',')]
+            terms = [term for term in terms if term.lstrip('-') in ORDERING_FIELDS]
+        if not terms:
+            terms = list(DEFAULT_ORDERING)
+
+        positions = np.flatnonzero(mask)
+        # np.lexsort treats the last key as primary; snapshot order (by id) breaks ties.
+        keys = [positions]
+        for term in reversed(terms):
+            key = self.sort_keys[term.lstrip('-')][positions]
+            keys.append(-key if term.startswith('-') else key)
+        return positions[np.lexsort(keys)]
+
+    def select_rows(self, params):
+        positions = self.order(self.filter_mask(params), params.get('ordering'))
+        return SnapshotRows(self.rows, positions)
+
+    def resolve_industry(self, name):
+        """Return (industry name, sector name) for a case-insensitive industry name."""
+        return self.industry_lookup.get(name.lower())
+
+    def stats(self, mask):
+        """Build the filtered-stats aggregates for ``mask`` from the columns."""
+        accumulator = FilteredStatsAccumulator()
+        accumulator.total_companies = int(mask.sum())
+        accumulator.total_market_cap = _exact_sum(self.market_cap_cents[mask & self.has_market_cap])
+
+        classified = mask & (self.industry_idx >= 0)
+        sector_counts = np.bincount(self.sector_idx[classified], minlength=len(self.sector_names))
+        accumulator.sectors = Counter(
+            {self.sector_names[i]: int(count) for i, count in enumerate(sector_counts) if count}
+        )
+
+        industry_idx = self.industry_idx[classified]
+        industry_counts = np.bincount(industry_idx, minlength=len(self.industry_names))
+        with_cap = self.has_market_cap[classified]
+        cap_counts = np.bincount(industry_idx[with_cap], minlength=len(self.industry_names))
+        cap_sums = np.zeros(len(self.industry_names), dtype=np.int64)
+        np.add.at(cap_sums, industry_idx[with_cap], self.market_cap_cents[classified][with_cap])
+        for i, count in enumerate(industry_counts):
+            if not count:
+                continue
+            key = (self.industry_names[i], self.industry_sectors[i])
+            accumulator.industries[key] = int(count)
+            accumulator.industry_market_caps[key] = (
+                Decimal(int(cap_sums[i])).scaleb(-2) if cap_counts[i] else None
+            )
+
+        exchange_counts = np.bincount(self.exchange_name_idx[mask], minlength=len(self.exchange_names))
+        accumulator.exchanges = Counter(
+            {self.exchange_names[i]: int(count) for i, count in enumerate(exchange_counts) if count}
+        )
+
+        country_idx = self.country_idx[mask]
+        country_idx = country_idx[self.known_country[country_idx]]
+        country_counts = np.bincount(country_idx, minlength=len(self.countries))
+        accumulator.countries = Counter(
+            {self.countries[i]: int(count) for i, count in enumerate(country_counts) if count}
+        )
+        return accumulator.as_payload()
+
+    def company_rows(self, mask, limit=None):
+        positions = self.order(mask)
+        if limit is not None:
+            positions = positions[:limit]
+        return [self.companies[position] for position in positions.tolist()]
+
+
+def get_snapshot(dataset_key, models_bundle, serializer_class):
+    """Return an up-to-date snapshot for the dataset, or None when disabled."""
+    if not getattr(settings, 'SCREENER_SNAPSHOT_ENABLED', False):
+        return None
+
+    generation = get_generation(dataset_key)
+    snapshot = _snapshots.get(dataset_key)
+    if snapshot is not None and snapshot.generation == generation:
+        return snapshot
+
+    with _lock:
+        snapshot = _snapshots.get(dataset_key)
+        if snapshot is None or snapshot.generation != generation:
+            snapshot = StockSnapshot.build(dataset_key, models_bundle, serializer_class)
+            _snapshots[dataset_key] = snapshot
+    return snapshot
+
+
+def clear_snapshots():
+    with _lock:
+        _snapshots.clear()
@@ -0,0 +1,105 @@
+from collections import Counter
+from decimal import Decimal
+
+
+# Columns pulled from the filtered stock queryset; a single values_list() over
+# these feeds every total and breakdown of the filtered-stats payload.
+STATS_COLUMNS = (
+    'industry__sector__name',
+    'industry__name',
+    'exchange__name',
+    'country',
+    'market_cap',
+)
+
+SECTOR_BREAKDOWN_LIMIT = 10
+
+
+def _is_known_country(country):
+    return bool(country) and country.lower() != 'unknown'
+
+
+def _ranked(counter):
+    """Order (key, count) pairs by descending count, breaking ties by key."""
+    return sorted(counter.items(), key=lambda item: (-item[1], str(item[0])))
+
+
+class FilteredStatsAccumulator:
+    """Collect filtered-stats totals and breakdowns in one pass over stock rows."""
+
+    def __init__(self):
+        self.total_companies = 0
+        self.total_market_cap = Decimal('0')
+        self.sectors = Counter()
+        self.industries = Counter()
+        self.industry_market_caps = {}
+        self.exchanges = Counter()
+        self.countries = Counter()
+
+    def add(self, sector_name, industry_name, exchange_name, country, market_cap):
+        self.total_companies += 1
+
+        if market_cap is not None:
+            self.total_market_cap += market_cap
+
+        # Industries always carry a sector, so a missing sector name means the
+        # stock has no industry and is left out of both classifications.
+        if industry_name is not None and sector_name is not None:
+            self.sectors[sector_name] += 1
+            key = (industry_name, sector_name)
+            self.industries[key] += 1
+            # Mirror SQL SUM(): None until the group sees a non-null value.
+            current = self.industry_market_caps.get(key)
+            if market_cap is not None:
+                self.industry_market_caps[key] = market_cap if current is None else current + market_cap
+            else:
+                self.industry_market_caps[key] = current
+
+        if exchange_name is not None:
+            self.exchanges[exchange_name] += 1
+
+        if _is_known_country(country):
+            self.countries[country] += 1
+
+    def add_rows(self, rows):
+        for row in rows:
+            self.add(*row)
+        return self
+
+    def as_payload(self):
+        """Return the aggregate part of the filtered-stats response."""
+        industry_names = {industry for industry, _ in self.industries}
+        return {
+            'total_companies': self.total_companies,
+            'unique_sectors': len(self.sectors),
+            'unique_industries': len(industry_names),
+            'unique_exchanges': len(self.exchanges),
+            'total_market_cap': float(self.total_market_cap),
+            'sector_breakdown': [
+                {'sector__name': name, 'count': count}
+                for name, count in _ranked(self.sectors)[:SECTOR_BREAKDOWN_LIMIT]
+            ],
+            'industry_breakdown': [
+                {
+                    'industry__name': industry,
+                    'sector__name': sector,
+                    'count': count,
+                    'total_market_cap': self.industry_market_caps.get((industry, sector)),
+                }
+                for (industry, sector), count in _ranked(self.industries)
+            ],
+            'exchange_breakdown': [
+                {'exchange__name': name, 'count': count}
+                for name, count in _ranked(self.exchanges)
+            ],
+            'country_breakdown': [
+                {'country': name, 'count': count}
+                for name, count in _ranked(self.countries)
+            ],
+        }
+
+
+def compute_filtered_stats(queryset):
+    """Aggregate a filtered stock queryset with a single database query."""
+    rows = queryset.order_by().values_list(*STATS_COLUMNS)
+    return FilteredStatsAccumulator().add_rows(rows.iterator(chunk_size=2000)).as_payload()
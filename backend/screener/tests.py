@@ -1,12 +1,56 @@
+import io
+import json
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
 from decimal import Decimal
 from unittest import mock
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+from django.core.cache import caches
 from django.core.management import call_command
-from django.test import TestCase
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.renderers import JSONRenderer
 
-from screener.models import Exchange, HistoricalPrice, Sector, Stock
+from screener.backtest import backtest_strategies, run_backtest
+from screener.clustering import cluster_stocks
+from screener.downsampling import lttb_indices
+from screener.factors import compute_factor_scores, refresh_factor_scores, sector_percentiles, sector_zscores
+from screener.funds import parse_fund_request
+from screener.generation import bump_generation
+from screener.management.commands import historical_prices
+from screener.history_summary import rebuild_summaries
+from screener.indicators import STOCK_FIELDS, RollingState, refresh_indicators
+from screener.models import (
+    AccessibleStock,
+    Exchange,
+    FactorScore,
+    HistoricalPrice,
+    HistorySummary,
+    Industry,
+    Sector,
+    Stock,
+    StockIndicators,
+)
+from screener.monte_carlo import simulate_portfolio, simulate_strategies
+from screener.optimizer import ledoit_wolf, optimize_weights, project
+from screener.price_pipeline import RateLimiter
+from screener.price_sources import normalize_price_frame, split_multi_symbol_frame
+from screener.price_store import PRICE_COLUMNS, PriceStore
+from screener.price_writer import upsert_price_frames
+from screener.returns import ReturnsMatrix, build_returns_matrix, returns_matrix
+from screener.row_serializer import ValuesRowSerializer, get_row_serializer
+from screener.serializers import AccessibleStockSerializer, StockSerializer
+from screener.snapshot import clear_snapshots
+from screener.workbooks import load_ticker_sheet, read_ticker_sheet
 
 
 class HistoricalPricesCommandTests(TestCase):
@@ -96,3 +140,1775 @@ class HistoricalPricesCommandTests(TestCase):
         self.assertIsNotNone(stock.prices_last_synced_at)
         self.assertGreaterEqual(stock.prices_last_synced_at, before_sync)
         self.assertEqual(HistoricalPrice.objects.filter(stock=stock).count(), 1)
+
+
+class FilteredStatsTests(TestCase):
+    def setUp(self):
+        nyse = Exchange.objects.create(code="NYSE", name="New York Stock Exchange", country="USA")
+        lse = Exchange.objects.create(code="LSE", name="London Stock Exchange", country="United Kingdom")
+        tech = Sector.objects.create(name="Technology")
+        energy = Sector.objects.create(name="Energy")
+        software = Industry.objects.create(name="Software", sector=tech)
+        oil = Industry.objects.create(name="Oil & Gas", sector=energy)
+
+        rows = [
+            ("AAA", nyse, tech, software, "USA", Decimal("100.00")),
+            ("BBB", nyse, tech, software, "USA", None),
+            ("CCC", lse, energy, oil, "United Kingdom", Decimal("50.50")),
+            ("DDD", lse, None, None, "Unknown", Decimal("10.00")),
+        ]
+        for ticker, exchange, sector, industry, country, market_cap in rows:
+            Stock.objects.create(
+                ticker=ticker,
+                company_name=f"{ticker} Corp",
+                exchange=exchange,
+                sector=sector,
+                industry=industry,
+                country=country,
+                market_cap=market_cap,
+            )
+
+    def test_aggregates_all_breakdowns_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/filtered-stats/")
+
+        data = response.json()
+        self.assertEqual(data["total_companies"], 4)
+        self.assertEqual(data["unique_sectors"], 2)
+        self.assertEqual(data["unique_industries"], 2)
+        self.assertEqual(data["unique_exchanges"], 2)
+        self.assertEqual(data["total_market_cap"], 160.5)
+        self.assertEqual(
+            data["sector_breakdown"],
+            [{"sector__name": "Technology", "count": 2}, {"sector__name": "Energy", "count": 1}],
+        )
+        self.assertEqual(
+            data["industry_breakdown"],
+            [
+                {"industry__name": "Software", "sector__name": "Technology", "count": 2, "total_market_cap": 100.0},
+                {"industry__name": "Oil & Gas", "sector__name": "Energy", "count": 1, "total_market_cap": 50.5},
+            ],
+        )
+        self.assertEqual(
+            data["exchange_breakdown"],
+            [
+                {"exchange__name": "London Stock Exchange", "count": 2},
+                {"exchange__name": "New York Stock Exchange", "count": 2},
+            ],
+        )
+        self.assertEqual(
+            data["country_breakdown"],
+            [{"country": "USA", "count": 2}, {"country": "United Kingdom", "count": 1}],
+        )
+
+    def test_filters_by_resolved_industry(self):
+        response = self.client.get("/api/filtered-stats/", {"industry": "software", "sector": "Energy"})
+
+        data = response.json()
+        self.assertEqual(data["total_companies"], 2)
+        self.assertEqual(data["applied_filters"]["sector"], "Technology")
+        self.assertEqual(data["applied_filters"]["industry"], "Software")
+        self.assertEqual(data["total_market_cap"], 100.0)
+
+
+TEST_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "tests-default"},
+    "screener_state": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "tests-state"},
+}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class StockSnapshotTests(TestCase):
+    def setUp(self):
+        clear_snapshots()
+        caches["screener_state"].clear()
+        nyse = Exchange.objects.create(code="NYSE", name="New York Stock Exchange", country="USA")
+        lse = Exchange.objects.create(code="LSE", name="London Stock Exchange", country="United Kingdom")
+        tech = Sector.objects.create(name="Technology")
+        software = Industry.objects.create(name="Software", sector=tech)
+        hardware = Industry.objects.create(name="Hardware", sector=tech)
+
+        rows = [
+            ("MSFT", "Microsoft", nyse, software, "USA", "410.50", "3000000000.00", "35.10"),
+            ("AAPL", "Apple", nyse, hardware, "USA", "190.25", "2900000000.00", None),
+            ("SAGE", "Sage Group", lse, software, "United Kingdom", "12.40", None, "28.00"),
+            ("ZZZ", "Unclassified Plc", lse, None, "Unknown", None, "1000.00", "5.00"),
+        ]
+        for ticker, name, exchange, industry, country, price, market_cap, pe in rows:
+            Stock.objects.create(
+                ticker=ticker,
+                company_name=name,
+                exchange=exchange,
+                sector=tech if industry else None,
+                industry=industry,
+                country=country,
+                price=Decimal(price) if price else None,
+                market_cap=Decimal(market_cap) if market_cap else None,
+                pe_ratio=Decimal(pe) if pe else None,
+            )
+
+    def _get_both(self, path, params):
+        with self.settings(SCREENER_SNAPSHOT_ENABLED=False):
+            expected = self.client.get(path, params).json()
+        with self.settings(SCREENER_SNAPSHOT_ENABLED=True):
+            actual = self.client.get(path, params).json()
+        return expected, actual
+
+    def test_stock_list_matches_orm_results(self):
+        for params in [
+            {},
+            {"ordering": "-price"},
+            {"ordering": "pe_ratio", "sector": "tech"},
+            {"search": "ap", "exchange": "nyse"},
+            {"industry": "soft", "market_cap_min": "1000", "page_size": "1"},
+            {"price_min": "100", "price_max": "400", "ordering": "company_name"},
+        ]:
+            with self.subTest(params=params):
+                expected, actual = self._get_both("/api/stocks/", params)
+                self.assertEqual(actual, expected)
+
+    def test_text_ordering_follows_database_collation(self):
+        exchange = Exchange.objects.get(code="NYSE")
+        for ticker, name in (("ELF", "élan Motors"), ("EAG", "Eagle Corp"), ("LOW", "apple Farms"), ("ZED", "Zed Ltd")):
+            Stock.objects.create(ticker=ticker, company_name=name, exchange=exchange, country="USA")
+        Stock.objects.create(ticker="APL2", company_name="Apple", exchange=exchange, country="USA")
+
+        for ordering in ("company_name", "-company_name", "company_name,-ticker", "-ticker"):
+            with self.subTest(ordering=ordering):
+                expected, actual = self._get_both("/api/stocks/", {"ordering": ordering, "page_size": "20"})
+                self.assertEqual(
+                    [row["ticker"] for row in actual["results"]],
+                    [row["ticker"] for row in expected["results"]],
+                )
+                self.assertEqual(actual, expected)
+
+    def test_filtered_stats_match_orm_results(self):
+        for params in [
+            {},
+            {"sector": "Technology", "include_companies": "true"},
+            {"industry": "software", "country": "usa"},
+            {"include_companies": "true", "page_size": "2"},
+        ]:
+            with self.subTest(params=params):
+                expected, actual = self._get_both("/api/filtered-stats/", params)
+                self.assertEqual(actual, expected)
+
+    def test_sparse_fields_match_orm_results(self):
+        for params in [
+            {"fields": "ticker,price"},
+            {"fields": "sector_name, ticker,bogus", "ordering": "-price"},
+            {"fields": "bogus"},
+        ]:
+            with self.subTest(params=params):
+                expected, actual = self._get_both("/api/stocks/", params)
+                self.assertEqual(actual, expected)
+
+        _, actual = self._get_both("/api/stocks/", {"fields": "sector_name,ticker", "ordering": "ticker"})
+        self.assertEqual(
+            actual["results"],
+            [{"ticker": "AAPL", "sector_name": "Technology"}, {"ticker": "MSFT", "sector_name": "Technology"},
+             {"ticker": "SAGE", "sector_name": "Technology"}, {"ticker": "ZZZ"}],
+        )
+
+    def test_sparse_fields_skip_unneeded_joins(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get("/api/stocks/", {"fields": "ticker,price"})
+        select = queries.captured_queries[-1]["sql"]
+        self.assertNotIn("JOIN", select)
+        self.assertNotIn("company_name", select)
+
+    @override_settings(SCREENER_SNAPSHOT_ENABLED=True)
+    def test_serves_from_memory_until_generation_bumps(self):
+        self.client.get("/api/stocks/")
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/stocks/", {"ordering": "-market_cap"})
+        self.assertEqual(response.json()["results"][0]["ticker"], "MSFT")
+
+        Stock.objects.filter(ticker="AAPL").update(market_cap=Decimal("5000000000.00"))
+        bump_generation("classifier")
+
+        response = self.client.get("/api/stocks/", {"ordering": "-market_cap"})
+        self.assertEqual(response.json()["results"][0]["ticker"], "AAPL")
+
+
+@override_settings(CACHES=TEST_CACHES)
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        exchange = Exchange.objects.create(code="NYSE", name="New York Stock Exchange", country="USA")
+        prices = ["5.00", "7.50", None, "7.50", "1.25", None, "9.00"]
+        for index, price in enumerate(prices):
+            Stock.objects.create(
+                ticker=f"T{index}",
+                company_name=f"Company {index}",
+                exchange=exchange,
+                country="USA",
+                price=Decimal(price) if price else None,
+            )
+
+    def _walk(self, params):
+        url, tickers = "/api/stocks/", []
+        response = self.client.get(url, params).json()
+        pages = [response]
+        while response["next"]:
+            response = self.client.get(response["next"]).json()
+            pages.append(response)
+        for page in pages:
+            tickers.extend(row["ticker"] for row in page["results"])
+        return tickers, pages
+
+    def test_walks_every_row_once_with_nulls_last(self):
+        tickers, pages = self._walk({"pagination": "cursor", "ordering": "price", "page_size": 2})
+        self.assertEqual(tickers, ["T4", "T0", "T1", "T3", "T6", "T2", "T5"])
+        self.assertIsNone(pages[0]["previous"])
+        self.assertIsNone(pages[0]["count"])
+
+        tickers, _ = self._walk({"pagination": "cursor", "ordering": "-price", "page_size": 3})
+        self.assertEqual(tickers, ["T6", "T3", "T1", "T0", "T4", "T5", "T2"])
+
+    def test_previous_link_returns_prior_page(self):
+        _, pages = self._walk({"pagination": "cursor", "ordering": "price", "page_size": 2})
+        previous = self.client.get(pages[3]["previous"]).json()
+        self.assertEqual([row["ticker"] for row in previous["results"]], ["T6", "T2"])
+        first = self.client.get(pages[1]["previous"]).json()
+        self.assertEqual([row["ticker"] for row in first["results"]], ["T4", "T0"])
+        self.assertIsNone(first["previous"])
+
+    def test_sparse_fields_keep_cursors_working(self):
+        tickers, pages = self._walk({"pagination": "cursor", "ordering": "price", "page_size": 2, "fields": "ticker"})
+        self.assertEqual(tickers, ["T4", "T0", "T1", "T3", "T6", "T2", "T5"])
+        self.assertEqual(set(pages[0]["results"][0]), {"ticker"})
+        with self.assertNumQueries(1):
+            self.client.get(pages[0]["next"])
+
+    def test_count_is_optional_and_cached(self):
+        params = {"pagination": "cursor", "include_count": "true", "page_size": 2}
+        self.assertEqual(self.client.get("/api/stocks/", params).json()["count"], 7)
+        with self.assertNumQueries(1):
+            self.client.get("/api/stocks/", params)
+
+
+def _price_frame(dates, closes, volume=1000):
+    return pd.DataFrame(
+        {
+            "Open": [close - 0.5 for close in closes],
+            "High": [close + 0.5 for close in closes],
+            "Low": [close - 1.0 for close in closes],
+            "Close": closes,
+            "Adj Close": [close - 0.05 for close in closes],
+            "Volume": [volume] * len(closes),
+        },
+        index=pd.to_datetime(dates),
+    )
+
+
+@override_settings(CACHES=TEST_CACHES)
+class PriceStoreTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        exchange = Exchange.objects.create(code="NYSE", name="New York Stock Exchange", country="USA")
+        self.stock = Stock.objects.create(ticker="HIST", company_name="History Corp", exchange=exchange, country="USA")
+
+    @mock.patch("screener.management.commands.historical_prices.yf.download")
+    def test_sync_keeps_store_in_step_with_database(self, mock_download):
+        mock_download.return_value = _price_frame(["2024-01-02", "2024-01-03", "2024-01-04"], [10.12345, 11.5, 12.25])
+        with self.settings(PRICE_STORE_ENABLED=True, PRICE_STORE_DIR=self.tmpdir.name):
+            call_command("historical_prices", "--tickers", "HIST", stdout=io.StringIO())
+            mock_download.return_value = _price_frame(["2024-01-04", "2024-01-05"], [12.5, 13.0])
+            call_command("historical_prices", "--tickers", "HIST", "--force", stdout=io.StringIO())
+
+            series = PriceStore(self.tmpdir.name).read("classifier", self.stock.pk)
+            self.assertEqual(len(series), 4)
+            self.assertIsInstance(series.values, np.memmap)
+
+            params = {"ticker": "HIST", "start": "2024-01-03"}
+            with self.assertNumQueries(1):
+                from_store = self.client.get("/api/stocks/history/", params).json()
+
+        from_db = self.client.get("/api/stocks/history/", params).json()
+        self.assertEqual(from_store, from_db)
+        self.assertEqual(from_db["count"], 3)
+        self.assertEqual(from_db["results"][1]["close_price"], 12.5)
+        self.assertEqual(from_db["range"], {"start": "2024-01-03", "end": "2024-01-05"})
+
+    def test_history_columnar_and_arrow_formats(self):
+        HistoricalPrice.objects.create(stock=self.stock, date=date(2024, 1, 2), close_price=Decimal("10.5"), volume=100)
+        HistoricalPrice.objects.create(stock=self.stock, date=date(2024, 1, 3), close_price=Decimal("11.25"))
+        records = self.client.get("/api/stocks/history/", {"ticker": "HIST"}).json()
+
+        columnar = self.client.get("/api/stocks/history/", {"ticker": "HIST", "format": "columnar"}).json()
+        self.assertEqual(columnar["range"], records["range"])
+        self.assertEqual(columnar["results"]["date"], ["2024-01-02", "2024-01-03"])
+        self.assertEqual(
+            [dict(zip(columnar["results"], row)) for row in zip(*columnar["results"].values())],
+            records["results"],
+        )
+
+        response = self.client.get("/api/stocks/history/", {"ticker": "HIST", "format": "arrow"})
+        self.assertEqual(response["Content-Type"], "application/vnd.apache.arrow.stream")
+        table = pa.ipc.open_stream(response.content).read_all()
+        self.assertEqual(table.column("close_price").to_pylist(), [10.5, 11.25])
+        self.assertEqual(table.column("volume").to_pylist(), [100, None])
+        self.assertEqual(table.column("date").to_pylist(), [date(2024, 1, 2), date(2024, 1, 3)])
+        self.assertEqual(table.schema.metadata[b"stock"], b'"HIST"')
+
+        error = self.client.get("/api/stocks/history/", {"ticker": "HIST", "format": "arrow", "end": "bad"})
+        self.assertEqual(error.status_code, 400)
+        self.assertEqual(error["Content-Type"], "application/json")
+
+    def test_history_without_prices_keeps_the_column_schema(self):
+        self.assertEqual(self.client.get("/api/stocks/history/", {"ticker": "HIST"}).json()["results"], [])
+        columnar = self.client.get("/api/stocks/history/", {"ticker": "HIST", "format": "columnar"}).json()
+        self.assertEqual(columnar["results"], {name: [] for name in ["date", *PRICE_COLUMNS]})
+
+        response = self.client.get("/api/stocks/history/", {"ticker": "HIST", "format": "arrow"})
+        table = pa.ipc.open_stream(response.content).read_all()
+        self.assertEqual(table.num_rows, 0)
+        self.assertEqual(table.column_names, ["date", *PRICE_COLUMNS])
+        self.assertEqual(table.schema.field("volume").type, pa.int64())
+
+    def test_build_price_store_backfills_from_database(self):
+        HistoricalPrice.objects.create(
+            stock=self.stock, date="2024-02-01", close_price=Decimal("5.1234"), volume=None
+        )
+        HistoricalPrice.objects.create(
+            stock=self.stock, date="2024-02-02", close_price=Decimal("5.5"), volume=300
+        )
+        call_command("build_price_store", "--directory", self.tmpdir.name, stdout=io.StringIO())
+
+        series = PriceStore(self.tmpdir.name).read("classifier", self.stock.pk)
+        self.assertEqual(series.to_records(), [
+            {"date": "2024-02-01", "open_price": None, "high_price": None, "low_price": None,
+             "close_price": 5.1234, "adjusted_close": None, "volume": None},
+            {"date": "2024-02-02", "open_price": None, "high_price": None, "low_price": None,
+             "close_price": 5.5, "adjusted_close": None, "volume": 300},
+        ])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class HistoryBatchTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        exchange = Exchange.objects.create(code="NYSE", name="New York Stock Exchange", country="USA")
+        self.first = Stock.objects.create(ticker="AAA", company_name="A Corp", exchange=exchange, country="USA")
+        self.second = Stock.objects.create(
+            ticker="BBB", full_ticker="NYSE:BBB", company_name="B Corp", exchange=exchange, country="USA"
+        )
+        for stock, day, close in [
+            (self.first, 2, "10.0"), (self.first, 3, "11.0"), (self.first, 5, "12.0"),
+            (self.second, 3, "20.0"), (self.second, 4, "21.0"),
+        ]:
+            HistoricalPrice.objects.create(stock=stock, date=date(2024, 1, day), close_price=Decimal(close), volume=day)
+
+    def test_aligns_series_on_a_shared_date_axis(self):
+        params = {"tickers": "nyse:bbb,aaa,NOPE", "ids": str(self.first.pk)}
+        with self.assertNumQueries(2):
+            data = self.client.get("/api/stocks/history/batch/", params).json()
+
+        self.assertEqual(data["dates"], ["2024-01-02", "2024-01-03", "2024-01-04", "2024-01-05"])
+        self.assertEqual(data["range"], {"start": "2024-01-02", "end": "2024-01-05"})
+        self.assertEqual(data["missing"], ["NOPE"])
+        self.assertEqual([entry["ticker"] for entry in data["results"]], ["BBB", "AAA"])
+        self.assertEqual(data["results"][0]["close_price"], [None, 20.0, 21.0, None])
+        self.assertEqual(data["results"][1]["close_price"], [10.0, 11.0, None, 12.0])
+        self.assertEqual(data["results"][1]["volume"], [2, 3, None, 5])
+
+    def test_store_and_database_sources_agree(self):
+        params = {"tickers": "AAA,BBB", "window": "2"}
+        from_db = self.client.get("/api/stocks/history/batch/", params).json()
+        self.assertEqual(from_db["dates"], ["2024-01-03", "2024-01-04", "2024-01-05"])
+
+        with self.settings(PRICE_STORE_ENABLED=True, PRICE_STORE_DIR=self.tmpdir.name):
+            call_command("build_price_store", "--tickers", "AAA", stdout=io.StringIO())
+            bump_generation("classifier")
+            from_store = self.client.get("/api/stocks/history/batch/", params).json()
+            response = self.client.get("/api/stocks/history/batch/", {**params, "format": "arrow"})
+        self.assertEqual(from_store, from_db)
+
+        table = pa.ipc.open_stream(response.content).read_all()
+        self.assertEqual(table.column_names, ["date", str(self.first.pk), str(self.second.pk)])
+        self.assertEqual(table.column(str(self.second.pk)).combine_chunks().field("close_price").to_pylist(), [20.0, 21.0, None])
+
+    def test_arrow_columns_stay_distinct_for_shared_tickers(self):
+        exchange = Exchange.objects.create(code="TSX", name="Toronto Stock Exchange", country="Canada")
+        listed_twice = Stock.objects.create(ticker="AAA", company_name="A Canada", exchange=exchange, country="Canada")
+        HistoricalPrice.objects.create(stock=listed_twice, date=date(2024, 1, 3), close_price=Decimal("30.0"), volume=1)
+
+        ids = f"{self.first.pk},{listed_twice.pk}"
+        response = self.client.get("/api/stocks/history/batch/", {"ids": ids, "format": "arrow"})
+        batch = pa.ipc.open_stream(response.content).read_all()
+        self.assertEqual(batch.column_names, ["date", str(self.first.pk), str(listed_twice.pk)])
+        self.assertEqual(batch.column(str(listed_twice.pk)).combine_chunks().field("close_price").to_pylist(), [None, 30.0, None])
+        results = json.loads(batch.schema.metadata[b"results"])
+        self.assertEqual([(entry["ticker"], entry["exchange"]) for entry in results], [("AAA", "NYSE"), ("AAA", "TSX")])
+
+    def test_requires_and_limits_the_stock_list(self):
+        self.assertEqual(self.client.get("/api/stocks/history/batch/").status_code, 400)
+        too_many = ",".join(f"T{index}" for index in range(60))
+        self.assertEqual(self.client.get("/api/stocks/history/batch/", {"tickers": too_many}).status_code, 400)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class HistoryDownsamplingTests(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        exchange = Exchange.objects.create(code="NYSE", name="New York Stock Exchange", country="USA")
+        self.stock = Stock.objects.create(ticker="LONG", company_name="Long Corp", exchange=exchange, country="USA")
+        days = pd.bdate_range("2024-01-01", "2024-03-29")
+        HistoricalPrice.objects.bulk_create([
+            HistoricalPrice(
+                stock=self.stock,
+                date=day.date(),
+                open_price=Decimal(index),
+                high_price=Decimal(index + 2),
+                low_price=Decimal(index) - 1,
+                close_price=Decimal(index + 1),
+                adjusted_close=Decimal(index + 1),
+                volume=10,
+            )
+            for index, day in enumerate(days)
+        ])
+
+    def test_resamples_to_weekly_and_monthly_bars(self):
+        monthly = self.client.get("/api/stocks/history/", {"ticker": "LONG", "resolution": "monthly"}).json()
+        self.assertEqual([bar["date"] for bar in monthly["results"]], ["2024-01-01", "2024-02-01", "2024-03-01"])
+        january = monthly["results"][0]
+        self.assertEqual(
+            (january["open_price"], january["high_price"], january["low_price"], january["close_price"]),
+            (0.0, 24.0, -1.0, 23.0),
+        )
+        self.assertEqual(january["volume"], 230)
+
+        weekly = self.client.get("/api/stocks/history/", {"ticker": "LONG", "resolution": "weekly"}).json()
+        self.assertEqual(weekly["count"], 13)
+        self.assertEqual(weekly["results"][1]["date"], "2024-01-08")
+        self.assertEqual(weekly["results"][1]["volume"], 50)
+
+    def test_lttb_keeps_endpoints_and_extremes(self):
+        close = np.r_[np.zeros(50), 100.0, np.zeros(49)]
+        indices = lttb_indices(np.arange(100, dtype=float), close, 10)
+        self.assertEqual(len(indices), 10)
+        self.assertEqual((indices[0], indices[-1]), (0, 99))
+        self.assertIn(50, indices)
+        self.assertTrue(np.all(np.diff(indices) > 0))
+
+        data = self.client.get("/api/stocks/history/", {"ticker": "LONG", "points": "20"}).json()
+        self.assertEqual(data["count"], 20)
+        self.assertEqual(data["range"], {"start": "2024-01-01", "end": "2024-03-29"})
+
+    def test_downsampled_series_are_cached_per_generation(self):
+        params = {"ticker": "LONG", "window": "max", "points": "20"}
+        first = self.client.get("/api/stocks/history/", params).json()
+        # Stock lookup and latest date only; the bars come from the cache.
+        with self.assertNumQueries(2):
+            second = self.client.get("/api/stocks/history/", params).json()
+        self.assertEqual(first, second)
+
+        HistoricalPrice.objects.filter(stock=self.stock, date=date(2024, 3, 29)).update(close_price=Decimal("999"))
+        bump_generation("classifier")
+        third = self.client.get("/api/stocks/history/", params).json()
+        self.assertEqual(third["results"][-1]["close_price"], 999.0)
+
+    def test_rejects_invalid_parameters(self):
+        for params in [{"resolution": "hourly"}, {"points": "2"}, {"points": "many"}]:
+            with self.subTest(params=params):
+                response = self.client.get("/api/stocks/history/", {"ticker": "LONG", **params})
+                self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class HistorySummaryTests(TestCase):
+    def setUp(self):
+        exchange = Exchange.objects.create(code="NYSE", name="New York Stock Exchange", country="USA")
+        self.stock = Stock.objects.create(ticker="SUMM", company_name="Summary Corp", exchange=exchange, country="USA")
+
+    def _sync(self, mock_download, dates, closes, *extra):
+        mock_download.return_value = _price_frame(dates, closes)
+        call_command("historical_prices", "--tickers", "SUMM", "--force", *extra, stdout=io.StringIO())
+
+    def _assert_matches_rebuild(self):
+        summary = HistorySummary.objects.get(stock=self.stock)
+        rebuild_summaries(HistorySummary, HistoricalPrice, [self.stock.pk])
+        rebuilt = HistorySummary.objects.get(stock=self.stock)
+        fields = [field.name for field in HistorySummary._meta.concrete_fields if field.name != "updated_at"]
+        self.assertEqual(
+            {name: getattr(summary, name) for name in fields},
+            {name: getattr(rebuilt, name) for name in fields},
+        )
+        return rebuilt
+
+    @mock.patch("screener.management.commands.historical_prices.yf.download")
+    def test_sync_maintains_summary_incrementally(self, mock_download):
+        self._sync(mock_download, ["2024-01-02", "2024-01-03", "2024-01-04"], [10.0, 30.0, 20.0])
+        summary = self._assert_matches_rebuild()
+        self.assertEqual((summary.high_close, summary.high_close_date), (Decimal("30.0000"), date(2024, 1, 3)))
+
+        # Append, then rewrite the latest bar only: both are folded in place.
+        with mock.patch("screener.history_summary.rebuild_summaries") as rebuild:
+            self._sync(mock_download, ["2024-01-05"], [25.0])
+            self._sync(mock_download, ["2024-01-05"], [26.5])
+        rebuild.assert_not_called()
+        summary = self._assert_matches_rebuild()
+        self.assertEqual((summary.latest_close, summary.previous_close), (Decimal("26.5000"), Decimal("20.0000")))
+
+        # Rewriting the bar that held the high forces a rebuild.
+        self._sync(mock_download, ["2024-01-03", "2024-01-04"], [12.0, 13.0])
+        summary = self._assert_matches_rebuild()
+        self.assertEqual((summary.high_close, summary.high_close_date), (Decimal("26.5000"), date(2024, 1, 5)))
+
+    @mock.patch("screener.management.commands.historical_prices.yf.download")
+    def test_profile_reads_summary_instead_of_history(self, mock_download):
+        self._sync(mock_download, ["2024-01-02", "2024-01-03", "2024-01-04"], [10.0, 30.0, 20.0])
+        with CaptureQueriesContext(connection) as with_summary:
+            from_summary = self.client.get("/api/stocks/profile/", {"ticker": "SUMM"}).json()
+
+        HistorySummary.objects.all().delete()
+        with CaptureQueriesContext(connection) as without_summary:
+            from_history = self.client.get("/api/stocks/profile/", {"ticker": "SUMM"}).json()
+
+        self.assertEqual(from_summary, from_history)
+        self.assertEqual(len(with_summary), 1)
+        self.assertEqual(len(without_summary), 3)
+        self.assertEqual(from_summary["history"]["high_close"], 30.0)
+        self.assertEqual(from_summary["price_change"]["absolute"], -10.0)
+
+        call_command("build_history_summaries", "--dataset", "classifier", stdout=io.StringIO())
+        self.assertTrue(HistorySummary.objects.filter(stock=self.stock).exists())
+
+
+@override_settings(CACHES=TEST_CACHES)
+class IndicatorEngineTests(TestCase):
+    def setUp(self):
+        exchange = Exchange.objects.create(code="NYSE", name="New York Stock Exchange", country="USA")
+        rng = np.random.default_rng(7)
+        self.days = pd.bdate_range("2023-01-02", periods=300)
+        self.stocks = []
+        for ticker, count in [("WALK", 300), ("LATE", 120), ("TINY", 5)]:
+            stock = Stock.objects.create(ticker=ticker, company_name=f"{ticker} Corp", exchange=exchange, country="USA")
+            closes = np.round(50 + np.cumsum(rng.normal(0, 1, count)), 4)
+            HistoricalPrice.objects.bulk_create([
+                HistoricalPrice(
+                    stock=stock,
+                    date=day.date(),
+                    close_price=Decimal(str(close)),
+                    high_price=Decimal(str(round(close + 1, 4))),
+                    low_price=Decimal(str(round(close - 1, 4))),
+                    volume=1000 + index,
+                )
+                for index, (day, close) in enumerate(zip(self.days[-count:], closes))
+            ])
+            self.stocks.append(stock)
+
+    def _snapshot(self):
+        fields = ["sma_20", "sma_50", "sma_200", "high_52_week", "low_52_week", "last_date", "rsi_seed_count"]
+        indicators = {row.stock_id: [getattr(row, name) for name in fields] for row in StockIndicators.objects.all()}
+        stocks = {
+            stock.pk: [getattr(stock, name) for name in STOCK_FIELDS]
+            for stock in Stock.objects.all()
+        }
+        return indicators, stocks
+
+    def test_incremental_update_matches_full_replay(self):
+        ids = [stock.pk for stock in self.stocks]
+        cutoff = self.days[250].date()
+        held_back = list(HistoricalPrice.objects.filter(date__gt=cutoff).values())
+        HistoricalPrice.objects.filter(date__gt=cutoff).delete()
+        # TINY has no bars before the cutoff yet.
+        self.assertEqual(refresh_indicators("classifier", ids), 2)
+
+        HistoricalPrice.objects.bulk_create([HistoricalPrice(**row) for row in held_back])
+        # State, one grouped read per kind of stock, then the two bulk writes in a savepoint.
+        with self.assertNumQueries(7):
+            refresh_indicators("classifier", ids)
+        incremental = self._snapshot()
+
+        refresh_indicators("classifier", ids, full=True)
+        self.assertEqual(self._snapshot(), incremental)
+
+    def test_chunked_replay_matches_single_pass(self):
+        ids = [stock.pk for stock in self.stocks]
+        with mock.patch("screener.indicators.REPLAY_CHUNK", 1000):
+            refresh_indicators("classifier", ids, full=True)
+        single_pass = self._snapshot(), dict(StockIndicators.objects.values_list("stock_id", "rolling_window"))
+
+        advance = RollingState.advance
+        widths = []
+
+        def recording_advance(state, bars):
+            widths.append(bars.shape[2])
+            advance(state, bars)
+
+        with mock.patch("screener.indicators.REPLAY_CHUNK", 7), mock.patch.object(RollingState, "advance", recording_advance):
+            refresh_indicators("classifier", ids, full=True)
+        self.assertEqual(max(widths), 7)
+        self.assertEqual(sum(widths), 300)
+        self.assertEqual((self._snapshot(), dict(StockIndicators.objects.values_list("stock_id", "rolling_window"))), single_pass)
+
+    def test_values_match_reference_formulas(self):
+        stock = self.stocks[0]
+        refresh_indicators("classifier", [item.pk for item in self.stocks])
+        closes = np.array([float(value) for value in stock.historical_prices.order_by("date").values_list("close_price", flat=True)])
+
+        changes = np.diff(closes)
+        gains, losses = np.maximum(changes, 0), np.maximum(-changes, 0)
+        average_gain, average_loss = gains[:14].mean(), losses[:14].mean()
+        for gain, loss in zip(gains[14:], losses[14:]):
+            average_gain = (average_gain * 13 + gain) / 14
+            average_loss = (average_loss * 13 + loss) / 14
+        expected_rsi = 100 - 100 / (1 + average_gain / average_loss)
+
+        stock.refresh_from_db()
+        indicators = StockIndicators.objects.get(stock=stock)
+        self.assertAlmostEqual(float(stock.relative_strength_index), expected_rsi, places=2)
+        self.assertAlmostEqual(float(indicators.sma_200), closes[-200:].mean(), places=3)
+        self.assertAlmostEqual(float(indicators.high_52_week), closes[-252:].max() + 1, places=3)
+        self.assertAlmostEqual(float(stock.price_change), closes[-1] - closes[-2], places=2)
+        self.assertEqual(stock.average_volume, round(np.mean(np.arange(280, 300) + 1000)))
+
+        tiny = StockIndicators.objects.get(stock=self.stocks[2])
+        self.assertIsNone(tiny.sma_20)
+        self.assertEqual(tiny.rsi_seed_count, 4)
+
+    @mock.patch("screener.management.commands.historical_prices.yf.download")
+    def test_sync_extends_state_and_replays_rewrites(self, mock_download):
+        stock = self.stocks[1]
+        out = io.StringIO()
+        call_command("compute_indicators", "--dataset", "classifier", stdout=out)
+        self.assertIn("Updated indicators for 3 stocks", out.getvalue())
+
+        mock_download.return_value = _price_frame(["2024-02-26", "2024-02-27"], [90.0, 95.0])
+        call_command("historical_prices", "--tickers", "LATE", stdout=io.StringIO())
+        incremental = self._snapshot()
+        refresh_indicators("classifier", [stock.pk], full=True)
+        self.assertEqual(self._snapshot(), incremental)
+        stock.refresh_from_db()
+        self.assertEqual(stock.price_change, Decimal("5.00"))
+
+        # Rewriting an older bar replays the stock from its first bar.
+        mock_download.return_value = _price_frame([str(self.days[-30].date())], [10.0])
+        call_command("historical_prices", "--tickers", "LATE", "--force", stdout=io.StringIO())
+        replayed = self._snapshot()
+        refresh_indicators("classifier", [stock.pk], full=True)
+        self.assertEqual(self._snapshot(), replayed)
+        self.assertEqual(StockIndicators.objects.get(stock=stock).low_52_week, Decimal("9.0000"))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ReturnsMatrixTests(TestCase):
+    def setUp(self):
+        exchange = Exchange.objects.create(code="NYSE", name="New York Stock Exchange", country="USA")
+        rng = np.random.default_rng(3)
+        self.days = [day.date() for day in pd.bdate_range("2024-01-01", periods=40)]
+        self.prices = {}
+        self.stocks = []
+        for ticker in ("AAA", "BBB", "NONE"):
+            stock = Stock.objects.create(ticker=ticker, company_name=f"{ticker} Corp", exchange=exchange, country="USA")
+            self.stocks.append(stock)
+            if ticker == "NONE":
+                continue
+            closes = pd.Series(np.round(100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(self.days)))), 4), index=self.days)
+            if ticker == "BBB":
+                # Lists late and skips two days.
+                closes = closes.iloc[5:].drop([self.days[10], self.days[20]])
+            HistoricalPrice.objects.bulk_create([
+                HistoricalPrice(stock=stock, date=day, close_price=Decimal(str(close)), adjusted_close=Decimal(str(close)))
+                for day, close in closes.items()
+            ])
+            self.prices[ticker] = closes
+
+    def test_drop_keeps_shared_dates_and_annualizes(self):
+        ids = [stock.pk for stock in self.stocks]
+        matrix = build_returns_matrix("classifier", ids)
+
+        frame = pd.DataFrame(self.prices).dropna()
+        expected = np.log(frame).diff().iloc[1:]
+        self.assertEqual(matrix.stock_ids, ids[:2])
+        self.assertEqual(matrix.missing, [ids[2]])
+        self.assertEqual(matrix.returns.shape, (len(frame) - 1, 2))
+        self.assertEqual(matrix.dates.astype(date).tolist(), list(expected.index))
+        np.testing.assert_allclose(matrix.returns, expected.to_numpy())
+        np.testing.assert_allclose(matrix.mean, expected.mean().to_numpy() * 252)
+        np.testing.assert_allclose(matrix.covariance, expected.cov().to_numpy() * 252)
+        np.testing.assert_allclose(matrix.volatility, expected.std().to_numpy() * np.sqrt(252))
+        np.testing.assert_allclose(np.diag(matrix.correlation), [1.0, 1.0])
+
+    def test_missing_data_policies(self):
+        ids = [stock.pk for stock in self.stocks[:2]]
+        frame = pd.DataFrame(self.prices)
+
+        filled = build_returns_matrix("classifier", ids, missing="ffill")
+        expected = np.log(frame.ffill()).diff().iloc[1:]
+        np.testing.assert_allclose(filled.returns, expected.to_numpy())
+        self.assertEqual(filled.returns[list(expected.index).index(self.days[20]), 1], 0.0)
+        # The late listing has no returns before its first price; the other holding keeps its own.
+        self.assertTrue(np.isnan(filled.returns[:5, 1]).all())
+        self.assertFalse(np.isnan(filled.returns[:, 0]).any())
+
+        pairwise = build_returns_matrix("classifier", ids, missing="pairwise")
+        expected = np.log(frame.ffill()).diff().where(frame.notna()).iloc[1:]
+        self.assertEqual(len(pairwise), len(self.days) - 1)
+        np.testing.assert_allclose(pairwise.returns, expected.to_numpy())
+        np.testing.assert_allclose(pairwise.covariance, expected.cov().to_numpy() * 252)
+        np.testing.assert_allclose(pairwise.mean, expected.mean().to_numpy() * 252)
+
+        with self.assertRaises(ValueError):
+            build_returns_matrix("classifier", ids, missing="interpolate")
+
+    def test_window_and_cache(self):
+        ids = [stock.pk for stock in self.stocks[:2]]
+        start, end = self.days[10], self.days[30]
+        with self.assertNumQueries(1):
+            matrix = returns_matrix("classifier", ids, start=start, end=end)
+        # BBB has no bar on the start date, so the first shared pair is days 11 and 12.
+        self.assertEqual(matrix.dates[0].astype(date), self.days[12])
+        self.assertEqual(matrix.dates[-1].astype(date), end)
+
+        with self.assertNumQueries(0):
+            self.assertIs(type(returns_matrix("classifier", ids, start=start, end=end)), type(matrix))
+        with self.assertNumQueries(1):
+            returns_matrix("classifier", ids[:1], start=start, end=end)
+
+        bump_generation("classifier")
+        with self.assertNumQueries(1):
+            returns_matrix("classifier", ids, start=start, end=end)
+
+
+class MonteCarloTests(TestCase):
+    @staticmethod
+    def _matrix(mean, covariance, history=None):
+        mean = np.asarray(mean, dtype=float)
+        covariance = np.asarray(covariance, dtype=float)
+        history = np.zeros((1, len(mean))) if history is None else np.asarray(history, dtype=float)
+        return ReturnsMatrix(
+            dates=np.arange(len(history)).astype("datetime64[D]"),
+            stock_ids=list(range(len(mean))),
+            missing=[],
+            returns=history,
+            mean=mean,
+            volatility=np.sqrt(np.diag(covariance)),
+            covariance=covariance,
+        )
+
+    def test_rebalancing_without_volatility(self):
+        # Zero covariance makes every path deterministic (and exercises the singular factor).
+        daily = np.array([0.002, -0.001])
+        matrix = self._matrix(daily * 252, np.zeros((2, 2)))
+        options = {"years": 1, "initial_investment": 1000, "paths": 5, "seed": 1}
+
+        held = simulate_portfolio(matrix, [1, 1], rebalancing="never", **options)
+        np.testing.assert_allclose(held.final_values, 500 * np.exp(daily * 252).sum())
+        monthly = simulate_portfolio(matrix, [1, 1], rebalancing="monthly", **options)
+        np.testing.assert_allclose(monthly.final_values, 1000 * (0.5 * np.exp(daily * 21).sum()) ** 12)
+
+        self.assertEqual(monthly.days[0], 0)
+        self.assertEqual(monthly.days[-1], 252)
+        self.assertEqual(monthly.percentiles[50][0], 1000)
+        np.testing.assert_allclose(monthly.percentiles[50][1], 1000 * 0.5 * np.exp(daily * 21).sum())
+        self.assertEqual(monthly.summary["probability_of_loss"], 0.0)
+
+    def test_normal_paths_match_distribution_in_chunks(self):
+        matrix = self._matrix([0.08], [[0.04]])
+        result = simulate_portfolio(matrix, [1], years=2, paths=4000, seed=5, max_chunk_bytes=200_000)
+        log_growth = np.log(result.final_values / 100_000)
+        self.assertAlmostEqual(log_growth.mean(), 0.16, delta=0.02)
+        self.assertAlmostEqual(log_growth.std(), 0.2 * np.sqrt(2), delta=0.02)
+        np.testing.assert_array_equal(
+            result.final_values,
+            simulate_portfolio(matrix, [1], years=2, paths=4000, seed=5, max_chunk_bytes=200_000).final_values,
+        )
+        fan = np.vstack([result.percentiles[key] for key in (5, 50, 95)])
+        self.assertTrue((np.diff(fan, axis=0) >= 0).all())
+
+    def test_bootstrap_and_strategies(self):
+        history = [[0.01, -0.01], [-0.01, 0.02], [0.0, 0.0]]
+        matrix = self._matrix([0.0, 0.0], np.eye(2) * 0.01, history)
+        strategies = {"equal": [1, 1], "tilted": [3, 1]}
+        options = {"years": 0.5, "paths": 200, "method": "bootstrap"}
+
+        serial = simulate_strategies(matrix, strategies, seed=11, **options)
+        pooled = simulate_strategies(matrix, strategies, seed=11, workers=2, **options)
+        for name in strategies:
+            np.testing.assert_array_equal(serial[name].final_values, pooled[name].final_values)
+        self.assertFalse(np.array_equal(serial["equal"].final_values, serial["tilted"].final_values))
+        self.assertEqual(set(serial["equal"].to_payload()), {"days", "percentiles", "summary"})
+
+        with self.assertRaises(ValueError):
+            simulate_portfolio(matrix, [1, 1, 1])
+        with self.assertRaises(ValueError):
+            simulate_portfolio(matrix, [1, 1], method="garch")
+
+
+class OptimizerTests(TestCase):
+    def setUp(self):
+        self.mean = np.array([0.10, 0.12, 0.08])
+        self.covariance = np.array([[0.04, 0.01, 0.0], [0.01, 0.09, 0.02], [0.0, 0.02, 0.03]])
+
+    def test_projection_and_shrinkage(self):
+        weights = project(np.array([0.9, 0.5, -0.3, 0.1]), 0.05, 0.5)
+        self.assertAlmostEqual(weights.sum(), 1.0)
+        np.testing.assert_allclose(weights, [0.5, 0.4, 0.05, 0.05])
+
+        rng = np.random.default_rng(0)
+        covariance, shrinkage = ledoit_wolf(rng.normal(0, 0.01, (30, 20)))
+        self.assertTrue(0 < shrinkage <= 1)
+        self.assertGreater(np.linalg.eigvalsh(covariance)[0], 0)
+        self.assertLess(ledoit_wolf(rng.normal(0, 0.01, (5000, 3)) * [1, 2, 4])[1], 0.01)
+
+    def test_objectives_match_closed_forms(self):
+        # Unconstrained optima are interior here, so they match the textbook formulas.
+        inverse = np.linalg.inv(self.covariance)
+        min_variance = inverse.sum(axis=1) / inverse.sum()
+        result = optimize_weights(self.mean, self.covariance, "min_volatility")
+        np.testing.assert_allclose(result.weights, min_variance, atol=1e-6)
+
+        tangency = inverse @ (self.mean - 0.02)
+        result = optimize_weights(self.mean, self.covariance, "max_sharpe", risk_free_rate=0.02)
+        np.testing.assert_allclose(result.weights, tangency / tangency.sum(), atol=1e-6)
+        self.assertAlmostEqual(result.sharpe_ratio, np.sqrt((self.mean - 0.02) @ tangency), places=6)
+
+        capped = optimize_weights(self.mean, self.covariance, "max_sharpe", risk_free_rate=0.02, max_weight=0.4)
+        self.assertAlmostEqual(capped.weights.max(), 0.4)
+        self.assertLess(capped.sharpe_ratio, result.sharpe_ratio)
+
+        target = optimize_weights(self.mean, self.covariance, "target_return", target_return=0.105)
+        self.assertAlmostEqual(target.expected_return, 0.105, places=5)
+        frontier = inverse @ np.c_[self.mean, np.ones(3)]
+        multipliers = np.linalg.solve(np.c_[self.mean, np.ones(3)].T @ frontier, [0.105, 1.0])
+        np.testing.assert_allclose(target.weights, frontier @ multipliers, atol=1e-5)
+
+        warm = optimize_weights(self.mean, self.covariance, "min_volatility", initial=min_variance)
+        self.assertLessEqual(warm.iterations, 2)
+
+        with self.assertRaises(ValueError):
+            optimize_weights(self.mean, self.covariance, "target_return", target_return=0.5)
+        with self.assertRaises(ValueError):
+            optimize_weights(self.mean, self.covariance, max_weight=0.2)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class PortfolioOptimizeTests(TestCase):
+    def setUp(self):
+        exchange = Exchange.objects.create(code="NYSE", name="New York Stock Exchange", country="USA")
+        tech = Sector.objects.create(name="Technology")
+        software = Industry.objects.create(name="Software", sector=tech)
+        rng = np.random.default_rng(9)
+        days = [day.date() for day in pd.bdate_range("2024-01-01", periods=120)]
+        market = rng.normal(0.0005, 0.01, len(days))
+        for index, ticker in enumerate(["AAA", "BBB", "CCC", "DDD", "EEE"]):
+            stock = Stock.objects.create(
+                ticker=ticker,
+                company_name=f"{ticker} Corp",
+                exchange=exchange,
+                sector=tech,
+                industry=software,
+                country="USA",
+                market_cap=Decimal(1000 - index),
+            )
+            if ticker == "EEE":
+                continue
+            closes = 50 * np.exp(np.cumsum(market + rng.normal(0.0003 * index, 0.01, len(days))))
+            HistoricalPrice.objects.bulk_create([
+                HistoricalPrice(stock=stock, date=day, close_price=Decimal(str(round(close, 4))))
+                for day, close in zip(days, closes)
+            ])
+        self.params = {"sector": "technology", "start": "2024-01-01", "end": "2024-12-31"}
+
+    def test_min_volatility_within_bounds(self):
+        data = self.client.get(
+            "/api/portfolio/optimize/", {**self.params, "objective": "min_volatility", "max_weight": "40"},
+        ).json()
+
+        weights = [holding["weight"] for holding in data["weights"]]
+        self.assertAlmostEqual(sum(weights), 1.0, places=5)
+        self.assertLessEqual(max(weights), 0.4 + 1e-6)
+        self.assertEqual(data["missing"], ["EEE"])
+        self.assertEqual(data["universe_size"], 5)
+        self.assertEqual(data["observations"], 119)
+        self.assertEqual(data["range"], {"start": "2024-01-02", "end": "2024-06-14"})
+        self.assertTrue(0 <= data["shrinkage"] <= 1)
+        self.assertTrue(data["converged"])
+
+    def test_slider_changes_reuse_cached_inputs(self):
+        self.client.get("/api/portfolio/optimize/", {**self.params, "objective": "multi_objective"})
+        # Only the universe lookup hits the database once the inputs are cached.
+        with self.assertNumQueries(1):
+            data = self.client.get(
+                "/api/portfolio/optimize/",
+                {**self.params, "objective": "multi_objective", "return_weight": "30", "risk_weight": "70"},
+            ).json()
+        self.assertEqual(data["objective"], "multi_objective")
+
+    def test_default_window_moves_the_etag_with_the_current_date(self):
+        params = {"sector": "technology", "objective": "min_volatility"}
+
+        class Today(date):
+            current = date(2024, 5, 1)
+
+            @classmethod
+            def today(cls):
+                return cls.current
+
+        with mock.patch("screener.views.date", Today):
+            first = self.client.get("/api/portfolio/optimize/", params)
+            self.assertEqual(first.json()["range"]["end"], "2024-05-01")
+            cached = self.client.get("/api/portfolio/optimize/", params, HTTP_IF_NONE_MATCH=first["ETag"])
+            self.assertEqual(cached.status_code, 304)
+
+            Today.current = date(2024, 12, 31)
+            moved = self.client.get("/api/portfolio/optimize/", params, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(moved.status_code, 200)
+        self.assertNotEqual(moved["ETag"], first["ETag"])
+        self.assertEqual(moved.json()["range"]["end"], "2024-06-14")
+
+    def test_rejects_bad_parameters(self):
+        self.assertEqual(self.client.get("/api/portfolio/optimize/", {"objective": "min_volatility"}).status_code, 400)
+        response = self.client.get("/api/portfolio/optimize/", {**self.params, "objective": "momentum"})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get("/api/portfolio/optimize/", {**self.params, "max_weight": "10"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("cannot sum to 100%", response.json()[0])
+        response = self.client.get("/api/portfolio/optimize/", {"sector": "Energy"})
+        self.assertEqual(response.status_code, 404)
+
+
+class BacktestTests(TestCase):
+    @staticmethod
+    def _reference(dates, log_returns, weights, months, tolerance, cost, initial):
+        """Day-by-day walk the vectorized engine must reproduce."""
+        weights = np.asarray(weights) / np.sum(weights)
+        holdings = weights * initial
+        periods = np.asarray(dates, dtype="datetime64[M]").astype(np.int64) // months if months else None
+        equity, rebalances = [], []
+        for day in range(len(dates)):
+            holdings = holdings * np.exp(log_returns[day])
+            total = holdings.sum()
+            due = day + 1 < len(dates) and (
+                (periods is not None and periods[day] != periods[day + 1])
+                or (tolerance is not None and np.abs(holdings / total - weights).max() > tolerance)
+            )
+            if due:
+                traded = np.abs(weights - holdings / total).sum()
+                holdings = weights * total * (1 - cost * traded)
+                total = holdings.sum()
+                rebalances.append(dates[day])
+            equity.append(total)
+        return np.array(equity), rebalances
+
+    def test_matches_day_by_day_reference(self):
+        rng = np.random.default_rng(4)
+        dates = np.array([day.date() for day in pd.bdate_range("2023-01-02", periods=400)], dtype="datetime64[D]")
+        log_returns = rng.normal(0.0004, 0.015, (400, 4))
+        weights = [0.4, 0.3, 0.2, 0.1]
+        for rebalancing, months, tolerance in [("quarterly", 3, None), ("never", None, 0.03), ("monthly", 1, 0.05)]:
+            with self.subTest(rebalancing=rebalancing, tolerance=tolerance):
+                result = run_backtest(
+                    dates, log_returns, weights,
+                    rebalancing=rebalancing, drift_tolerance=tolerance, transaction_cost=0.001, initial_investment=1000,
+                )
+                equity, rebalances = self._reference(dates, log_returns, weights, months, tolerance, 0.001, 1000)
+                np.testing.assert_allclose(result.equity, equity)
+                self.assertEqual(result.rebalance_dates.tolist(), [day.astype(date) for day in rebalances])
+
+    def test_metrics_for_known_paths(self):
+        dates = np.array([day.date() for day in pd.bdate_range("2024-01-01", "2024-03-29")], dtype="datetime64[D]")
+        log_returns = np.tile([0.002, -0.001], (len(dates), 1))
+        held = run_backtest(dates, log_returns, [1, 1], rebalancing="never")
+        days = np.arange(1, len(dates) + 1)
+        np.testing.assert_allclose(held.equity, 50_000 * (np.exp(0.002 * days) + np.exp(-0.001 * days)))
+        self.assertEqual(held.turnover, 0.0)
+        self.assertEqual(held.max_drawdown, 0.0)
+
+        monthly = run_backtest(dates, log_returns, [1, 1], rebalancing="monthly")
+        self.assertEqual(
+            monthly.rebalance_dates.astype(date).tolist(), [date(2024, 1, 31), date(2024, 2, 29)]
+        )
+        january = np.exp(np.array([0.002, -0.001]) * 23)
+        self.assertAlmostEqual(monthly.equity[22], 50_000 * january.sum())
+        self.assertGreater(monthly.turnover, abs(january[0] / january.sum() - 0.5))
+
+        falling = run_backtest(dates[:3], np.array([[0.1], [-0.2], [0.05]]), [1], rebalancing="never")
+        self.assertAlmostEqual(falling.max_drawdown, np.exp(-0.2) - 1)
+        self.assertAlmostEqual(falling.total_return, np.exp(-0.05) - 1)
+
+    def test_strategies_share_one_returns_matrix(self):
+        exchange = Exchange.objects.create(code="NYSE", name="New York Stock Exchange", country="USA")
+        days = [day.date() for day in pd.bdate_range("2024-01-01", periods=60)]
+        stocks = []
+        for index, ticker in enumerate(["AAA", "BBB", "NONE"]):
+            stock = Stock.objects.create(ticker=ticker, company_name=f"{ticker} Corp", exchange=exchange, country="USA")
+            stocks.append(stock)
+            if ticker != "NONE":
+                HistoricalPrice.objects.bulk_create([
+                    HistoricalPrice(stock=stock, date=day, close_price=Decimal(str(round(100 * (1 + 0.01 * index) ** step, 4))))
+                    for step, day in enumerate(days)
+                ])
+        strategies = {
+            "equal": {stocks[0].pk: 0.5, stocks[1].pk: 0.5},
+            "growth": {stocks[1].pk: 0.8, stocks[2].pk: 0.2},
+        }
+        with self.assertNumQueries(1):
+            results, missing = backtest_strategies("classifier", strategies, rebalancing="monthly")
+
+        self.assertEqual(missing, [stocks[2].pk])
+        self.assertEqual(len(results["equal"].equity), 59)
+        # The missing holding's weight goes to BBB, which gains 1% a day.
+        self.assertAlmostEqual(results["growth"].total_return, 1.01 ** 59 - 1, places=4)
+        self.assertGreater(results["growth"].sharpe_ratio or 0, 0)
+        payload = results["equal"].to_payload()
+        self.assertEqual(payload["rebalance_dates"], ["2024-01-31", "2024-02-29"])
+
+    def test_each_strategy_starts_with_its_own_holdings(self):
+        exchange = Exchange.objects.create(code="NYSE", name="New York Stock Exchange", country="USA")
+        days = [day.date() for day in pd.bdate_range("2024-01-01", periods=60)]
+        steady = Stock.objects.create(ticker="OLD", company_name="Old Corp", exchange=exchange, country="USA")
+        listed = Stock.objects.create(ticker="IPO", company_name="IPO Corp", exchange=exchange, country="USA")
+        for stock, first, growth in [(steady, 0, 1.01), (listed, 40, 1.02)]:
+            HistoricalPrice.objects.bulk_create([
+                HistoricalPrice(stock=stock, date=day, close_price=Decimal(str(round(100 * growth ** step, 4))))
+                for step, day in enumerate(days[first:])
+            ])
+
+        alone, _ = backtest_strategies("classifier", {"steady": {steady.pk: 1.0}})
+        together, _ = backtest_strategies(
+            "classifier", {"steady": {steady.pk: 1.0}, "mixed": {steady.pk: 0.5, listed.pk: 0.5}},
+        )
+        self.assertEqual(len(together["steady"].equity), 59)
+        np.testing.assert_allclose(together["steady"].equity, alone["steady"].equity)
+        self.assertEqual(together["mixed"].dates[0].astype(date), days[41])
+        self.assertEqual(len(together["mixed"].equity), 19)
+
+
+class ClusteringTests(TestCase):
+    def _rows(self, count=90):
+        rng = np.random.default_rng(2)
+        groups = rng.integers(0, 3, count)
+        centers = np.array([[1e12, 12.0], [5e9, 40.0], [2e8, 90.0]])
+        caps = centers[groups, 0] * np.exp(rng.normal(0, 0.2, count))
+        ratios = centers[groups, 1] + rng.normal(0, 2, count)
+        rows = [(index, cap, ratio) for index, (cap, ratio) in enumerate(zip(caps, ratios))]
+        return rows + [(count, None, None)], groups
+
+    def test_recovers_groups_with_both_solvers(self):
+        rows, groups = self._rows()
+        features = ("market_cap", "pe_ratio")
+        result = cluster_stocks(rows, 3, features)
+        self.assertEqual(result.excluded, [90])
+        self.assertEqual(len(result.labels), 90)
+        for label in range(3):
+            self.assertEqual(len(set(groups[result.labels == label])), 1)
+        sizes = np.bincount(result.labels)
+        self.assertTrue((np.diff(sizes) <= 0).all())
+        np.testing.assert_array_equal(result.labels, cluster_stocks(rows, 3, features).labels)
+
+        with mock.patch("screener.clustering.MINI_BATCH_THRESHOLD", 10):
+            batched = cluster_stocks(rows, 3, features)
+        np.testing.assert_array_equal(batched.labels, result.labels)
+
+        with self.assertRaises(ValueError):
+            cluster_stocks(rows[:2], 3, features)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class PortfolioClustersTests(TestCase):
+    def setUp(self):
+        exchange = Exchange.objects.create(code="NYSE", name="New York Stock Exchange", country="USA")
+        tech = Sector.objects.create(name="Technology")
+        software = Industry.objects.create(name="Software", sector=tech)
+        days = [day.date() for day in pd.bdate_range("2024-01-01", periods=30)]
+        rng = np.random.default_rng(6)
+        for index, (cap, pe) in enumerate([(900e9, 20), (800e9, 22), (2e9, 60), (3e9, 55), (50e6, 5), (80e6, 6)]):
+            stock = Stock.objects.create(
+                ticker=f"S{index}",
+                company_name=f"Stock {index}",
+                exchange=exchange,
+                sector=tech,
+                industry=software,
+                country="USA",
+                market_cap=Decimal(cap),
+                pe_ratio=Decimal(pe),
+            )
+            closes = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, len(days))))
+            HistoricalPrice.objects.bulk_create([
+                HistoricalPrice(stock=stock, date=day, close_price=Decimal(str(round(close, 4))))
+                for day, close in zip(days, closes)
+            ])
+
+    def test_clusters_and_caches(self):
+        params = {"sector": "Technology", "k": "3", "features": "market_cap,pe_ratio"}
+        data = self.client.get("/api/portfolio/clusters/", params).json()
+
+        self.assertEqual(data["count"], 6)
+        self.assertEqual(data["features"], ["market_cap", "pe_ratio"])
+        groups = sorted([member["ticker"] for member in cluster["members"]] for cluster in data["clusters"])
+        self.assertEqual(groups, [["S0", "S1"], ["S3", "S2"], ["S5", "S4"]])
+        mega = next(cluster for cluster in data["clusters"] if cluster["members"][0]["ticker"] == "S0")
+        self.assertEqual(mega["average_market_cap"], 850e9)
+        self.assertEqual(mega["median"]["pe_ratio"], 21.0)
+
+        # The universe query is the only work left once assignments are cached.
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get("/api/portfolio/clusters/", params).json(), data)
+
+    def test_return_features_and_validation(self):
+        params = {"k": "3", "returns": "true", "start": "2024-01-01", "end": "2024-03-01"}
+        data = self.client.get("/api/portfolio/clusters/", params).json()
+        self.assertEqual(data["features"][-3:], ["return_component_1", "return_component_2", "return_component_3"])
+        self.assertEqual(sum(cluster["size"] for cluster in data["clusters"]), 6)
+
+        self.assertEqual(self.client.get("/api/portfolio/clusters/", {"k": "2"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/portfolio/clusters/", {"features": "beta"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/portfolio/clusters/", {"k": "3", "tickers": "S0,S1"}).status_code, 400)
+
+    def test_return_features_etag_moves_with_the_current_date(self):
+        params = {"k": "3", "returns": "true"}
+
+        class Today(date):
+            current = date(2024, 2, 1)
+
+            @classmethod
+            def today(cls):
+                return cls.current
+
+        with mock.patch("screener.views.date", Today):
+            first = self.client.get("/api/portfolio/clusters/", params)
+            self.assertEqual(first.status_code, 200)
+            cached = self.client.get("/api/portfolio/clusters/", params, HTTP_IF_NONE_MATCH=first["ETag"])
+            self.assertEqual(cached.status_code, 304)
+
+            Today.current = date(2024, 2, 2)
+            moved = self.client.get("/api/portfolio/clusters/", params, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(moved.status_code, 200)
+        self.assertNotEqual(moved["ETag"], first["ETag"])
+
+
+class FactorScoreTests(TestCase):
+    def test_sector_statistics(self):
+        values = np.array([1.0, 2.0, 2.0, 4.0, 10.0, np.nan, 7.0])
+        groups = np.array([0, 0, 0, 0, 1, 1, 2])
+        ranks = sector_percentiles(values, groups)
+        np.testing.assert_array_equal(ranks[[0, 1, 2, 3, 4, 6]], [0.0, 50.0, 50.0, 100.0, 50.0, 50.0])
+        self.assertTrue(np.isnan(ranks[5]))
+
+        scores = sector_zscores(values, groups)
+        first = values[:4]
+        np.testing.assert_allclose(scores[:4], (first - first.mean()) / first.std())
+        np.testing.assert_array_equal(scores[[4, 6]], [0.0, 0.0])
+        self.assertEqual(sector_zscores(np.r_[np.zeros(20), 1.0], np.zeros(21, dtype=np.int64))[-1], 3.0)
+
+    def test_scores_rank_within_sector(self):
+        # (stock_id, sector_id, pe, pb, ps, debt/capital, health, market cap)
+        rows = [
+            (1, 10, 10, 1.0, 1.0, 0.2, "Excellent", 5e9),
+            (2, 10, 20, 2.0, 2.0, 0.5, "Fair", 1e9),
+            (3, 10, 40, 4.0, 4.0, 0.8, "Weak", 2e8),
+            (4, 20, 50, 5.0, 5.0, None, "UNAVAILABLE", None),
+            (5, 20, 25, 2.5, 2.5, None, None, 3e9),
+            (6, None, None, None, None, None, None, None),
+        ]
+        # Closes 0, 21, 63, 126 and 251 trading days back.
+        closes = {1: np.array([120.0, 100, 100, 100, 100]), 2: np.array([90.0, 100, 100, 100, 100])}
+        stock_ids, scores = compute_factor_scores(rows, closes)
+
+        self.assertEqual(stock_ids, [1, 2, 3, 4, 5, 6])
+        np.testing.assert_array_equal(scores["value_rank"][:5], [100.0, 50.0, 0.0, 0.0, 100.0])
+        np.testing.assert_array_equal(scores["quality_rank"][:3], [100.0, 50.0, 0.0])
+        self.assertTrue(np.isnan(scores["quality_rank"][3:]).all())
+        np.testing.assert_array_equal(scores["size_rank"][:3], [100.0, 50.0, 0.0])
+        self.assertEqual(scores["size_rank"][4], 50.0)
+        np.testing.assert_allclose(scores["momentum_3m"][:2], [0.2, -0.1])
+        np.testing.assert_array_equal(scores["momentum_rank"][:3], [100.0, 0.0, np.nan])
+        self.assertTrue(np.isnan(scores["value_score"][5]))
+
+    def test_refresh_reads_momentum_from_indicator_state(self):
+        exchange = Exchange.objects.create(code="NYSE", name="New York Stock Exchange", country="USA")
+        days = [day.date() for day in pd.bdate_range("2023-01-02", periods=260)]
+        stocks = []
+        for ticker, growth in (("UP", 0.002), ("FLAT", 0.0)):
+            stock = Stock.objects.create(ticker=ticker, company_name=ticker, exchange=exchange, country="USA", pe_ratio=Decimal(15))
+            HistoricalPrice.objects.bulk_create([
+                HistoricalPrice(stock=stock, date=day, close_price=Decimal(str(round(50 * (1 + growth) ** index, 4))))
+                for index, day in enumerate(days)
+            ])
+            stocks.append(stock)
+        refresh_indicators("classifier", [stock.pk for stock in stocks])
+
+        self.assertEqual(refresh_factor_scores("classifier"), 2)
+        up = FactorScore.objects.get(stock=stocks[0])
+        self.assertAlmostEqual(up.momentum_3m, 1.002 ** 63 - 1, places=4)
+        self.assertAlmostEqual(up.momentum_12_1, 1.002 ** 230 - 1, places=4)
+        self.assertEqual(up.momentum_rank, 100.0)
+        self.assertEqual(FactorScore.objects.get(stock=stocks[1]).momentum_6m, 0.0)
+        self.assertEqual(up.value_rank, 50.0)
+
+        # A second run updates the rows in place.
+        Stock.objects.filter(pk=stocks[1].pk).update(pe_ratio=Decimal(30))
+        self.assertEqual(refresh_factor_scores("classifier"), 2)
+        self.assertEqual(FactorScore.objects.count(), 2)
+        self.assertEqual(FactorScore.objects.get(stock=stocks[0]).value_rank, 100.0)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class PortfolioFactorsTests(TestCase):
+    def setUp(self):
+        exchange = Exchange.objects.create(code="NYSE", name="New York Stock Exchange", country="USA")
+        tech = Sector.objects.create(name="Technology")
+        software = Industry.objects.create(name="Software", sector=tech)
+        energy = Sector.objects.create(name="Energy")
+        oil = Industry.objects.create(name="Oil", sector=energy)
+        # Value ranks within Technology: T0 100, T1 50, T2 0; momentum ranks run the other way.
+        for ticker, industry, pe, health in (
+            ("T0", software, 10, "Weak"),
+            ("T1", software, 20, "Good"),
+            ("T2", software, 40, "Excellent"),
+            ("E0", oil, 8, "Fair"),
+        ):
+            Stock.objects.create(
+                ticker=ticker,
+                company_name=ticker,
+                exchange=exchange,
+                sector=industry.sector,
+                industry=industry,
+                country="USA",
+                pe_ratio=Decimal(pe),
+                health_label=health,
+                market_cap=Decimal(1e9),
+            )
+        refresh_factor_scores("classifier")
+
+    def test_screens_by_primary_and_secondary_rank(self):
+        data = self.client.get("/api/portfolio/factors/", {"sector": "Technology"}).json()
+        self.assertEqual([row["ticker"] for row in data["results"]], ["T0", "T1", "T2"])
+        self.assertEqual(data["results"][0]["factors"]["value"]["rank"], 100.0)
+        self.assertEqual(data["results"][0]["sector"], "Technology")
+
+        blended = self.client.get(
+            "/api/portfolio/factors/",
+            {"sector": "Technology", "secondary": "quality", "primary_weight": "30"},
+        ).json()
+        self.assertEqual([row["ticker"] for row in blended["results"]], ["T2", "T1", "T0"])
+        self.assertAlmostEqual(blended["results"][0]["combined_rank"], 70.0)
+
+        filtered = self.client.get("/api/portfolio/factors/", {"min_quality_rank": "40", "limit": "2"}).json()
+        self.assertEqual([row["ticker"] for row in filtered["results"]], ["E0", "T1"])
+
+        # Scores are precomputed, so a screen is a single query on the rank columns.
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get("/api/portfolio/factors/", {"sector": "Technology"}).json(), data)
+
+    def test_validation(self):
+        for params in ({"primary": "growth"}, {"secondary": "value"}, {"limit": "0"}, {"min_size_rank": "120"}):
+            self.assertEqual(self.client.get("/api/portfolio/factors/", params).status_code, 400)
+
+
+@override_settings(CACHES=TEST_CACHES, FUND_BUILD_WORKERS=1)
+class FundBuildTests(TestCase):
+    def setUp(self):
+        exchange = Exchange.objects.create(code="NYSE", name="New York Stock Exchange", country="USA")
+        tech = Sector.objects.create(name="Technology")
+        energy = Sector.objects.create(name="Energy")
+        industries = [
+            Industry.objects.create(name="Software", sector=tech),
+            Industry.objects.create(name="Hardware", sector=tech),
+            Industry.objects.create(name="Oil", sector=energy),
+        ]
+        days = [day.date() for day in pd.bdate_range("2024-01-01", periods=120)]
+        rng = np.random.default_rng(8)
+        self.stocks = []
+        for index in range(12):
+            industry = industries[index % 3]
+            stock = Stock.objects.create(
+                ticker=f"F{index:02d}",
+                company_name=f"Fund Stock {index}",
+                exchange=exchange,
+                sector=industry.sector,
+                industry=industry,
+                country="USA",
+                market_cap=Decimal((12 - index) * 10 ** 9),
+                pe_ratio=Decimal(8 + 3 * index),
+                price_to_book=Decimal(str(1 + index / 4)),
+                total_debt_to_total_capital=Decimal(str(round(0.05 * (index % 5), 2))),
+            )
+            closes = 20 * np.exp(np.cumsum(rng.normal(0.0005 * (index % 4), 0.015, len(days))))
+            HistoricalPrice.objects.bulk_create([
+                HistoricalPrice(stock=stock, date=day, close_price=Decimal(str(round(close, 4))))
+                for day, close in zip(days, closes)
+            ])
+            self.stocks.append(stock)
+        refresh_factor_scores("classifier")
+
+    def _payload(self, **overrides):
+        payload = {
+            "selected_strategies": ["market_cap", "equal_weight", "factor_based", "risk_optimized", "cluster_based"],
+            "general_params": {"num_holdings": 6, "investment_horizon_years": 2, "rebalancing_frequency": "quarterly"},
+            "diversification_constraints": {"max_weight_per_stock": 30, "min_weight_per_stock": 10},
+            "strategy_specific": {
+                "factor_based": {"primary_factor": "value", "secondary_factor": "quality", "factor_split": [70, 30]},
+                "risk_optimized": {"objective": "min_volatility"},
+                "equal_weight": {"selection_method": "diversified"},
+                "cluster_based": {"num_clusters": 3},
+            },
+            "simulation": {"paths": 500, "seed": 3},
+            "start": "2024-01-01",
+            "end": "2024-12-31",
+        }
+        payload.update(overrides)
+        return payload
+
+    def _post(self, payload):
+        return self.client.post("/api/funds/build/", payload, content_type="application/json")
+
+    def test_builds_every_strategy_and_memoizes(self):
+        response = self._post(self._payload())
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["universe_size"], 12)
+        self.assertEqual(data["range"], {"start": "2024-01-02", "end": "2024-06-14"})
+
+        for name, fund in data["funds"].items():
+            weights = [holding["weight"] for holding in fund["holdings"]]
+            self.assertEqual(len(weights), 6, name)
+            self.assertAlmostEqual(sum(weights), 1.0, places=5)
+            self.assertTrue(all(0.1 - 1e-6 <= weight <= 0.3 + 1e-6 for weight in weights), name)
+            self.assertIn("value_at_risk_95", fund["simulation"]["summary"])
+            self.assertEqual(fund["simulation"]["days"][-1], 504)
+
+        market_cap = data["funds"]["market_cap"]
+        self.assertEqual(sorted(holding["ticker"] for holding in market_cap["holdings"]), [f"F{index:02d}" for index in range(6)])
+        self.assertEqual(market_cap["holdings"][0]["ticker"], "F00")
+        # Diversified selection takes the two largest of each industry.
+        equal = sorted(holding["ticker"] for holding in data["funds"]["equal_weight"]["holdings"])
+        self.assertEqual(equal, [f"F{index:02d}" for index in range(6)])
+        self.assertTrue(all(holding["weight"] == round(1 / 6, 6) for holding in data["funds"]["equal_weight"]["holdings"]))
+
+        # Reruns of the same parameters come straight from the cache.
+        with self.assertNumQueries(0):
+            self.assertEqual(self._post(self._payload()).json(), data)
+
+    def test_worker_processes_match_inline_build(self):
+        payload = self._payload(selected_strategies=["market_cap", "risk_optimized", "cluster_based"])
+        inline = self._post(payload).json()
+        caches["default"].clear()
+        with override_settings(FUND_BUILD_WORKERS=2), mock.patch(
+            "screener.funds.ProcessPoolExecutor", wraps=ProcessPoolExecutor
+        ) as pool:
+            parallel = self._post(payload).json()
+        pool.assert_called_once_with(max_workers=2)
+        self.assertEqual(parallel, inline)
+
+        # A fund does not depend on which other strategies were built with it.
+        alone = self._post(self._payload(selected_strategies=["cluster_based"])).json()
+        self.assertEqual(alone["funds"]["cluster_based"], inline["funds"]["cluster_based"])
+
+    def test_default_window_follows_the_current_date(self):
+        payload = self._payload(selected_strategies=["market_cap"])
+        del payload["start"], payload["end"]
+
+        class Today(date):
+            current = date(2024, 5, 1)
+
+            @classmethod
+            def today(cls):
+                return cls.current
+
+        with mock.patch("screener.funds.date", Today):
+            self.assertEqual(self._post(payload).json()["range"]["end"], "2024-05-01")
+            Today.current = date(2024, 12, 31)
+            self.assertEqual(self._post(payload).json()["range"]["end"], "2024-06-14")
+
+    def test_validation_and_unqualified_strategies(self):
+        self.assertEqual(self._post(self._payload(selected_strategies=["growth_fund"])).status_code, 400)
+        self.assertEqual(self._post(self._payload(selected_strategies=[])).status_code, 400)
+        strict = self._payload(diversification_constraints={"max_weight_per_stock": 10, "min_weight_per_stock": 5})
+        self.assertEqual(self._post(strict).status_code, 400)
+        growth = self._payload(strategy_specific={"factor_based": {"primary_factor": "growth"}})
+        self.assertEqual(self._post(growth).status_code, 400)
+
+        spec = parse_fund_request({"selected_strategies": ["cluster_based", "market_cap"], "sector_filter": "Energy"})
+        self.assertEqual(spec["strategies"], ["market_cap", "cluster_based"])
+        self.assertEqual(spec["universe"], {"sector": "Energy"})
+        self.assertEqual((spec["num_holdings"], spec["min_weight"], spec["max_weight"]), (25, 0.03, 0.05))
+
+        # Four Energy stocks cannot fill six holdings; the fund reports why instead of failing the request.
+        energy = self._payload(selected_strategies=["market_cap"], universe={"sector": "Energy"})
+        fund = self._post(energy).json()["funds"]["market_cap"]
+        self.assertIn("Only 4 stocks qualify", fund["error"])
+
+
+class PriceWriterTests(TestCase):
+    def setUp(self):
+        exchange = Exchange.objects.create(code="NYSE", name="New York Stock Exchange", country="USA")
+        self.stock = Stock.objects.create(ticker="BULK", company_name="Bulk Corp", exchange=exchange, country="USA")
+
+    def test_upsert_reports_inserted_and_updated_rows(self):
+        first = normalize_price_frame(_price_frame(["2024-03-01", "2024-03-04"], [20.123456, 21.0]))
+        self.assertEqual(upsert_price_frames(HistoricalPrice, [(self.stock.pk, first)]), (2, 0))
+
+        second = normalize_price_frame(_price_frame(["2024-03-04", "2024-03-05"], [21.5, 22.0], volume=2500.7))
+        second.loc[second.index[1], "open_price"] = np.nan
+        # Savepoint, one existence query, one executemany, release.
+        with self.assertNumQueries(4):
+            self.assertEqual(upsert_price_frames(HistoricalPrice, [(self.stock.pk, second)]), (1, 1))
+
+        rows = list(
+            HistoricalPrice.objects.filter(stock=self.stock)
+            .order_by("date")
+            .values_list("date", "open_price", "close_price", "volume")
+        )
+        self.assertEqual([str(row[0]) for row in rows], ["2024-03-01", "2024-03-04", "2024-03-05"])
+        self.assertEqual(rows[0][2], Decimal("20.1235"))
+        self.assertEqual(rows[1][2], Decimal("21.5"))
+        self.assertIsNone(rows[2][1])
+        self.assertEqual(rows[2][3], 2500)
+        self.assertTrue(all(
+            price.created_at and price.updated_at for price in HistoricalPrice.objects.filter(stock=self.stock)
+        ))
+
+
+class FakePriceSource:
+    host = "fake.local"
+
+    def __init__(self, frames, failures=0):
+        self.frames = frames
+        self.failures = failures
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def fetch(self, symbols, start_date, end_date):
+        with self.lock:
+            self.calls.append((tuple(symbols), start_date, end_date))
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionError("temporary outage")
+        return {symbol: normalize_price_frame(self.frames[symbol]) for symbol in symbols if symbol in self.frames}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class HistoricalPricesPipelineTests(TestCase):
+    def setUp(self):
+        self.exchange = Exchange.objects.create(code="NYSE", name="New York Stock Exchange", country="USA")
+        self.lse = Exchange.objects.create(code="LSE", name="London Stock Exchange", country="United Kingdom")
+
+    def _stock(self, ticker, exchange=None):
+        return Stock.objects.create(
+            ticker=ticker, company_name=f"{ticker} Corp", exchange=exchange or self.exchange, country="USA"
+        )
+
+    def test_groups_tickers_and_writes_every_frame(self):
+        stocks = [self._stock(f"P{index}") for index in range(5)]
+        london = self._stock("VOD", self.lse)
+        frames = {stock.ticker: _price_frame(["2024-03-01", "2024-03-04"], [20.0, 21.0]) for stock in stocks}
+        frames["VOD.L"] = _price_frame(["2024-03-01"], [0.7])
+        source = FakePriceSource(frames)
+
+        call_command(
+            "historical_prices", "--pipeline", "--group-size", "2", "--workers", "3", "--rate-limit", "0",
+            "--start", "2024-03-01", "--end", "2024-03-04", price_source=source, stdout=io.StringIO(),
+        )
+
+        self.assertEqual(len(source.calls), 3)
+        self.assertTrue(all(len(symbols) <= 2 for symbols, _, _ in source.calls))
+        self.assertEqual(HistoricalPrice.objects.count(), 11)
+        self.assertEqual(HistoricalPrice.objects.get(stock=stocks[0], date="2024-03-04").close_price, Decimal("21.0"))
+        london.refresh_from_db()
+        self.assertEqual(london.price, Decimal("0.70"))
+
+    def test_retries_failed_fetches_with_backoff(self):
+        stock = self._stock("RTRY")
+        source = FakePriceSource({"RTRY": _price_frame(["2024-03-01"], [5.0])}, failures=2)
+        out = io.StringIO()
+
+        call_command(
+            "historical_prices", "--pipeline", "--retries", "2", "--retry-backoff", "0", "--rate-limit", "0",
+            price_source=source, stdout=out,
+        )
+
+        self.assertEqual(len(source.calls), 3)
+        self.assertIn("in 3 attempt(s)", out.getvalue())
+        self.assertEqual(HistoricalPrice.objects.filter(stock=stock).count(), 1)
+
+    def test_reports_failure_after_retries_are_exhausted(self):
+        self._stock("DOWN")
+        source = FakePriceSource({}, failures=5)
+        out = io.StringIO()
+
+        call_command(
+            "historical_prices", "--pipeline", "--retries", "1", "--retry-backoff", "0", "--rate-limit", "0",
+            price_source=source, stdout=out,
+        )
+
+        self.assertEqual(len(source.calls), 2)
+        self.assertIn("[FAIL] DOWN: temporary outage", out.getvalue())
+
+    def test_plans_incremental_start_dates_with_one_query_per_chunk(self):
+        stocks = [self._stock(f"INC{index}") for index in range(4)]
+        for stock, last_date in zip(stocks, ["2024-03-01", "2024-03-01", "2024-03-04"]):
+            HistoricalPrice.objects.create(stock=stock, date=last_date, close_price=Decimal("1"))
+
+        command = historical_prices.Command()
+        with self.assertNumQueries(2):
+            plan = list(command._plan_sync(Stock.objects.order_by("id"), None, False, 100, None))
+        self.assertEqual(
+            [start for _, start in plan],
+            [date(2024, 3, 2), date(2024, 3, 2), date(2024, 3, 5), None],
+        )
+
+        source = FakePriceSource({})
+        call_command(
+            "historical_prices", "--pipeline", "--rate-limit", "0", "--end", "2024-03-08",
+            price_source=source, stdout=io.StringIO(),
+        )
+        self.assertEqual(
+            sorted(source.calls, key=lambda call: str(call[1])),
+            [
+                (("INC0", "INC1"), date(2024, 3, 2), date(2024, 3, 8)),
+                (("INC2",), date(2024, 3, 5), date(2024, 3, 8)),
+                (("INC3",), None, date(2024, 3, 8)),
+            ],
+        )
+
+    def test_splits_grouped_multi_ticker_download(self):
+        aaa = _price_frame(["2024-03-01", "2024-03-04"], [10.0, 11.0])
+        bbb = _price_frame(["2024-03-01", "2024-03-04"], [float("nan"), 5.0])
+        bbb.iloc[0] = float("nan")
+        grouped = pd.concat({"AAA": aaa, "BBB": bbb}, axis=1)
+
+        frames = split_multi_symbol_frame(grouped, ["AAA", "BBB", "CCC"])
+
+        self.assertEqual(sorted(frames), ["AAA", "BBB"])
+        self.assertEqual(list(frames["AAA"].columns)[3], "close_price")
+        self.assertEqual(len(frames["BBB"]), 1)
+
+    def test_rate_limiter_spaces_calls_per_host(self):
+        now = [0.0]
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            now[0] += seconds
+
+        limiter = RateLimiter(4, clock=lambda: now[0], sleep=sleep)
+        for _ in range(3):
+            limiter.wait("a.example")
+        limiter.wait("b.example")
+
+        self.assertEqual(sleeps, [0.25, 0.25])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ImportTickersBulkTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        sheet = pd.DataFrame(
+            [
+                ["NEW1", "New One", "New York Stock Exchange", "NYSE", "Technology", "Software", "12.5", "1000"],
+                ["OLD1", "Old One Renamed", "New York Stock Exchange", "NYSE", "Energy", "Oil & Gas", "40", "-"],
+                ["NEW1", "New One Again", "New York Stock Exchange", "NYSE", "Technology", "Software", "13", "1100"],
+                ["NONAME", None, "New York Stock Exchange", "NYSE", "Energy", None, "1", "1"],
+                ["DUP", "Duplicate", "Nasdaq Global Select", "NASDAQ", None, None, "2", "2"],
+                ["HK1", "Hong Kong One", "The Stock Exchange of Hong Kong Ltd.", "HKEX", "Energy", "Utilities", "3", "3"],
+            ],
+            columns=["Ticker", "Name Short", "Stock Exchange Name", "Exchange", "Sector", "Industry",
+                     "Price, Current", "Market Cap"],
+        )
+        self.cache_dir = f"{self.tmpdir.name}/cache"
+        self.enterContext(self.settings(IMPORT_CACHE_DIR=self.cache_dir))
+        path = f"{self.tmpdir.name}/United_States.xlsx"
+        with pd.ExcelWriter(path) as writer:
+            pd.DataFrame([["Screener export"]]).to_excel(writer, header=False, index=False)
+            sheet.to_excel(writer, startrow=2, index=False)
+
+        nyse = Exchange.objects.create(code="NYSE", name="NYSE", country="USA")
+        nasdaq = Exchange.objects.create(code="NASDAQ", name="Nasdaq", country="USA")
+        energy = Sector.objects.create(name="Energy")
+        Industry.objects.create(name="Utilities", sector=Sector.objects.create(name="Utilities"))
+        Stock.objects.create(ticker="OLD1", company_name="Old One", exchange=nyse, sector=energy, country="USA")
+        Stock.objects.create(ticker="DUP", company_name="Dup A", exchange=nyse, country="USA")
+        Stock.objects.create(ticker="DUP", company_name="Dup B", exchange=nasdaq, country="USA")
+
+    def _import(self, *args):
+        out = io.StringIO()
+        with transaction.atomic():
+            call_command("import_tickers", "--directory", self.tmpdir.name, *args, stdout=out)
+            stocks = list(
+                Stock.objects.order_by("ticker", "company_name").values_list(
+                    "ticker", "company_name", "exchange__code", "sector__name", "industry__name",
+                    "industry__sector__name", "price", "market_cap",
+                )
+            )
+            exchanges = list(Exchange.objects.order_by("code").values_list("code", "name", "country"))
+            transaction.set_rollback(True)
+        totals = [line for line in out.getvalue().splitlines() if line.startswith("Total")]
+        return totals, stocks, exchanges
+
+    def test_bulk_mode_matches_row_by_row_import(self):
+        with CaptureQueriesContext(connection) as row_queries:
+            expected = self._import()
+        self.assertEqual(expected[0], ["Total created: 2", "Total updated: 2", "Total skipped: 2"])
+
+        with CaptureQueriesContext(connection) as bulk_queries:
+            result = self._import("--bulk")
+        self.assertEqual(result, expected)
+        self.assertLess(len(bulk_queries), len(row_queries) // 2)
+
+    def test_reuses_parquet_copy_of_unchanged_workbook(self):
+        path = f"{self.tmpdir.name}/United_States.xlsx"
+        parsed = read_ticker_sheet(path)
+        self.assertEqual(list(parsed.columns)[:2], ["Ticker", "Name Short"])
+        self.assertEqual(parsed.iloc[0]["Market Cap"], "1000")
+
+        first, cached = load_ticker_sheet(path, self.cache_dir)
+        self.assertFalse(cached)
+        second, cached = load_ticker_sheet(path, self.cache_dir)
+        self.assertTrue(cached)
+        self.assertTrue(second.equals(first))
+        self.assertIsNone(second.iloc[3]["Name Short"])
+
+        with mock.patch("screener.workbooks.load_workbook") as load:
+            self.assertEqual(self._import()[0][0], "Total created: 2")
+        load.assert_not_called()
+
+    def test_parses_workbooks_in_worker_processes(self):
+        shutil.copy(f"{self.tmpdir.name}/United_States.xlsx", f"{self.tmpdir.name}/United_States_copy.xlsx")
+        expected = self._import("--no-cache")
+        self.assertEqual(self._import("--jobs", "2"), expected)
+        self.assertEqual(expected[0], ["Total created: 2", "Total updated: 6", "Total skipped: 4"])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        caches["default"].clear()
+        caches["screener_state"].clear()
+        exchange = Exchange.objects.create(code="NYSE", name="New York Stock Exchange", country="USA")
+        energy = Sector.objects.create(name="Energy")
+        oil = Industry.objects.create(name="Oil & Gas", sector=energy)
+        Stock.objects.create(ticker="OIL", company_name="Oil Corp", exchange=exchange, industry=oil, country="USA")
+
+    def test_serves_cached_payloads_until_generation_bumps(self):
+        urls = [
+            "/api/stocks/filter_options/",
+            "/api/stats/",
+            "/api/stocks/sector-industry-counts/",
+        ]
+        first = [self.client.get(url).json() for url in urls]
+        with self.assertNumQueries(0):
+            self.assertEqual([self.client.get(url).json() for url in urls], first)
+
+        self.assertEqual(first[1]["stocks"], 1)
+        Stock.objects.create(ticker="GAS", company_name="Gas Corp", exchange=Exchange.objects.get(), country="USA")
+        self.assertEqual(self.client.get("/api/stats/").json()["stocks"], 1)
+
+        bump_generation("classifier")
+        self.assertEqual(self.client.get("/api/stats/").json()["stocks"], 2)
+
+    def test_keys_include_dataset_and_relevant_params(self):
+        self.client.get("/api/stocks/sector-industry-counts/", {"exchange": "NYSE"})
+        with self.assertNumQueries(2):
+            payload = self.client.get("/api/stocks/sector-industry-counts/", {"exchange": "LSE"}).json()
+        self.assertEqual(payload, [])
+        with self.assertNumQueries(0):
+            self.client.get("/api/stocks/sector-industry-counts/", {"exchange": "NYSE", "_": "123"})
+        with self.assertNumQueries(7):
+            self.client.get("/api/stats/", {"dataset": "accessible"})
+
+    def test_conditional_requests_return_not_modified_without_queries(self):
+        synced = timezone.now() + timedelta(days=1)
+        Stock.objects.update(prices_last_synced_at=synced)
+        bump_generation("classifier")
+        HistoricalPrice.objects.create(stock=Stock.objects.get(), date="2024-01-02", close_price=Decimal("3.5"))
+        etags = {}
+        for url, params in [
+            ("/api/stocks/", {"ordering": "-market_cap"}),
+            ("/api/filtered-stats/", {"sector": "Energy"}),
+            ("/api/stocks/history/", {"ticker": "OIL"}),
+        ]:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            etag = etags[url] = response["ETag"]
+            self.assertIn("no-cache", response["Cache-Control"])
+
+            with self.assertNumQueries(0):
+                cached = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(cached.status_code, 304)
+            self.assertEqual(response["Last-Modified"], http_date(synced.timestamp()))
+            # Whole-second dates cannot tell apart changes within a second; only the ETag validates.
+            since = self.client.get(url, params, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+            self.assertEqual(since.status_code, 200)
+
+            self.assertEqual(self.client.get(url, {**params, "page": "1"}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        bump_generation("classifier")
+        response = self.client.get("/api/stocks/", {"ordering": "-market_cap"}, HTTP_IF_NONE_MATCH=etags["/api/stocks/"])
+        self.assertEqual(response.status_code, 200)
+
+
+    @override_settings(SCREENER_SNAPSHOT_ENABLED=True)
+    def test_api_writes_retire_cached_responses(self):
+        bump_generation("classifier")
+        stock = Stock.objects.get()
+        params = {"country": "USA"}
+        listing = self.client.get("/api/stocks/")
+        self.assertEqual(self.client.get("/api/filtered-stats/", params).json()["total_companies"], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f"/api/stocks/{stock.pk}/",
+                {"company_name": "Oil Corp Renamed", "country": "Canada"},
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.client.get("/api/stocks/").json()["results"][0]["company_name"], "Oil Corp Renamed")
+        self.assertEqual(self.client.get("/api/filtered-stats/", params).json()["total_companies"], 0)
+        conditional = self.client.get("/api/stocks/", HTTP_IF_NONE_MATCH=listing["ETag"])
+        self.assertEqual(conditional.status_code, 200)
+        self.assertNotEqual(conditional["ETag"], listing["ETag"])
+
+
+class ValuesRowSerializerTests(TestCase):
+    def test_matches_stock_serializer_output(self):
+        exchange = Exchange.objects.create(code="NYSE", name="New York Stock Exchange", country="USA")
+        tech = Sector.objects.create(name="Technology")
+        software = Industry.objects.create(name="Software", sector=tech)
+        Stock.objects.create(
+            ticker="FULL", company_name="Full Corp", exchange=exchange, sector=tech, industry=software,
+            country="USA", price=Decimal("12.30"), market_cap=Decimal("1500000.55"), dividend_yield=Decimal("1.5"),
+            price_to_book=Decimal("0.1234"), volume=10, prices_last_synced_at=timezone.now(),
+        )
+        Stock.objects.create(ticker="BARE", company_name="Bare Corp", exchange=exchange, country="USA")
+
+        for stock_model, serializer_class in [(Stock, StockSerializer), (AccessibleStock, AccessibleStockSerializer)]:
+            queryset = stock_model.objects.order_by("ticker")
+            row_serializer = ValuesRowSerializer(serializer_class)
+            fast = JSONRenderer().render(row_serializer.serialize(row_serializer.values(queryset)))
+            drf = JSONRenderer().render(serializer_class(queryset, many=True).data)
+            self.assertEqual(fast, drf)
+
+        rows = ValuesRowSerializer(StockSerializer).serialize(ValuesRowSerializer(StockSerializer).values(Stock.objects.order_by("ticker")))
+        self.assertNotIn("sector_name", rows[0])
+        self.assertEqual(rows[1]["sector_name"], "Technology")
+        self.assertEqual(rows[1]["dividend_yield"], "1.50")
+        self.assertEqual(rows[1]["price"], 12.3)
+
+    def test_field_subsets_reuse_the_cached_full_serializer(self):
+        full = get_row_serializer(StockSerializer)
+        subset = get_row_serializer(StockSerializer, ("ticker", "sector_name", "price"))
+        self.assertIs(get_row_serializer(StockSerializer), full)
+        self.assertEqual(subset.field_names, ["sector_name", "price", "ticker"])
+        self.assertEqual(subset.relations, ["sector"])
+        self.assertEqual(subset.table, [entry for entry in full.table if entry[0] in subset.field_names])
+        self.assertGreater(len(full.field_names), len(subset.field_names))
+
+        # Subsets slice the cached table instead of compiling (and caching) a serializer per field set.
+        with mock.patch.object(ValuesRowSerializer, "__init__", side_effect=AssertionError("recompiled")):
+            for size in range(1, len(full.field_names)):
+                get_row_serializer(StockSerializer, tuple(full.field_names[:size]))
+        self.assertIsNot(get_row_serializer(StockSerializer, ("ticker",)), get_row_serializer(StockSerializer, ("ticker",)))
+
+    def test_benchmark_command_reports_and_rolls_back(self):
+        out = io.StringIO()
+        call_command("benchmark_serializers", "--rows", "30", "--page-size", "10", "--repeat", "1", stdout=out)
+        self.assertIn("AccessibleStock (serialize only, 30 rows)", out.getvalue())
+        self.assertFalse(Stock.objects.exists())
@@ -14,5 +14,9 @@ urlpatterns = [
     path('filtered-stats/', views.filtered_stats, name='filtered-stats'),  # This creates /api/filtered-stats/
     path('stocks/sector-industry-counts/', views.sector_industry_counts, name='sector-industry-counts'),  # This creates /api/stocks/sector-industry-counts/
     path('sectors/<str:sector_name>/industries/', views.sector_industries, name='sector-industries'),  # This creates /api/sectors/{sector_name}/industries/
+    path('portfolio/optimize/', views.portfolio_optimize, name='portfolio-optimize'),  # This creates /api/portfolio/optimize/
+    path('portfolio/clusters/', views.portfolio_clusters, name='portfolio-clusters'),  # This creates /api/portfolio/clusters/
+    path('portfolio/factors/', views.portfolio_factors, name='portfolio-factors'),  # This creates /api/portfolio/factors/
+    path('funds/build/', views.fund_build, name='fund-build'),  # This creates /api/funds/build/
     path('', include(router.urls)),  # This creates /api/stocks/, /api/exchanges/, etc.
 ]
\ No newline at end of file
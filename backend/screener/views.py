@@ -4,10 +4,15 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from django_filters import rest_framework as django_filters
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
 from django.db.models import Q
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+
+import numpy as np
 
 from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.settings import api_settings
 from .models import (
     Exchange,
     Sector,
@@ -31,8 +36,21 @@ from .serializers import (
     AccessibleHistoricalPriceSerializer,
 )
 from rest_framework.decorators import api_view
-from django.db.models import Count, F, Sum, Max, Min
-from .pagination import CustomPageNumberPagination
+from django.db.models import Count, ExpressionWrapper, F, FloatField, Max, Min, Value
+from django.db.models.functions import Coalesce
+from .clustering import FEATURES as CLUSTER_FEATURES, MAX_CLUSTERS, MIN_CLUSTERS, cluster_universe
+from .downsampling import MIN_POINTS, RESOLUTIONS, downsample
+from .factors import FACTORS, MOMENTUM_WINDOWS
+from .funds import build_funds, parse_fund_request
+from .generation import bump_generation_on_commit
+from .optimizer import OBJECTIVES, optimize_universe
+from .pagination import CustomPageNumberPagination, KeysetPagination
+from .price_store import PriceSeries, align_series, grouped_history_rows, history_rows, series_from_rows, stored_series
+from .renderers import ArrowRenderer, ColumnarJSONRenderer
+from .response_cache import cached_payload, conditional_on_generation
+from .row_serializer import get_row_serializer
+from .snapshot import get_snapshot
+from .stats import compute_filtered_stats
 from decimal import Decimal
 
 
@@ -99,6 +117,18 @@ DATASET_FILTERSETS = {
     'accessible': AccessibleStockFilter,
 }
 
+# Upper bound on stocks per /stocks/history/batch/ request
+BATCH_HISTORY_LIMIT = 50
+
+# Largest universe /portfolio/optimize/ solves over (by market cap) and its default look-back
+OPTIMIZER_UNIVERSE_LIMIT = 200
+OPTIMIZER_DEFAULT_WINDOW_DAYS = 3 * 365
+
+# Largest universe /portfolio/clusters/ loads return histories for
+CLUSTER_RETURNS_UNIVERSE_LIMIT = 500
+# Largest page a factor screen returns
+FACTOR_SCREEN_LIMIT = 500
+
 
 def resolve_dataset_key(raw_key):
     """Normalize dataset key and fallback to classifier dataset."""
@@ -108,6 +138,10 @@ def resolve_dataset_key(raw_key):
     return normalized if normalized in DATASET_MODELS else 'classifier'
 
 
+def request_dataset_key(request):
+    return resolve_dataset_key(request.query_params.get('dataset'))
+
+
 class StockViewSet(viewsets.ModelViewSet):
     queryset = Stock.objects.none()
     serializer_class = StockSerializer
@@ -151,12 +185,90 @@ class StockViewSet(viewsets.ModelViewSet):
     def get_serializer_class(self):
         return self.get_dataset_serializers()['stock']
 
+    # Writes retire the dataset's snapshot, cached payloads and ETags like any other writer.
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        bump_generation_on_commit(self.get_dataset_key())
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        bump_generation_on_commit(self.get_dataset_key())
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        bump_generation_on_commit(self.get_dataset_key())
+
+    def uses_keyset_pagination(self):
+        return self.request is not None and self.request.query_params.get('pagination') == 'cursor'
+
+    @property
+    def paginator(self):
+        """Switch to keyset pagination when ``pagination=cursor`` is requested."""
+        if not hasattr(self, '_paginator'):
+            if self.uses_keyset_pagination():
+                self._paginator = KeysetPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def get_requested_fields(self):
+        """Serializer fields named in ``fields=`` (comma separated), or None for all of them."""
+        raw = self.request.query_params.get('fields') if self.request is not None else None
+        if not raw or self.request.method != 'GET':
+            return None
+        available = get_row_serializer(self.get_serializer_class()).field_names
+        requested = {name.strip() for name in raw.split(',')}
+        # Unknown names are ignored; if nothing valid is left the full row is returned.
+        fields = tuple(name for name in available if name in requested)
+        return fields or None
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fields = self.get_requested_fields()
+        if fields is not None:
+            target = getattr(serializer, 'child', serializer)
+            for name in list(target.fields):
+                if name not in fields:
+                    target.fields.pop(name)
+        return serializer
+
+    @conditional_on_generation('stocks', request_dataset_key)
+    def list(self, request, *args, **kwargs):
+        fields = self.get_requested_fields()
+        snapshot = None
+        if not self.uses_keyset_pagination():
+            snapshot = get_snapshot(self.get_dataset_key(), self.get_dataset_models(), self.get_serializer_class())
+        if snapshot is None:
+            row_serializer = get_row_serializer(self.get_serializer_class(), fields)
+            queryset = self.filter_queryset(self.get_queryset())
+            if self.uses_keyset_pagination():
+                # Keyset cursors read the ordering value from model instances.
+                ordering = [str(term).lstrip('-') for term in queryset.query.order_by]
+                page = self.paginate_queryset(row_serializer.only(queryset, *ordering))
+                return self.get_paginated_response(self.get_serializer(page, many=True).data)
+            # Build rows straight from .values(); output matches the serializer.
+            page = self.paginate_queryset(row_serializer.values(queryset))
+            return self.get_paginated_response(row_serializer.serialize(page))
+
+        page = self.paginate_queryset(snapshot.select_rows(request.query_params))
+        if fields is not None:
+            page = [{name: row[name] for name in fields if name in row} for row in page]
+        return self.get_paginated_response(page)
+
     @action(detail=False, methods=['get'])
     def filter_options(self, request):
         """Get all filter options with proper null handling"""
         # Get sector parameter for filtering industries
         sector_param = request.query_params.get('sector', None)
+        payload = cached_payload(
+            'filter_options',
+            self.get_dataset_key(),
+            {'sector': sector_param},
+            lambda: self._filter_options_payload(sector_param),
+        )
+        return Response(payload)
 
+    def _filter_options_payload(self, sector_param):
         stock_qs = self._base_queryset()
 
         exchanges = list(
@@ -193,7 +305,7 @@ class StockViewSet(viewsets.ModelViewSet):
             .order_by('country')
         )
 
-        return Response({
+        return {
             'exchanges': [
                 {
                     'id': row['exchange__id'],
@@ -218,9 +330,9 @@ class StockViewSet(viewsets.ModelViewSet):
                 for row in industries
             ],
             'countries': list(countries),  # This will now only include valid country names
-        })
+        }
 
-    def _get_stock_from_request(self, request):
+    def _get_stock_from_request(self, request, queryset=None):
         """Resolve a stock using ticker/full_ticker and optional exchange code."""
         ticker = request.query_params.get('ticker')
         exchange_code = request.query_params.get('exchange')
@@ -228,7 +340,8 @@ class StockViewSet(viewsets.ModelViewSet):
         if not ticker:
             raise ValidationError(detail='Query parameter "ticker" is required.')
 
-        queryset = self.get_queryset()
+        if queryset is None:
+            queryset = self.get_queryset()
         filters = {'ticker__iexact': ticker}
 
         if exchange_code:
@@ -252,24 +365,11 @@ class StockViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], url_path='profile')
     def profile(self, request):
         """Return enriched stock profile data for screener modal."""
-        stock = self._get_stock_from_request(request)
+        stock = self._get_stock_from_request(request, self.get_queryset().select_related('history_summary'))
 
         serializer_class = self.get_dataset_serializers()['stock']
         serializer = serializer_class(stock, context={'request': request})
 
-        # Prefetch the latest historical prices for quick metrics
-        history_qs = stock.historical_prices.order_by('-date')
-        latest_entries = list(history_qs[:2])
-        latest = latest_entries[0] if latest_entries else None
-        previous = latest_entries[1] if len(latest_entries) > 1 else None
-
-        history_span = stock.historical_prices.aggregate(
-            first_date=Min('date'),
-            last_date=Max('date'),
-            high_close=Max('close_price'),
-            low_close=Min('close_price'),
-        )
-
         def _dec_to_float(value):
             if value is None:
                 return None
@@ -277,24 +377,64 @@ class StockViewSet(viewsets.ModelViewSet):
                 return float(value)
             return value
 
-        latest_payload = None
-        if latest:
+        try:
+            summary = stock.history_summary
+        except ObjectDoesNotExist:
+            summary = None
+
+        if summary is not None:
+            # Maintained by the price sync; no history rows are read.
             latest_payload = {
-                'date': latest.date,
-                'close_price': _dec_to_float(latest.close_price),
-                'open_price': _dec_to_float(latest.open_price),
-                'high_price': _dec_to_float(latest.high_price),
-                'low_price': _dec_to_float(latest.low_price),
-                'adjusted_close': _dec_to_float(latest.adjusted_close),
-                'volume': latest.volume,
+                'date': summary.last_date,
+                'close_price': _dec_to_float(summary.latest_close),
+                'open_price': _dec_to_float(summary.latest_open),
+                'high_price': _dec_to_float(summary.latest_high),
+                'low_price': _dec_to_float(summary.latest_low),
+                'adjusted_close': _dec_to_float(summary.latest_adjusted_close),
+                'volume': summary.latest_volume,
             }
+            latest_close = summary.latest_close
+            previous_close = summary.previous_close
+            history_span = {
+                'first_date': summary.first_date,
+                'last_date': summary.last_date,
+                'high_close': summary.high_close,
+                'low_close': summary.low_close,
+            }
+        else:
+            # Prefetch the latest historical prices for quick metrics
+            history_qs = stock.historical_prices.order_by('-date')
+            latest_entries = list(history_qs[:2])
+            latest = latest_entries[0] if latest_entries else None
+            previous = latest_entries[1] if len(latest_entries) > 1 else None
+
+            history_span = stock.historical_prices.aggregate(
+                first_date=Min('date'),
+                last_date=Max('date'),
+                high_close=Max('close_price'),
+                low_close=Min('close_price'),
+            )
+
+            latest_payload = None
+            if latest:
+                latest_payload = {
+                    'date': latest.date,
+                    'close_price': _dec_to_float(latest.close_price),
+                    'open_price': _dec_to_float(latest.open_price),
+                    'high_price': _dec_to_float(latest.high_price),
+                    'low_price': _dec_to_float(latest.low_price),
+                    'adjusted_close': _dec_to_float(latest.adjusted_close),
+                    'volume': latest.volume,
+                }
+            latest_close = latest.close_price if latest else None
+            previous_close = previous.close_price if previous else None
 
         change = None
         change_percent = None
-        if latest and previous and latest.close_price is not None and previous.close_price is not None:
-            change = _dec_to_float(latest.close_price - previous.close_price)
-            if previous.close_price != 0:
-                change_percent = float((latest.close_price - previous.close_price) / previous.close_price * 100)
+        if latest_close is not None and previous_close is not None:
+            change = _dec_to_float(latest_close - previous_close)
+            if previous_close != 0:
+                change_percent = float((latest_close - previous_close) / previous_close * 100)
 
         response_payload = {
             'stock': serializer.data,
@@ -316,27 +456,12 @@ class StockViewSet(viewsets.ModelViewSet):
 
         return Response(response_payload)
 
-    @action(detail=False, methods=['get'], url_path='history')
-    def history(self, request):
-        """Return historical price series for a given stock."""
-        stock = self._get_stock_from_request(request)
-
+    @staticmethod
+    def _history_bounds(request, latest_date):
+        """Parse ``start``/``end``/``window`` into a date range ending at ``latest_date`` by default."""
         start_param = request.query_params.get('start')
         end_param = request.query_params.get('end')
         window_param = request.query_params.get('window')
-        limit_param = request.query_params.get('limit')
-
-        history_qs = stock.historical_prices.order_by('date')
-
-        # Determine end date fallback as latest available point
-        latest_date = history_qs.values_list('date', flat=True).last()
-        if not latest_date:
-            return Response({
-                'stock': stock.ticker,
-                'exchange': stock.exchange.code if stock.exchange else None,
-                'results': [],
-                'count': 0,
-            })
 
         # Parse end date
         try:
@@ -354,43 +479,209 @@ class StockViewSet(viewsets.ModelViewSet):
         elif window_param and window_param.lower() != 'max':
             try:
                 window_days = int(window_param)
-                start_date = end_date - timedelta(days=window_days)
             except ValueError:
                 raise ValidationError(detail='Invalid window parameter. Provide number of days or "max".')
+            if end_date:
+                start_date = end_date - timedelta(days=window_days)
 
-        if start_date:
-            history_qs = history_qs.filter(date__gte=start_date)
-
-        history_qs = history_qs.filter(date__lte=end_date)
+        return start_date, end_date
 
-        data = list(history_qs)
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path='history',
+        renderer_classes=[*api_settings.DEFAULT_RENDERER_CLASSES, ColumnarJSONRenderer, ArrowRenderer],
+    )
+    @conditional_on_generation('history', request_dataset_key)
+    def history(self, request):
+        """Return historical price series for a given stock."""
+        stock = self._get_stock_from_request(request)
 
+        limit_param = request.query_params.get('limit')
+        limit = None
         if limit_param:
             try:
                 limit = int(limit_param)
-                if limit > 0 and len(data) > limit:
-                    data = data[-limit:]
             except ValueError:
                 raise ValidationError(detail='Invalid limit parameter. Must be an integer.')
 
-        history_serializer_class = self.get_dataset_serializers()['historical']
-        serializer = history_serializer_class(data, many=True)
+        resolution = request.query_params.get('resolution', 'daily').lower()
+        if resolution not in RESOLUTIONS:
+            raise ValidationError(detail=f'Invalid resolution parameter. Expected one of: {", ".join(RESOLUTIONS)}.')
+        points = None
+        points_param = request.query_params.get('points')
+        if points_param:
+            try:
+                points = int(points_param)
+            except ValueError:
+                raise ValidationError(detail='Invalid points parameter. Must be an integer.')
+            if points < MIN_POINTS:
+                raise ValidationError(detail=f'Invalid points parameter. Must be at least {MIN_POINTS}.')
+
+        history_qs = stock.historical_prices.order_by('date')
+        dataset_key = self.get_dataset_key()
+        series = stored_series(dataset_key, stock.pk)
+
+        # Determine end date fallback as latest available point
+        if series is not None:
+            latest_date = series.last_date
+        else:
+            latest_date = history_qs.values_list('date', flat=True).last()
+        if not latest_date:
+            # Column renderers get an empty series so the schema matches a non-empty response.
+            renders_series = getattr(request.accepted_renderer, 'renders_series', False)
+            return Response({
+                'stock': stock.ticker,
+                'exchange': stock.exchange.code if stock.exchange else None,
+                'results': PriceSeries.empty() if renders_series else [],
+                'count': 0,
+            })
+
+        start_date, end_date = self._history_bounds(request, latest_date)
+
+        def load_window():
+            if series is not None:
+                # Zero-copy slice of the memory-mapped price store
+                window = series.window(start_date, end_date)
+            else:
+                window_qs = history_qs.filter(date__gte=start_date) if start_date else history_qs
+                window = series_from_rows(history_rows(window_qs.filter(date__lte=end_date)))
+            if limit and limit > 0:
+                window = window.tail(limit)
+            return window
+
+        if resolution != 'daily' or points:
+            # Downsampled series are reused until the dataset generation changes.
+            cache_params = {
+                'stock': stock.pk,
+                'start': start_date.isoformat() if start_date else None,
+                'end': end_date.isoformat(),
+                'limit': limit,
+                'resolution': resolution,
+                'points': points,
+            }
+            series = cached_payload(
+                'history_downsampled',
+                dataset_key,
+                cache_params,
+                lambda: downsample(load_window(), resolution, points),
+            )
+        else:
+            series = load_window()
 
+        # Column renderers (?format=columnar / arrow) encode the arrays directly.
+        renders_series = getattr(request.accepted_renderer, 'renders_series', False)
         response = {
             'stock': stock.ticker,
             'exchange': stock.exchange.code if stock.exchange else None,
-            'count': len(serializer.data),
-            'results': serializer.data,
+            'count': len(series),
+            'results': series if renders_series else series.to_records(),
         }
 
-        if serializer.data:
+        if len(series):
             response['range'] = {
-                'start': serializer.data[0]['date'],
-                'end': serializer.data[-1]['date'],
+                'start': series.first_date.isoformat(),
+                'end': series.last_date.isoformat(),
             }
 
         return Response(response)
 
+    def _get_stocks_from_request(self, request):
+        """Resolve ``tickers`` (ticker or full_ticker) and ``ids`` lists in one query, keeping request order."""
+        tickers = [value.strip() for value in request.query_params.get('tickers', '').split(',') if value.strip()]
+        try:
+            ids = [int(value) for value in request.query_params.get('ids', '').split(',') if value.strip()]
+        except ValueError:
+            raise ValidationError(detail='Invalid ids parameter. Provide comma-separated stock IDs.')
+        if not tickers and not ids:
+            raise ValidationError(detail='Query parameter "tickers" or "ids" is required.')
+        if len(tickers) + len(ids) > BATCH_HISTORY_LIMIT:
+            raise ValidationError(detail=f'At most {BATCH_HISTORY_LIMIT} stocks can be requested at once.')
+
+        lookup = Q(pk__in=ids)
+        for ticker in tickers:
+            lookup |= Q(ticker__iexact=ticker) | Q(full_ticker__iexact=ticker)
+        candidates = list(self.get_queryset().filter(lookup).order_by('pk'))
+
+        by_id = {stock.pk: stock for stock in candidates}
+        by_ticker, by_full_ticker = {}, {}
+        for stock in candidates:
+            by_ticker.setdefault(stock.ticker.upper(), stock)
+            if stock.full_ticker:
+                by_full_ticker.setdefault(stock.full_ticker.upper(), stock)
+
+        stocks, missing = {}, []
+        for ticker in tickers:
+            stock = by_ticker.get(ticker.upper()) or by_full_ticker.get(ticker.upper())
+            if stock is None:
+                missing.append(ticker)
+            else:
+                stocks.setdefault(stock.pk, stock)
+        for stock_id in ids:
+            if stock_id in by_id:
+                stocks.setdefault(stock_id, by_id[stock_id])
+            else:
+                missing.append(stock_id)
+        return list(stocks.values()), missing
+
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path='history/batch',
+        renderer_classes=[*api_settings.DEFAULT_RENDERER_CLASSES, ArrowRenderer],
+    )
+    @conditional_on_generation('history_batch', request_dataset_key)
+    def history_batch(self, request):
+        """Return price series for several stocks aligned on one date axis."""
+        stocks, missing = self._get_stocks_from_request(request)
+        dataset_key = self.get_dataset_key()
+        history_model = self.get_dataset_models()['stock']._meta.get_field('historical_prices').related_model
+
+        stored = {stock.pk: stored_series(dataset_key, stock.pk) for stock in stocks}
+        pending = [stock_id for stock_id, series in stored.items() if series is None]
+
+        # Only a relative window needs the latest date before loading anything.
+        latest_date = None
+        params = request.query_params
+        if params.get('window', 'max').lower() != 'max' and not params.get('start') and not params.get('end'):
+            latest_dates = [series.last_date for series in stored.values() if series is not None and len(series)]
+            if pending:
+                latest_dates.append(history_model.objects.filter(stock_id__in=pending).aggregate(latest=Max('date'))['latest'])
+            latest_date = max((value for value in latest_dates if value), default=None)
+        start_date, end_date = self._history_bounds(request, latest_date)
+
+        grouped = grouped_history_rows(history_model, pending, start_date, end_date) if pending else {}
+        series_list = [
+            stored[stock.pk].window(start_date, end_date) if stored[stock.pk] is not None
+            else series_from_rows(grouped[stock.pk])
+            for stock in stocks
+        ]
+        dates, aligned = align_series(series_list)
+
+        entries = [
+            {
+                'id': stock.pk,
+                'ticker': stock.ticker,
+                'exchange': stock.exchange.code if stock.exchange else None,
+            }
+            for stock in stocks
+        ]
+        response = {'count': len(dates), 'missing': missing}
+        if len(dates):
+            response['range'] = {
+                'start': dates[0].astype(date).isoformat(),
+                'end': dates[-1].astype(date).isoformat(),
+            }
+        if getattr(request.accepted_renderer, 'renders_series', False):
+            response['results'] = [{**entry, 'series': series} for entry, series in zip(entries, aligned)]
+        else:
+            response['dates'] = np.datetime_as_string(dates, unit='D').tolist()
+            response['results'] = [
+                {**entry, **series.to_columns(include_dates=False)}
+                for entry, series in zip(entries, aligned)
+            ]
+        return Response(response)
+
 
 class ExchangeViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Exchange.objects.all()
@@ -411,10 +702,17 @@ class IndustryViewSet(viewsets.ReadOnlyModelViewSet):
 def sector_industry_counts(request):
     """Get aggregated counts by sector and industry using industry-linked sectors."""
     dataset_key = resolve_dataset_key(request.GET.get('dataset'))
-    models_bundle = DATASET_MODELS[dataset_key]
-    stock_model = models_bundle['stock']
     exchange = request.GET.get('exchange')
+    return Response(cached_payload(
+        'sector_industry_counts',
+        dataset_key,
+        {'exchange': exchange},
+        lambda: _sector_industry_counts_payload(dataset_key, exchange),
+    ))
 
+
+def _sector_industry_counts_payload(dataset_key, exchange):
+    stock_model = DATASET_MODELS[dataset_key]['stock']
     queryset = stock_model.objects.select_related('industry__sector', 'industry')
     if exchange:
         queryset = queryset.filter(exchange__code=exchange)
@@ -459,13 +757,17 @@ def sector_industry_counts(request):
     result = list(sectors_data.values())
     result.sort(key=lambda x: x['total_companies'], reverse=True)
 
-    return Response(result)
+    return result
 
 
 @api_view(['GET'])
 def database_stats(request):
     """Get database statistics"""
     dataset_key = resolve_dataset_key(request.GET.get('dataset'))
+    return Response(cached_payload('database_stats', dataset_key, {}, lambda: _database_stats_payload(dataset_key)))
+
+
+def _database_stats_payload(dataset_key):
     models_bundle = DATASET_MODELS[dataset_key]
     exchange_model = models_bundle['exchange']
     sector_model = models_bundle['sector']
@@ -486,7 +788,7 @@ def database_stats(request):
     stocks_with_price = stock_model.objects.filter(price__isnull=False).count()
     stocks_with_market_cap = stock_model.objects.filter(market_cap__isnull=False).count()
 
-    return Response({
+    return {
         'exchanges': exchanges_count,
         'sectors': sectors_count,
         'industries': industries_count,
@@ -494,7 +796,7 @@ def database_stats(request):
         'countries': countries_count,
         'stocks_with_price': stocks_with_price,
         'stocks_with_market_cap': stocks_with_market_cap
-    })
+    }
 
 
 def apply_stock_filters(queryset, params):
@@ -524,6 +826,7 @@ def apply_stock_filters(queryset, params):
 
 
 @api_view(['GET'])
+@conditional_on_generation('filtered_stats', request_dataset_key)
 def filtered_stats(request):
     """Get statistics for filtered data"""
     dataset_key = resolve_dataset_key(request.GET.get('dataset'))
@@ -554,138 +857,43 @@ def filtered_stats(request):
     market_cap_max = request.GET.get('market_cap_max', None)
 
     params = dict(request.GET.items())
-    sector_filter_applied = bool(params.get('sector'))
     resolved_sector = sector
     resolved_industry = industry
 
-    if industry:
-        industry_obj = (
-            industry_model.objects.select_related('sector')
-            .filter(name__iexact=industry)
-            .first()
-        )
-        if industry_obj:
-            resolved_industry = industry_obj.name
-            if industry_obj.sector:
-                resolved_sector = industry_obj.sector.name
-            params['industry'] = industry_obj.name
-            if 'sector' in params:
-                params.pop('sector', None)
-                sector_filter_applied = False
-    if sector_filter_applied:
-        sector_for_breakdown = resolved_sector
-    else:
-        sector_for_breakdown = None
+    snapshot = get_snapshot(dataset_key, models_bundle, DATASET_SERIALIZERS[dataset_key]['stock'])
 
+    if industry:
+        if snapshot is not None:
+            industry_match = snapshot.resolve_industry(industry)
+        else:
+            industry_obj = (
+                industry_model.objects.select_related('sector')
+                .filter(name__iexact=industry)
+                .first()
+            )
+            industry_match = (
+                (industry_obj.name, industry_obj.sector.name if industry_obj.sector else None)
+                if industry_obj else None
+            )
+        if industry_match:
+            resolved_industry, industry_sector = industry_match
+            if industry_sector:
+                resolved_sector = industry_sector
+            params['industry'] = resolved_industry
+            params.pop('sector', None)
     sector = resolved_sector
     industry = resolved_industry
 
-    # Apply filters using helper function
-    queryset = apply_stock_filters(queryset, params)
-
-    # Calculate aggregated statistics
-    total_companies = queryset.count()
-
-    # Count unique sectors and industries
-    unique_sectors = queryset.exclude(
-        Q(industry__isnull=True) | Q(industry__sector__isnull=True)
-    ).values('industry__sector__name').distinct().count()
-
-    unique_industries = queryset.exclude(
-        Q(industry__isnull=True) | Q(industry__sector__isnull=True)
-    ).values('industry__name').distinct().count()
-
-    unique_exchanges = queryset.exclude(
-        Q(exchange__isnull=True)
-    ).values('exchange__name').distinct().count()
-
-    # Calculate total market cap (only for stocks with market cap data)
-    market_cap_sum = queryset.exclude(
-        Q(market_cap__isnull=True)
-    ).aggregate(total_market_cap=Sum('market_cap'))['total_market_cap'] or 0
-
-    # Get sector breakdown
-    raw_sector_breakdown = list(
-        queryset.exclude(
-            Q(industry__isnull=True) | Q(industry__sector__isnull=True)
-        )
-        .values('industry__sector__name')
-        .annotate(count=Count('id'))
-        .order_by('-count')[:10]
-    )
-    sector_breakdown = [
-        {'sector__name': row['industry__sector__name'], 'count': row['count']}
-        for row in raw_sector_breakdown
-    ]
-
-    # Get industry breakdown
-    if sector_for_breakdown:
-        # When filtering by sector, we want industries within that specific sector
-        # Use a single efficient query that groups by industry within the current queryset
-        raw_industry_breakdown = list(
-            queryset.exclude(Q(industry__isnull=True) | Q(industry__sector__isnull=True))
-            .values('industry__name', 'industry__sector__name')
-            .annotate(
-                count=Count('id'),
-                total_market_cap=Sum('market_cap'),
-            )
-            .order_by('-count')
-        )
-        industry_breakdown = [
-            {
-                'industry__name': row['industry__name'],
-                'sector__name': row['industry__sector__name'],
-                'count': row['count'],
-                'total_market_cap': row['total_market_cap'],
-            }
-            for row in raw_industry_breakdown
-        ]
+    if snapshot is not None:
+        mask = snapshot.filter_mask(params, exact_classification=True)
+        response_data = snapshot.stats(mask)
     else:
-        # When not filtering by sector, group by industry name only
-        raw_industry_breakdown = list(
-            queryset.exclude(Q(industry__isnull=True) | Q(industry__sector__isnull=True))
-            .values('industry__name', 'industry__sector__name')
-            .annotate(
-                count=Count('id'),
-                total_market_cap=Sum('market_cap'),
-            )
-            .order_by('-count')
-        )
-        industry_breakdown = [
-            {
-                'industry__name': row['industry__name'],
-                'sector__name': row['industry__sector__name'],
-                'count': row['count'],
-                'total_market_cap': row['total_market_cap'],
-            }
-            for row in raw_industry_breakdown
-        ]
+        # Apply filters using helper function
+        queryset = apply_stock_filters(queryset, params)
 
-    # Get exchange breakdown
-    exchange_breakdown = list(queryset.exclude(
-        Q(exchange__isnull=True)
-    ).values('exchange__name').annotate(
-        count=Count('id')
-    ).order_by('-count'))
-
-    # Get country breakdown
-    country_breakdown = list(queryset.exclude(
-        Q(country__isnull=True) | Q(country__exact='') | Q(country__iexact='Unknown')
-    ).values('country').annotate(
-        count=Count('id')
-    ).order_by('-count'))
-
-    # Prepare response data
-    response_data = {
-        'total_companies': total_companies,
-        'unique_sectors': unique_sectors,
-        'unique_industries': unique_industries,
-        'unique_exchanges': unique_exchanges,
-        'total_market_cap': float(market_cap_sum),
-        'sector_breakdown': sector_breakdown,
-        'industry_breakdown': industry_breakdown,
-        'exchange_breakdown': exchange_breakdown,
-        'country_breakdown': country_breakdown,
+        # Calculate every total and breakdown in a single pass over the filtered rows
+        response_data = compute_filtered_stats(queryset)
+    response_data.update({
         'applied_filters': {
             'exchange': exchange,
             'sector': resolved_sector,
@@ -695,10 +903,18 @@ def filtered_stats(request):
             'price_range': [price_min, price_max] if price_min or price_max else None,
             'market_cap_range': [market_cap_min, market_cap_max] if market_cap_min or market_cap_max else None,
         }
-    }
+    })
 
     # Include companies data if requested
-    if include_companies:
+    if include_companies and snapshot is not None:
+        limit = None
+        if page_size:
+            try:
+                limit = min(int(page_size), 10000)
+            except (ValueError, TypeError):
+                pass  # Ignore invalid page_size values
+        response_data['companies'] = snapshot.company_rows(mask, limit)
+    elif include_companies:
         companies_queryset = queryset
 
         # Apply pagination if page_size is specified, otherwise return all
@@ -761,3 +977,295 @@ def sector_industries(request, sector_name):
         return Response({
             'error': f'Sector "{sector_name}" not found'
         }, status=404)
+
+
+def _percent_param(params, name, default, low=None, high=None):
+    """Parse a percentage query parameter into a fraction."""
+    raw = params.get(name)
+    if raw in (None, ''):
+        return default
+    try:
+        value = float(raw)
+    except ValueError:
+        raise ValidationError(detail=f'Invalid {name} parameter. Must be a number (percent).')
+    if (low is not None and value < low) or (high is not None and value > high):
+        raise ValidationError(detail=f'Invalid {name} parameter. Must be between {low} and {high}.')
+    return value / 100
+
+
+def _default_history_window(request):
+    """``start``/``end``/``window`` bounds, defaulting to the trailing optimizer window ending today."""
+    start_date, end_date = StockViewSet._history_bounds(request, date.today())
+    if not request.GET.get('start') and not request.GET.get('window'):
+        start_date = end_date - timedelta(days=OPTIMIZER_DEFAULT_WINDOW_DAYS)
+    return start_date, end_date
+
+
+def _history_window_params(request):
+    """The resolved window, so ETags move with a default window that follows the calendar."""
+    return [value.isoformat() for value in _default_history_window(request)]
+
+
+def _cluster_window_params(request):
+    """Return features read the default window; plain fundamentals do not."""
+    if request.GET.get('returns', '').lower() != 'true':
+        return None
+    return _history_window_params(request)
+
+
+def _universe_queryset(stock_model, params, tickers):
+    """Stocks matching the exchange/sector/industry/country filters and, if given, ``tickers``."""
+    queryset = apply_stock_filters(stock_model.objects.all(), {key: params.get(key) for key in ('exchange', 'sector', 'industry', 'country')})
+    if tickers:
+        lookup = Q()
+        for ticker in tickers:
+            lookup |= Q(ticker__iexact=ticker) | Q(full_ticker__iexact=ticker)
+        queryset = queryset.filter(lookup)
+    return queryset
+
+
+@api_view(['GET'])
+@conditional_on_generation('portfolio_optimize', request_dataset_key, _history_window_params)
+def portfolio_optimize(request):
+    """Long-only mean-variance weights over a sector, industry or ticker universe."""
+    dataset_key = resolve_dataset_key(request.GET.get('dataset'))
+    stock_model = DATASET_MODELS[dataset_key]['stock']
+    params = request.GET
+
+    tickers = [value.strip() for value in params.get('tickers', '').split(',') if value.strip()]
+    if not tickers and not params.get('sector') and not params.get('industry'):
+        raise ValidationError(detail='Provide a "sector", "industry" or "tickers" universe.')
+    objective = params.get('objective', 'max_sharpe').lower()
+    if objective not in OBJECTIVES:
+        raise ValidationError(detail=f'Invalid objective parameter. Expected one of: {", ".join(OBJECTIVES)}.')
+    options = {
+        'objective': objective,
+        'risk_free_rate': _percent_param(params, 'risk_free_rate', 0.045, 0, 10),
+        'min_weight': _percent_param(params, 'min_weight', 0.0, 0, 100),
+        'max_weight': _percent_param(params, 'max_weight', 1.0, 0, 100),
+    }
+    if objective == 'target_return':
+        options['target_return'] = _percent_param(params, 'target_return', 0.12)
+    elif objective == 'multi_objective':
+        return_weight = _percent_param(params, 'return_weight', 0.6, 0, 100)
+        risk_weight = _percent_param(params, 'risk_weight', 0.4, 0, 100)
+        if return_weight + risk_weight <= 0:
+            raise ValidationError(detail='return_weight and risk_weight cannot both be zero.')
+        options['return_weight'] = return_weight / (return_weight + risk_weight)
+        options['risk_weight'] = risk_weight / (return_weight + risk_weight)
+
+    start_date, end_date = _default_history_window(request)
+
+    queryset = _universe_queryset(stock_model, params, tickers)
+    universe = list(
+        queryset.order_by(F('market_cap').desc(nulls_last=True), 'pk')
+        .values_list('pk', 'ticker')[:OPTIMIZER_UNIVERSE_LIMIT]
+    )
+    if not universe:
+        raise NotFound(detail='No stocks match the requested universe.')
+
+    try:
+        result, inputs = optimize_universe(dataset_key, [pk for pk, _ in universe], start_date, end_date, **options)
+    except ValueError as exc:
+        raise ValidationError(detail=str(exc))
+
+    tickers_by_id = dict(universe)
+    holdings = sorted(
+        (
+            {'id': stock_id, 'ticker': tickers_by_id[stock_id], 'weight': round(float(weight), 6)}
+            for stock_id, weight in zip(inputs['stock_ids'], result.weights)
+            if weight > 1e-6
+        ),
+        key=lambda holding: (-holding['weight'], holding['ticker']),
+    )
+    first, last = inputs['dates']
+    return Response({
+        'objective': objective,
+        'weights': holdings,
+        'expected_return': result.expected_return,
+        'volatility': result.volatility,
+        'sharpe_ratio': result.sharpe_ratio,
+        'risk_free_rate': options['risk_free_rate'],
+        'universe_size': len(universe),
+        'missing': [tickers_by_id[stock_id] for stock_id in inputs['missing']],
+        'observations': inputs['observations'],
+        'range': {'start': first.astype(date).isoformat(), 'end': last.astype(date).isoformat()},
+        'shrinkage': inputs['shrinkage'],
+        'iterations': result.iterations,
+        'converged': result.converged,
+    })
+
+
+@api_view(['GET'])
+@conditional_on_generation('portfolio_clusters', request_dataset_key, _cluster_window_params)
+def portfolio_clusters(request):
+    """K-Means clusters of the universe's stocks by fundamentals (and optionally co-movement)."""
+    dataset_key = resolve_dataset_key(request.GET.get('dataset'))
+    stock_model = DATASET_MODELS[dataset_key]['stock']
+    params = request.GET
+
+    try:
+        k = int(params.get('k', 8))
+        seed = int(params.get('seed', 0))
+    except ValueError:
+        raise ValidationError(detail='Invalid k or seed parameter. Must be an integer.')
+    if not MIN_CLUSTERS <= k <= MAX_CLUSTERS:
+        raise ValidationError(detail=f'Invalid k parameter. Must be between {MIN_CLUSTERS} and {MAX_CLUSTERS}.')
+    features = tuple(value.strip() for value in params.get('features', '').split(',') if value.strip()) or CLUSTER_FEATURES
+    unknown = [name for name in features if name not in CLUSTER_FEATURES]
+    if unknown:
+        raise ValidationError(detail=f'Unknown features: {", ".join(unknown)}. Expected any of: {", ".join(CLUSTER_FEATURES)}.')
+    include_returns = params.get('returns', '').lower() == 'true'
+
+    tickers = [value.strip() for value in params.get('tickers', '').split(',') if value.strip()]
+    queryset = _universe_queryset(stock_model, params, tickers)
+    stocks = list(queryset.order_by('pk').values_list('pk', 'ticker', 'company_name', 'market_cap', *features))
+    start_date = end_date = None
+    if include_returns:
+        if len(stocks) > CLUSTER_RETURNS_UNIVERSE_LIMIT:
+            raise ValidationError(detail=f'Return features are limited to universes of {CLUSTER_RETURNS_UNIVERSE_LIMIT} stocks.')
+        start_date, end_date = _default_history_window(request)
+
+    try:
+        result = cluster_universe(
+            dataset_key, [(row[0], *row[4:]) for row in stocks], k, features, include_returns, start_date, end_date, seed,
+        )
+    except ValueError as exc:
+        raise ValidationError(detail=str(exc))
+
+    by_id = {row[0]: row for row in stocks}
+    members_by_label = [[] for _ in range(k)]
+    for stock_id, label in zip(result.stock_ids, result.labels.tolist()):
+        members_by_label[label].append(by_id[stock_id])
+    clusters = []
+    for label, members in enumerate(members_by_label):
+        members.sort(key=lambda row: (row[3] is None, -(row[3] or 0), row[1]))
+        caps = [float(row[3]) for row in members if row[3] is not None]
+        median = {}
+        for index, name in enumerate(features, start=4):
+            values = [float(row[index]) for row in members if row[index] is not None]
+            median[name] = float(np.median(values)) if values else None
+        clusters.append({
+            'cluster': label,
+            'size': len(members),
+            'average_market_cap': sum(caps) / len(caps) if caps else None,
+            'median': median,
+            'members': [
+                {
+                    'id': row[0],
+                    'ticker': row[1],
+                    'company_name': row[2],
+                    'market_cap': float(row[3]) if row[3] is not None else None,
+                }
+                for row in members
+            ],
+        })
+
+    return Response({
+        'k': k,
+        'features': list(result.features),
+        'inertia': result.inertia,
+        'count': len(result.stock_ids),
+        'excluded': len(result.excluded),
+        'clusters': clusters,
+    })
+
+
+@api_view(['GET'])
+@conditional_on_generation('portfolio_factors', request_dataset_key)
+def portfolio_factors(request):
+    """Stocks ranked by precomputed sector-relative factor percentiles.
+
+    ``primary`` orders the screen; with ``secondary`` the order is the
+    ``primary_weight`` blend of both ranks. ``min_<factor>_rank`` thresholds
+    filter on the indexed rank columns.
+    """
+    dataset_key = resolve_dataset_key(request.GET.get('dataset'))
+    stock_model = DATASET_MODELS[dataset_key]['stock']
+    params = request.GET
+
+    primary = params.get('primary', 'value').lower()
+    secondary = params.get('secondary', '').lower() or None
+    for name, factor in (('primary', primary), ('secondary', secondary)):
+        if factor is not None and factor not in FACTORS:
+            raise ValidationError(detail=f'Invalid {name} parameter. Expected one of: {", ".join(FACTORS)}.')
+    if secondary == primary:
+        raise ValidationError(detail='primary and secondary must be different factors.')
+    primary_weight = _percent_param(params, 'primary_weight', 0.7, 0, 100) if secondary else 1.0
+    try:
+        limit = int(params.get('limit', 50))
+    except ValueError:
+        raise ValidationError(detail='Invalid limit parameter. Must be an integer.')
+    if not 1 <= limit <= FACTOR_SCREEN_LIMIT:
+        raise ValidationError(detail=f'Invalid limit parameter. Must be between 1 and {FACTOR_SCREEN_LIMIT}.')
+
+    tickers = [value.strip() for value in params.get('tickers', '').split(',') if value.strip()]
+    queryset = _universe_queryset(stock_model, params, tickers).filter(**{f'factor_scores__{primary}_rank__isnull': False})
+    for factor in FACTORS:
+        threshold = _percent_param(params, f'min_{factor}_rank', None, 0, 100)
+        if threshold is not None:
+            queryset = queryset.filter(**{f'factor_scores__{factor}_rank__gte': threshold * 100})
+
+    if secondary:
+        # Stocks without a secondary rank count as the sector median.
+        combined = (
+            F(f'factor_scores__{primary}_rank') * primary_weight
+            + Coalesce(F(f'factor_scores__{secondary}_rank'), Value(50.0)) * (1 - primary_weight)
+        )
+    else:
+        combined = F(f'factor_scores__{primary}_rank')
+    queryset = queryset.annotate(combined_rank=ExpressionWrapper(combined, output_field=FloatField()))
+
+    score_fields = [f'factor_scores__{factor}_{part}' for factor in FACTORS for part in ('score', 'rank')]
+    momentum_fields = [f'factor_scores__{name}' for name in MOMENTUM_WINDOWS]
+    rows = list(
+        queryset.order_by(F('combined_rank').desc(), 'ticker')
+        .values_list('pk', 'ticker', 'company_name', 'sector__name', 'market_cap', 'combined_rank', *score_fields, *momentum_fields)[:limit]
+    )
+
+    results = []
+    for row in rows:
+        scores = row[6:6 + len(score_fields)]
+        results.append({
+            'id': row[0],
+            'ticker': row[1],
+            'company_name': row[2],
+            'sector': row[3],
+            'market_cap': float(row[4]) if row[4] is not None else None,
+            'combined_rank': row[5],
+            'factors': {
+                factor: {'score': scores[2 * index], 'rank': scores[2 * index + 1]}
+                for index, factor in enumerate(FACTORS)
+            },
+            'momentum': dict(zip(MOMENTUM_WINDOWS, row[6 + len(score_fields):])),
+        })
+
+    return Response({
+        'primary': primary,
+        'secondary': secondary,
+        'primary_weight': primary_weight,
+        'count': len(results),
+        'results': results,
+    })
+
+
+@api_view(['POST'])
+def fund_build(request):
+    """Build and simulate every selected fund strategy over one shared universe.
+
+    The body is the fund parameters page's payload; see ``parse_fund_request``.
+    """
+    data = request.data
+    dataset_key = resolve_dataset_key((data.get('dataset') if isinstance(data, dict) else None) or request.GET.get('dataset'))
+    stock_model = DATASET_MODELS[dataset_key]['stock']
+    try:
+        spec = parse_fund_request(data)
+        payload = build_funds(
+            dataset_key,
+            spec,
+            _universe_queryset(stock_model, spec['universe'], []),
+            workers=settings.FUND_BUILD_WORKERS,
+        )
+    except ValueError as exc:
+        raise ValidationError(detail=str(exc))
+    return Response({'dataset': dataset_key, **payload})
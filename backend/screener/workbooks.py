@@ -0,0 +1,110 @@
+"""Streaming reader and conversion cache for the ticker workbooks.
+
+``read_ticker_sheet`` walks the first worksheet once with openpyxl in
+read-only mode, finds the header row while streaming and collects the data
+rows below it. Cells are converted to strings (``None`` when blank) so the
+frame round-trips through Parquet unchanged; ``load_ticker_sheet`` keeps that
+Parquet copy keyed by a hash of the workbook bytes, so re-importing an
+unchanged file skips Excel parsing entirely.
+"""
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+from openpyxl import load_workbook
+
+HEADER_TOKEN = 'ticker'
+
+
+def _cell_text(value):
+    if value is None:
+        return None
+    if isinstance(value, float):
+        if value != value:  # NaN
+            return None
+        if value.is_integer():
+            # pandas.read_excel reports whole-number floats as ints.
+            return str(int(value))
+    if isinstance(value, str) and not value.strip():
+        return None
+    return str(value)
+
+
+def _header_names(cells):
+    """Name columns the way pandas.read_excel does: 'Unnamed: n' and '.1' suffixes."""
+    names = []
+    seen = {}
+    for index, cell in enumerate(cells):
+        name = f'Unnamed: {index}' if cell is None or (isinstance(cell, str) and not cell.strip()) else str(cell)
+        base = name
+        while name in seen:
+            seen[base] += 1
+            name = f'{base}.{seen[base]}'
+        seen.setdefault(name, 0)
+        names.append(name)
+    return names
+
+
+def read_ticker_sheet(path):
+    """Return the data below the row containing a 'Ticker' cell, or None if there is none."""
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = None
+        for row in rows:
+            if any(isinstance(value, str) and value.strip().lower() == HEADER_TOKEN for value in row):
+                header = row
+                break
+        if header is None:
+            return None
+
+        # Cells right of the last header cell cannot map to a column, so they are not kept.
+        width = max((index + 1 for index, value in enumerate(header) if _cell_text(value) is not None), default=0)
+        records = []
+        for row in rows:
+            cells = [_cell_text(value) for value in row[:width]]
+            if any(cell is not None for cell in cells):
+                cells.extend([None] * (width - len(cells)))
+                records.append(cells)
+    finally:
+        workbook.close()
+
+    return pd.DataFrame(records, columns=_header_names(header[:width]), dtype=object)
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_ticker_sheet(path, cache_dir=None):
+    """Read a workbook through the Parquet cache when ``cache_dir`` is set.
+
+    Returns ``(frame, cached)``; ``frame`` is None when no header row exists.
+    """
+    if cache_dir is None:
+        return read_ticker_sheet(path), False
+
+    cache_dir = Path(cache_dir)
+    cache_path = cache_dir / f'{file_digest(path)}.parquet'
+    if cache_path.exists():
+        frame = pd.read_parquet(cache_path)
+        return frame.astype(object).where(frame.notna(), None), True
+
+    frame = read_ticker_sheet(path)
+    if frame is not None:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        handle, tmp_name = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        os.close(handle)
+        try:
+            frame.astype('string').to_parquet(tmp_name, index=False)
+            os.replace(tmp_name, cache_path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+    return frame, False
@@ -11,6 +11,7 @@ import django
 
 django.setup()
 
+from screener.generation import bump_generation
 from screener.models import Stock, Exchange
 from django.db import transaction
 
@@ -71,5 +72,7 @@ with transaction.atomic():
                 exch.save()
                 normalized += 1
 
+bump_generation("classifier")
+
 print(f"Reassigned {reassigned} stock rows")
 print(f"Updated {normalized} exchanges")
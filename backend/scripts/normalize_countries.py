@@ -16,6 +16,7 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "stock_screener.settings")
 django.setup()
 
 from screener.management.commands.import_tickers import COUNTRY_ALIASES, _normalize_country  # noqa: E402
+from screener.generation import bump_generation  # noqa: E402
 from screener.models import Exchange, Stock  # noqa: E402
 
 
@@ -50,6 +51,8 @@ def main():
             )
             updated_stocks += 1
 
+    bump_generation("classifier")
+
     print(f"Normalized exchanges: {updated_exchanges}")
     print(f"Normalized stock records: {updated_stocks}")
 
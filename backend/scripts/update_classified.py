@@ -18,6 +18,7 @@ if str(ROOT) not in sys.path:
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "stock_screener.settings")
 django.setup()
 
+from screener.generation import bump_generation  # noqa: E402
 from screener.models import Industry, Sector, Stock  # noqa: E402
 
 
@@ -132,6 +133,7 @@ def update_from_workbook(workbook_path: Path):
         if key and not Stock.objects.filter(company_name__iexact=name_value).exists():
             unmatched.append(str(name_value))
 
+    bump_generation("classifier")
     print(f"Updated {updated} stocks from classification workbook '{workbook_path.name}'.")
     if unmatched:
         unmatched_path = workbook_path.parent / f"{workbook_path.stem}_unmatched.txt"
@@ -70,6 +70,33 @@ else:
         }
     }
 
+# Caches: per-worker memory for hot data, plus a file-backed store shared by
+# web workers and management commands for dataset generation stamps.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'screener-default',
+    },
+    'screener_state': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('SCREENER_STATE_DIR', str(BASE_DIR / '.screener_state')),
+        'TIMEOUT': None,
+    },
+}
+
+# Serve stock lists and filtered stats from an in-memory columnar snapshot
+SCREENER_SNAPSHOT_ENABLED = os.environ.get('SCREENER_SNAPSHOT', 'False') == 'True'
+
+# Memory-mapped columnar copy of the price history used for reads
+PRICE_STORE_ENABLED = os.environ.get('PRICE_STORE', 'False') == 'True'
+PRICE_STORE_DIR = os.environ.get('PRICE_STORE_DIR', str(BASE_DIR / 'price_store'))
+
+# Parquet copies of imported workbooks, keyed by content hash
+IMPORT_CACHE_DIR = os.environ.get('IMPORT_CACHE_DIR', str(BASE_DIR / '.import_cache'))
+
+# Worker processes used to build the funds of one /api/funds/build/ request
+FUND_BUILD_WORKERS = int(os.environ.get('FUND_BUILD_WORKERS', '4'))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',